@@ -0,0 +1,120 @@
+"""Vazão do motor de alertas do SSACP (ssacp/alertas.py).
+
+Gera a corrida da frota vetorizada (car/frota.py) com --carros carros,
+converte os payloads como o SSACP faz (DadosCarro -> documento de `pneus`) e
+mede só o motor: leituras/s, µs por leitura e por (leitura x regra) e
+alertas disparados, para cada quantidade de regras em --regras. As regras são
+as padrão completadas com variações sintéticas (limiar, taxa e janela de
+média/máx/mín sobre cada pneu/campo e sobre a assimetria entre os lados).
+
+Com --verificar, confere as janelas incrementais contra o recálculo ingênuo
+(varrendo todas as leituras da janela) em uma amostra de carros.
+
+Uso:
+    python bench/bench_alertas.py --carros 1000 --voltas 2 --regras 10 100 300
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+
+from util_bench import corrida_frota
+from isccp.codificacao import json_para_dados_carro
+from ssacp.alertas import CAMPOS_PNEU, POSICOES_PNEU, REGRAS_PADRAO, MotorAlertas, Regra, _EstadoRegra
+from ssacp.persistencia import converter_item
+
+# Faixas dos limites sintéticos por campo: perto do alto da distribuição da frota
+LIMITES = {"temp": (126.0, 134.0), "desgaste": (20.0, 60.0), "press": (24.5, 24.8)}
+LIMITES_TAXA = {"temp": (1.0, 4.0), "desgaste": (0.2, 1.0), "press": (0.05, 0.2)}
+LIMITES_ASSIMETRIA = {"temp": (15.0, 22.0), "desgaste": (8.0, 14.0), "press": (0.55, 0.8)}
+
+
+def regras_sinteticas(quantidade):
+    """REGRAS_PADRAO seguidas de variações até `quantidade` regras."""
+    regras = [dict(r) for r in REGRAS_PADRAO[:quantidade]]
+    fontes = [f"{p}.{c}" for p in POSICOES_PNEU for c in CAMPOS_PNEU] + [f"assimetria.{c}" for c in CAMPOS_PNEU]
+    modelos = [("limiar", None), ("taxa", None), ("janela", "media"), ("janela", "max"), ("janela", "min")]
+    rodada = 0
+    while len(regras) < quantidade:
+        for fonte in fontes:
+            for tipo, agregado in modelos:
+                if len(regras) >= quantidade:
+                    break
+                campo = fonte.split(".")[1]
+                faixa = (LIMITES_TAXA if tipo == "taxa" else
+                         LIMITES_ASSIMETRIA if fonte.startswith("assimetria") else LIMITES)[campo]
+                fracao = (rodada * 0.37) % 1.0
+                regra = {"id": f"sintetica_{len(regras)}", "tipo": tipo, "fonte": fonte,
+                         "acima": round(faixa[0] + (faixa[1] - faixa[0]) * fracao, 3),
+                         "histerese": round((faixa[1] - faixa[0]) * 0.05, 3)}
+                if agregado:
+                    regra.update(agregado=agregado, janela_s=10.0 + 20 * fracao)
+                regras.append(regra)
+        rodada += 1
+    return regras
+
+
+def documentos_corrida(carros, voltas, semente):
+    return [converter_item(json_para_dados_carro(p)) for p in corrida_frota(carros, voltas, semente)]
+
+
+def medir(documentos, regras, lote):
+    motor = MotorAlertas(regras)
+    eventos_por_tipo = defaultdict(int)
+    tipo_regra = {r.id: r.tipo for r in motor.regras}
+    inicio = time.perf_counter()
+    for i in range(0, len(documentos), lote):
+        for evento in motor.processar(documentos[i:i + lote]):
+            if evento["estado"] == "ativo":
+                eventos_por_tipo[tipo_regra[evento["regra"]]] += 1
+    duracao = time.perf_counter() - inicio
+    return {"regras": len(regras), "leituras": len(documentos), "segundos": round(duracao, 3),
+            "leituras_por_s": round(len(documentos) / duracao),
+            "us_por_leitura": round(duracao / len(documentos) * 1e6, 2),
+            "ns_por_leitura_regra": round(duracao / len(documentos) / len(regras) * 1e9, 1),
+            "alertas": motor.disparados, "encerrados": motor.encerrados, "alertas_por_tipo": dict(eventos_por_tipo),
+            "fora_de_ordem": motor.fora_de_ordem}
+
+
+def verificar_janelas(documentos, regras, carros_amostra=20):
+    """Compara o valor incremental de cada regra de janela com o recálculo ingênuo."""
+    janelas = [Regra.de_dict(r) for r in regras if r.get("tipo") == "janela"]
+    amostra = set(sorted({d["carro_id"] for d in documentos})[:carros_amostra])
+    estados, vistos = {}, defaultdict(list)
+    divergencias = 0
+    for doc in documentos:
+        carro = doc["carro_id"]
+        if carro not in amostra:
+            continue
+        t = doc["timestamp"].timestamp()
+        vistos[carro].append((t, doc["pneus"]))
+        for regra, estado in zip(janelas, estados.setdefault(carro, [_EstadoRegra(r) for r in janelas])):
+            incremental = regra.valor(estado, t, regra.extrair(doc["pneus"]))
+            valores = [regra.extrair(p) for tv, p in vistos[carro] if tv > t - regra.janela_s]
+            ingenuo = {"media": lambda v: sum(v) / len(v), "max": max, "min": min}[regra.agregado](valores)
+            if abs(incremental - ingenuo) > 1e-6 * max(1.0, abs(ingenuo)):
+                divergencias += 1
+    return divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carros", type=int, default=1000)
+    parser.add_argument("--voltas", type=int, default=2)
+    parser.add_argument("--regras", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--lote", type=int, default=500, help="leituras por chamada ao motor (lote do SSACP)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--verificar", action="store_true")
+    args = parser.parse_args()
+
+    documentos = documentos_corrida(args.carros, args.voltas, args.semente)
+    for quantidade in args.regras:
+        regras = regras_sinteticas(quantidade)
+        linha = medir(documentos, regras, args.lote)
+        if args.verificar:
+            linha["divergencias_janela"] = verificar_janelas(documentos, regras)
+        print(json.dumps(linha), flush=True)
+
+
+if __name__ == '__main__':
+    main()
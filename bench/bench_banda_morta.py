@@ -0,0 +1,121 @@
+"""Compressão por banda morta no ISCCP (isccp/compressao.py) sobre uma corrida gravada.
+
+A corrida é gerada pela frota vetorizada (car/frota.py) com semente fixa, com o
+timestamp de cada carro avançando pelo tempo de setor, ou lida de um arquivo
+JSONL com os payloads JSON dos carros (--entrada; --gravar salva a corrida
+gerada nesse formato). Para cada conjunto de bandas mede:
+
+- taxa de compressão em mensagens e em bytes (DadosCarro serializado; as
+  enviadas incluem a janela quando houve descarte);
+- erro de reconstrução contra o fluxo bruto: o SSACP vê a última leitura
+  enviada de cada carro (sample-and-hold), então o erro de cada amostra bruta
+  é a diferença para a última enviada até ela (máx/médio/RMS por campo);
+- picos: se a maior temperatura de cada pneu de cada carro aparece no
+  temp_max das janelas enviadas.
+
+Os carros publicam uma vez por setor; --amostras-por-setor N interpola N
+leituras entre setores consecutivos para simular sensores mais rápidos.
+
+Uso:
+    python bench/bench_banda_morta.py --carros 24 --voltas 30
+    python bench/bench_banda_morta.py --bandas 0.5:0.5:0.05 2:1:0.2 --amostras-por-setor 10
+"""
+import argparse
+import json
+import math
+
+import numpy as np
+
+from util_bench import corrida_frota
+from car.main_car import codificar_payload
+from isccp.compressao import CompressorBandaMorta
+from protos import f1_pb2
+
+POSICOES = ("fl", "fr", "rl", "rr")
+CAMPOS = ("temperatura", "desgaste", "pressao")
+BANDAS_PADRAO = ["0.5:0.5:0.05", "1:0.5:0.1", "2:1:0.2", "4:2:0.5"]
+
+
+def valores(item):
+    pneus = (item.pneu_fl, item.pneu_fr, item.pneu_rl, item.pneu_rr)
+    return [[getattr(p, c) for c in CAMPOS] for p in pneus]
+
+
+def medir(brutas, bandas, janela_max_s):
+    compressor = CompressorBandaMorta(*bandas, janela_max_s=janela_max_s)
+    bytes_brutos = bytes_enviados = 0
+    reconstruido = {}
+    erros = {c: [] for c in CAMPOS}
+    pico_bruto, pico_janela = {}, {}
+
+    for serializado in brutas:
+        bytes_brutos += len(serializado)
+        item = f1_pb2.DadosCarro.FromString(serializado)
+        brutos = valores(item)
+        for j, p in enumerate(POSICOES):
+            chave = (item.carro_id, p)
+            pico_bruto[chave] = max(pico_bruto.get(chave, -math.inf), brutos[j][0])
+
+        enviado = compressor.processar(item)
+        if enviado is not None:
+            bytes_enviados += enviado.ByteSize()
+            reconstruido[item.carro_id] = brutos
+            for j, p in enumerate(POSICOES):
+                chave = (item.carro_id, p)
+                pico = getattr(enviado.janela, p).temp_max if enviado.HasField("janela") else brutos[j][0]
+                pico_janela[chave] = max(pico_janela.get(chave, -math.inf), pico)
+
+        visto = reconstruido[item.carro_id]
+        for j in range(len(POSICOES)):
+            for k, c in enumerate(CAMPOS):
+                erros[c].append(abs(brutos[j][k] - visto[j][k]))
+
+    # O fim da corrida pode ficar numa janela ainda não enviada: compara só os pneus com janela
+    picos = [abs(pico_bruto[chave] - pico_janela[chave]) < 1e-6 for chave in pico_janela]
+    resumo_erros = {}
+    for c, lista in erros.items():
+        arr = np.asarray(lista)
+        resumo_erros[c] = {"max": round(float(arr.max()), 3), "medio": round(float(arr.mean()), 4),
+                           "rms": round(float(np.sqrt((arr ** 2).mean())), 4)}
+    return {
+        "bandas": {"temp": bandas[0], "desgaste": bandas[1], "pressao": bandas[2]},
+        "janela_max_s": janela_max_s,
+        "mensagens": compressor.recebidas, "enviadas": compressor.enviadas,
+        "compressao_msgs": round(compressor.taxa_compressao(), 2),
+        "compressao_bytes": round(bytes_brutos / bytes_enviados, 2),
+        "erro": resumo_erros,
+        "picos_preservados": f"{sum(picos)}/{len(picos)}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--voltas", type=int, default=30)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--amostras-por-setor", type=int, default=1)
+    parser.add_argument("--bandas", nargs="+", default=BANDAS_PADRAO, help="temp:desgaste:pressao")
+    parser.add_argument("--janela-max-s", type=float, default=5.0)
+    parser.add_argument("--entrada", help="corrida gravada (JSONL com os payloads dos carros)")
+    parser.add_argument("--gravar", help="salva a corrida gerada em JSONL")
+    args = parser.parse_args()
+
+    if args.entrada:
+        with open(args.entrada) as arquivo:
+            payloads = [json.loads(linha) for linha in arquivo if linha.strip()]
+    else:
+        payloads = corrida_frota(args.carros, args.voltas, args.semente, args.amostras_por_setor)
+    if args.gravar:
+        with open(args.gravar, "w") as arquivo:
+            arquivo.writelines(json.dumps(p) + "\n" for p in payloads)
+
+    brutas = [codificar_payload(p, "protobuf") for p in payloads]
+    print(json.dumps({"corrida": args.entrada or "frota", "mensagens": len(brutas),
+                      "carros": len({p["carro_id"] for p in payloads})}), flush=True)
+    for texto in args.bandas:
+        bandas = tuple(float(v) for v in texto.split(":"))
+        print(json.dumps(medir(brutas, bandas, args.janela_max_s)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Corretude e custo da classificação ao vivo do SSVCP (ssvcp/classificacao.py).
+
+As leituras de uma corrida (da frota simulada, car/frota.py, ou de um arquivo
+gravado pelo replay_corrida.py) entram na Classificacao em ordem de timestamp,
+em lotes de --lote, como o Transmissor as entrega. Em --pontos checagens ao
+longo da corrida, a tabela é comparada com a classificação refeita do zero
+sobre todo o histórico até ali (ordem por setores completados e instante de
+passagem; intervalo = instante do carro menos o do carro da frente no mesmo
+ponto; última volta), e cada diferença conta como divergência.
+
+Com --juntar, cada lote entrega só a leitura mais recente de cada carro, como
+quando o SSVCP consulta o `latest_by_car` em vez de seguir o change stream:
+as posições continuam exatas e os setores pulados aparecem como intervalos e
+tempos sem valor (contados em "sem_intervalo"/"sem_ultima_volta").
+
+Por fim mede, com --carros carros, o custo por leitura, o de montar a tabela
+para uma requisição e o de refazer a classificação varrendo o histórico da
+corrida (o que cada consulta custaria sem o estado incremental).
+
+Falha (código de saída 1) se houver qualquer divergência de posição,
+intervalo ou última volta em relação à classificação refeita.
+
+Uso:
+    python bench/bench_classificacao.py --carros 24 200 2000 --voltas 3
+    python bench/bench_classificacao.py --corrida corrida.jsonl --juntar
+"""
+import argparse
+import json
+import time
+
+from util_bench import corrida_frota
+from isccp.codificacao import json_para_dados_carro
+from ssacp.persistencia import converter_item
+from ssacp.previsao import NUM_SETORES, setores_percorridos
+from ssvcp.classificacao import Classificacao, _epoch
+
+
+def documentos_frota(carros, voltas, semente):
+    return [converter_item(json_para_dados_carro(p)) for p in corrida_frota(carros, voltas, semente)]
+
+
+def documentos_arquivo(caminho):
+    from replay_corrida import ler_corrida
+    documentos = []
+    for _, _, formato, dados in ler_corrida(caminho):
+        documentos.append(converter_item(json_para_dados_carro(dados) if formato == "json" else dados))
+    documentos.sort(key=lambda d: d["timestamp"])
+    return documentos
+
+
+def lotes(documentos, tamanho, juntar):
+    for inicio in range(0, len(documentos), tamanho):
+        lote = documentos[inicio:inicio + tamanho]
+        if juntar:
+            lote = list({doc["carro_id"]: doc for doc in lote}.values())
+        yield lote
+
+
+def refazer(documentos):
+    """Classificação do zero: [(carro, setores completos, instante, intervalo, última volta)] em ordem."""
+    passagens = {}
+    for doc in documentos:
+        p = setores_percorridos(doc["volta"], doc["sensor_responsavel"])
+        if p is not None:
+            # A primeira leitura de cada ponto é a passagem (as seguintes no mesmo setor são ignoradas)
+            passagens.setdefault(doc["carro_id"], {}).setdefault(p, _epoch(doc["timestamp"]))
+    ordem = sorted((-max(pc), pc[max(pc)], carro) for carro, pc in passagens.items())
+    linhas = []
+    for i, (menos_p, t, carro) in enumerate(ordem):
+        p = -menos_p
+        intervalo = None
+        if i > 0:
+            frente = passagens[ordem[i - 1][2]]
+            if (-ordem[i - 1][0] - p) // NUM_SETORES == 0 and p in frente:
+                intervalo = t - frente[p]
+        volta_completa = p - p % NUM_SETORES
+        ultima = None
+        pc = passagens[carro]
+        if volta_completa in pc and volta_completa - NUM_SETORES in pc:
+            ultima = pc[volta_completa] - pc[volta_completa - NUM_SETORES]
+        linhas.append((carro, p, t, intervalo, ultima))
+    return linhas
+
+
+def comparar(tabela, esperado):
+    divergencias = {"posicao": 0, "intervalo": 0, "ultima_volta": 0}
+    sem = {"sem_intervalo": 0, "sem_ultima_volta": 0}
+    for linha, (carro, p, _, intervalo, ultima) in zip(tabela["carros"], esperado):
+        if linha["carro_id"] != carro or linha["setores_completos"] != p:
+            divergencias["posicao"] += 1
+            continue
+        for campo, obtido, certo, faltando in (("intervalo", linha["intervalo_s"], intervalo, "sem_intervalo"),
+                                               ("ultima_volta", linha["ultima_volta_s"], ultima, "sem_ultima_volta")):
+            if obtido is None and certo is not None:
+                sem[faltando] += 1  # setor pulado (só com --juntar)
+            elif (obtido is None) != (certo is None) or (obtido is not None and abs(obtido - certo) > 0.002):
+                divergencias[campo] += 1
+    divergencias["posicao"] += abs(len(tabela["carros"]) - len(esperado))
+    return divergencias, sem
+
+
+def checar(documentos, args):
+    pontos = sorted({max(1, int(len(documentos) * f)) for f in args.pontos})
+    classif = Classificacao()
+    entregues = 0
+    total = {"posicao": 0, "intervalo": 0, "ultima_volta": 0, "sem_intervalo": 0, "sem_ultima_volta": 0}
+    for ponto in pontos:
+        for lote in lotes(documentos[entregues:ponto], args.lote, args.juntar):
+            classif.processar(lote)
+        entregues = ponto
+        divergencias, sem = comparar(classif.tabela(), refazer(documentos[:ponto]))
+        for chave, valor in {**divergencias, **sem}.items():
+            total[chave] += valor
+        print(json.dumps({"leituras": ponto, "carros": len(classif.tabela()["carros"]), **divergencias, **sem}),
+              flush=True)
+    print(json.dumps({"checagem": "total", "juntar": args.juntar, **total}), flush=True)
+    return total["posicao"] + total["intervalo"] + total["ultima_volta"]
+
+
+def medir(documentos, args):
+    classif = Classificacao()
+    inicio = time.perf_counter()
+    for lote in lotes(documentos, args.lote, False):
+        classif.processar(lote)
+    processar_s = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for _ in range(args.repeticoes):
+        classif.versao += 1  # tabela de uma versão nova (a mesma versão sai do cache)
+        classif.tabela()
+    tabela_ms = (time.perf_counter() - inicio) / args.repeticoes * 1000
+    inicio = time.perf_counter()
+    refazer(documentos)
+    refazer_ms = (time.perf_counter() - inicio) * 1000
+    return {"us_por_leitura": round(processar_s / len(documentos) * 1e6, 2), "tabela_ms": round(tabela_ms, 2),
+            "refazer_historico_ms": round(refazer_ms, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carros", type=int, nargs="+", default=[24, 200, 2000])
+    parser.add_argument("--voltas", type=int, default=3)
+    parser.add_argument("--corrida", help="arquivo gravado (replay_corrida.py gerar/gravar) no lugar da frota")
+    parser.add_argument("--pontos", type=float, nargs="+", default=[0.1, 0.35, 0.6, 1.0],
+                        help="frações da corrida em que a tabela é checada")
+    parser.add_argument("--lote", type=int, default=64, help="leituras por entrega do Transmissor")
+    parser.add_argument("--juntar", action="store_true", help="entrega só a última leitura de cada carro por lote")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.corrida:
+        documentos = documentos_arquivo(args.corrida)
+        divergencias = checar(documentos, args)
+        print(json.dumps({"arquivo": args.corrida, "leituras": len(documentos),
+                          **medir(documentos, args)}), flush=True)
+    else:
+        divergencias = 0
+        for carros in args.carros:
+            documentos = documentos_frota(carros, args.voltas, args.semente)
+            if carros == args.carros[0]:
+                divergencias = checar(documentos, args)
+            print(json.dumps({"carros": carros, "leituras": len(documentos), **medir(documentos, args)}),
+                  flush=True)
+
+    if divergencias:
+        print(f"[BENCH] FALHOU: {divergencias} divergências com a classificação refeita do zero")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Compara o envio ISCCP -> SSACP pelo RPC unário e pelo fluxo (FluxoPneus).
+
+Para cada modo mede:
+- vazão máxima: N mensagens enfileiradas de uma vez, até todas confirmadas;
+- latência ponta a ponta (p50/p99) com carga constante de --taxa msgs/s,
+  do timestamp da mensagem até a confirmação de gravação.
+
+Usa um SSACP em processo gravando no banco de benchmark.
+
+Uso:
+    python bench/bench_envio_grpc.py --mensagens 50000 --taxa 2000 --duracao 10
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+import pymongo
+
+from util_bench import MONGO_URI, BANCO_BENCH, resetar_banco, nomes_carros, resumo_latencias
+from isccp.main_isccp import PonteISCCP, MODO_FLUXO, MODO_UNARIO
+from ssacp.main_server import criar_servidor
+from protos import f1_pb2
+
+PORTA_GRPC = 50063
+
+
+class PonteMedida(PonteISCCP):
+    """Guarda a latência exata de cada mensagem confirmada."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencias = []
+        self.confirmadas = 0
+
+    def _ao_confirmar(self, itens, inicio):
+        agora = time.time()
+        self.latencias.extend(agora - float(f1_pb2.DadosCarro.FromString(item).timestamp) for item in itens)
+        self.confirmadas += len(itens)
+        super()._ao_confirmar(itens, inicio)
+
+
+def gerar_mensagem(carro, seq, rng):
+    pneu = lambda: f1_pb2.Pneu(temperatura=rng.uniform(80, 120), desgaste=rng.uniform(0, 100),
+                               pressao=rng.uniform(22, 24))
+    return f1_pb2.DadosCarro(carro_id=carro, sensor_id=f"Setor {seq % 15 + 1}", velocidade=250,
+                             volta=1 + seq // 15, timestamp=repr(time.time()),
+                             pneu_fl=pneu(), pneu_fr=pneu(), pneu_rl=pneu(), pneu_rr=pneu()).SerializeToString()
+
+
+def esperar_confirmacoes(ponte, total, limite_s=300):
+    limite = time.monotonic() + limite_s
+    while ponte.confirmadas < total and time.monotonic() < limite:
+        time.sleep(0.01)
+
+
+def medir_modo(modo, args, banco):
+    resetar_banco(banco)
+    rng = random.Random(1)
+    carros = nomes_carros(args.carros)
+    ponte = PonteMedida(grpc_host=f"localhost:{PORTA_GRPC}", modo_envio=modo,
+                        buffer_max=max(args.mensagens, 50000))
+    parar = threading.Event()
+    envio = threading.Thread(target=ponte.rotina_envio_periodico, args=(parar,), daemon=True)
+    envio.start()
+
+    # 1) Vazão máxima
+    inicio = time.perf_counter()
+    for seq in range(args.mensagens):
+        ponte.enfileirar(gerar_mensagem(carros[seq % len(carros)], seq, rng))
+    esperar_confirmacoes(ponte, args.mensagens)
+    duracao = time.perf_counter() - inicio
+    vazao = ponte.confirmadas / duracao
+
+    # 2) Latência com taxa constante
+    ponte.latencias.clear()
+    base = ponte.confirmadas
+    enviadas = 0
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < args.duracao:
+        devidas = int((time.perf_counter() - inicio) * args.taxa)
+        while enviadas < devidas:
+            ponte.enfileirar(gerar_mensagem(carros[enviadas % len(carros)], args.mensagens + enviadas, rng))
+            enviadas += 1
+        time.sleep(0.001)
+    esperar_confirmacoes(ponte, base + enviadas)
+
+    parar.set()
+    envio.join(5)
+    ponte.parar()
+    return {
+        "modo": modo,
+        "vazao_msgs_s": round(vazao, 1),
+        "latencia_com_carga": dict(resumo_latencias(ponte.latencias), taxa_msgs_s=args.taxa),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mensagens", type=int, default=50000)
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--taxa", type=int, default=2000)
+    parser.add_argument("--duracao", type=float, default=10)
+    parser.add_argument("--modos", nargs="+", default=[MODO_UNARIO, MODO_FLUXO])
+    args = parser.parse_args()
+
+    mongo = pymongo.MongoClient(MONGO_URI)
+    banco = mongo[BANCO_BENCH]
+    servidor = criar_servidor(PORTA_GRPC, banco)
+    servidor.start()
+    for modo in args.modos:
+        print(json.dumps(medir_modo(modo, args, banco)), flush=True)
+    servidor.stop(0)
+    mongo.close()
+
+
+if __name__ == '__main__':
+    main()
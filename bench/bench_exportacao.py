@@ -0,0 +1,180 @@
+"""Tempo, tamanho e memória da exportação colunar da corrida (ssvcp/exportacao.py).
+
+Cada modo roda num processo separado, para o pico de RSS ser só dele, sobre
+as mesmas --linhas leituras em ordem de (carro, timestamp), como o cursor
+ler_historico as entrega:
+
+- fonte: só gera as leituras (custo e memória de base, e o tamanho em BSON);
+- npy / parquet: ferramenta de linha de comando (diretório com um carro por
+  pasta);
+- npz / parquet_fluxo: o corpo do /api/exportacao, gravado em arquivo;
+- ingenuo: o caminho atual dos analistas (list(cursor) e colunas montadas
+  depois), em --linhas-ingenuo leituras, porque cresce com a corrida.
+
+As leituras vêm de um gerador sintético (--carros carros, --voltas voltas,
+valores arredondados como no carro) ou, com --mongo, da coleção `pneus` do
+banco de benchmark (preenchida, por exemplo, pelo replay_corrida.py). No npy,
+o relatório também traz o tempo de abrir um carro com mmap e somar uma coluna.
+
+Uso:
+    python bench/bench_exportacao.py --linhas 10000000 --carros 24 --voltas 70 --dir /tmp/exportacao
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import bson
+import numpy as np
+
+from util_bench import BANCO_BENCH, abrir_mongo, nomes_carros
+from ssacp.persistencia import CAMPOS_PNEU, POSICOES_PNEU
+from ssacp.previsao import NUM_SETORES
+from ssvcp import exportacao
+
+MODOS = ("fonte", "npy", "parquet", "npz", "parquet_fluxo", "ingenuo")
+INICIO = datetime(2025, 11, 9, 17, 0, tzinfo=timezone.utc)
+
+
+def leituras_sinteticas(linhas, carros, voltas, semente=42):
+    """Documentos no formato do histórico, carro a carro, gerados uma volta por vez."""
+    rng = np.random.default_rng(semente)
+    nomes = sorted(nomes_carros(carros))
+    por_volta = max(NUM_SETORES, linhas // (carros * voltas))
+    setores = exportacao.SETORES_EXPORTADOS
+    restantes = linhas
+    for c, carro_id in enumerate(nomes):
+        cota = restantes // (carros - c)
+        restantes -= cota
+        desgaste = np.zeros(len(POSICOES_PNEU))
+        t = INICIO
+        volta = 1
+        while cota > 0:
+            n = min(por_volta, cota)
+            cota -= n
+            fase = np.linspace(0, 2 * np.pi, n)
+            temp = np.round(95 + 12 * np.sin(fase)[:, None] + rng.normal(0, 1.5, (n, 4)), 1)
+            desg = np.round(desgaste + np.cumsum(rng.uniform(0, 3.0 / por_volta, (n, 4)), axis=0), 2)
+            desgaste = desg[-1]
+            press = np.round(24 + 0.3 * np.sin(fase)[:, None] + rng.normal(0, 0.05, (n, 4)), 2)
+            velocidade = np.round(250 + 60 * np.cos(fase) + rng.normal(0, 5, n), 0)
+            passo = timedelta(seconds=80.0 / n)
+            for i in range(n):
+                yield {"carro_id": carro_id, "sensor_responsavel": setores[i * NUM_SETORES // n],
+                       "velocidade": float(velocidade[i]), "volta": volta, "timestamp": t,
+                       "pneus": {p: {"temp": float(temp[i, j]), "desgaste": float(desg[i, j]),
+                                     "press": float(press[i, j])} for j, p in enumerate(POSICOES_PNEU)}}
+                t += passo
+            volta += 1
+
+
+def tamanho(caminho):
+    if os.path.isfile(caminho):
+        return os.path.getsize(caminho)
+    return sum(os.path.getsize(os.path.join(raiz, a)) for raiz, _, arquivos in os.walk(caminho) for a in arquivos)
+
+
+def ler_mmap(diretorio):
+    """Abre o primeiro carro exportado com mmap e soma uma coluna (ms, linhas)."""
+    with open(os.path.join(diretorio, "manifesto.json")) as arquivo:
+        carro_id = next(iter(json.load(arquivo)["carros"]))
+    inicio = time.perf_counter()
+    colunas = exportacao.abrir_carro(diretorio, carro_id)
+    float(colunas["pneus.fl.temp"].sum(dtype=np.float64))
+    return round((time.perf_counter() - inicio) * 1000, 2), len(colunas["pneus.fl.temp"])
+
+
+def ingenuo(documentos):
+    """list(cursor) e uma lista por coluna depois, como no pandas.json_normalize."""
+    tudo = list(documentos)
+    colunas = {"carro_id": [d["carro_id"] for d in tudo], "timestamp": [d["timestamp"] for d in tudo],
+               "volta": [d["volta"] for d in tudo]}
+    for p in POSICOES_PNEU:
+        for c in CAMPOS_PNEU:
+            colunas[f"pneus.{p}.{c}"] = np.array([d["pneus"][p][c] for d in tudo], dtype=np.float32)
+    return len(tudo)
+
+
+def rodar_modo(args):
+    if args.mongo:
+        client = abrir_mongo(args.mongo)
+        documentos = exportacao.ler_historico(client[BANCO_BENCH]["pneus"])
+    else:
+        linhas = args.linhas_ingenuo if args.modo == "ingenuo" else args.linhas
+        documentos = leituras_sinteticas(linhas, args.carros, args.voltas, args.semente)
+
+    destino = os.path.join(args.dir, args.modo)
+    shutil.rmtree(destino, ignore_errors=True)
+    if os.path.exists(destino + ".arquivo"):
+        os.remove(destino + ".arquivo")
+    inicio = time.perf_counter()
+    relatorio = {"modo": args.modo}
+    if args.modo == "fonte":
+        # Referência de tamanho: o mesmo documento em BSON, como vai para o Mongo (amostra)
+        linhas = bson_bytes = 0
+        for doc in documentos:
+            if linhas < 10000:
+                bson_bytes += len(bson.encode(doc))
+            linhas += 1
+        relatorio.update(linhas=linhas, bson_bytes_por_linha=round(bson_bytes / min(linhas, 10000), 2))
+    elif args.modo == "ingenuo":
+        relatorio["linhas"] = ingenuo(documentos)
+    elif args.modo in ("npy", "parquet"):
+        manifesto = exportacao.exportar(documentos, destino, args.modo)
+        relatorio.update(linhas=manifesto["linhas"], bytes=tamanho(destino))
+    else:
+        destino += ".arquivo"
+        formato = "npz" if args.modo == "npz" else "parquet"
+        maior = 0
+        with open(destino, "wb") as arquivo:
+            for pedaco in exportacao.gerar_arquivo(formato, exportacao.particoes(documentos)):
+                maior = max(maior, len(pedaco))
+                arquivo.write(pedaco)
+        relatorio.update(bytes=tamanho(destino), maior_pedaco_bytes=maior)
+    segundos = time.perf_counter() - inicio
+    relatorio.update(segundos=round(segundos, 2),
+                     rss_pico_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1))
+    linhas = relatorio.get("linhas", args.linhas)
+    relatorio["linhas_por_s"] = round(linhas / segundos)
+    if "bytes" in relatorio:
+        relatorio["bytes_por_linha"] = round(relatorio["bytes"] / linhas, 2)
+    if args.modo == "npy":
+        relatorio["mmap_um_carro_ms"], relatorio["mmap_um_carro_linhas"] = ler_mmap(destino)
+    print(json.dumps(relatorio), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=10_000_000)
+    parser.add_argument("--linhas-ingenuo", type=int, default=500_000)
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--voltas", type=int, default=70)
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS))
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--dir", default="/tmp/exportacao_bench")
+    parser.add_argument("--mongo", default=None, help="URI do Mongo com a corrida em pneus (senão, sintética)")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.modo:
+        rodar_modo(args)
+        return
+    os.makedirs(args.dir, exist_ok=True)
+    for modo in args.modos:
+        if modo == "parquet" or modo == "parquet_fluxo":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                print(json.dumps({"modo": modo, "erro": "pyarrow não instalado"}), flush=True)
+                continue
+        comando = [sys.executable, __file__, "--modo", modo] + sys.argv[1:]
+        subprocess.run(comando, check=True)
+
+
+if __name__ == '__main__':
+    main()
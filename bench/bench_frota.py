@@ -0,0 +1,79 @@
+"""Carros simulados por núcleo: frota vetorizada (car/frota.py) x um carro por processo.
+
+Mede, em um único processo (= um núcleo), quantos passos de carro por segundo
+cada simulador consegue, só a física e física + montagem do JSON publicado.
+Dividindo pela taxa real de passos de um carro (1 por tempo de setor) chega-se
+a quantos carros um núcleo sustenta em tempo real (FROTA_ACELERAR=1; o custo
+do publish do paho não entra). No modo de um carro por processo o limite
+prático é a memória de cada processo (interpretador + MQTT + Mongo), reportada
+como rss_processo_mb. Também confere que a mesma semente reproduz o mesmo estado.
+
+Uso:
+    python bench/bench_frota.py --carros 200 2000 20000 --passos 50
+"""
+import argparse
+import json
+import resource
+import time
+
+import numpy as np
+
+from util_bench import cronometrar
+import car.main_car as carro_unico
+from car.frota import SimuladorFrota, nomes_frota, tempo_setor
+
+
+def passos_por_segundo_escalar(repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        vel, trecho = carro_unico.simular_fisica_realista()
+        json.dumps(carro_unico.gerar_payload(vel, trecho))
+    return repeticoes / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carros", type=int, nargs="+", default=[200, 2000, 20000])
+    parser.add_argument("--passos", type=int, default=50)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    # Taxa real: cada carro publica 1 vez por tempo de setor
+    referencia = SimuladorFrota(nomes_frota(10000), args.semente)
+    velocidades = np.concatenate([referencia.passo()[1] for _ in range(15)])
+    passos_reais_por_carro = float(np.mean(1.0 / tempo_setor(velocidades)))
+
+    carro_unico.CAR_ID = "Escalar"
+    escalar = passos_por_segundo_escalar(20000)
+    print(json.dumps({"simulador": "um_carro_por_processo", "passos_s": round(escalar),
+                      "carros_por_nucleo": round(escalar / passos_reais_por_carro),
+                      "rss_processo_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}),
+          flush=True)
+
+    for n in args.carros:
+        simulador = SimuladorFrota(nomes_frota(n), args.semente)
+        fisica = cronometrar(simulador.passo, args.passos)
+
+        def passo_com_payload():
+            simulador.payloads(*simulador.passo(), time.time())
+        completo = cronometrar(passo_com_payload, max(1, args.passos // 5))
+
+        passos_fisica = n / np.median(fisica)
+        passos_completos = n / np.median(completo)
+        print(json.dumps({
+            "simulador": "frota_vetorizada", "carros": n,
+            "passos_s_fisica": round(passos_fisica),
+            "passos_s_com_json": round(passos_completos),
+            "carros_por_nucleo_fisica": round(passos_fisica / passos_reais_por_carro),
+            "carros_por_nucleo_com_json": round(passos_completos / passos_reais_por_carro),
+        }), flush=True)
+
+    a, b = SimuladorFrota(nomes_frota(100), args.semente), SimuladorFrota(nomes_frota(100), args.semente)
+    for _ in range(30):
+        a.passo()
+        b.passo()
+    print(json.dumps({"reprodutivel": bool(np.array_equal(a.estado, b.estado))}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Latência das consultas históricas do SSVCP sobre uma corrida completa.
+
+Grava uma corrida sintética pelo mesmo caminho do SSACP (histórico + snapshot
++ rollups) no banco de benchmark e mede cada endpoint /api/historico com o
+cliente de teste do Flask (sem rede), comparando com a meta de 50ms.
+
+Uso:
+    python bench/bench_historico.py --carros 24 --voltas 70 --leituras-por-setor 20
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import pymongo
+
+from util_bench import MONGO_URI, BANCO_BENCH, NUM_SETORES, nomes_carros, documento_historico, resetar_banco
+from util_bench import cronometrar, resumo_latencias
+
+os.environ["SSVCP_BANCO"] = BANCO_BENCH
+os.environ.setdefault("SSVCP_LOG_LEVEL", "WARNING")
+os.environ.setdefault("SSVCP_READ_PREFERENCE", "primary")
+from ssacp.main_server import MonitoramentoService  # noqa: E402
+from ssvcp import app as ssvcp  # noqa: E402
+
+META_MS = 50
+TAMANHO_LOTE = 2000
+
+
+def gravar_corrida(banco, carros, voltas, por_setor):
+    servico = MonitoramentoService(banco)
+    rng = random.Random(11)
+    inicio = time.time() - voltas * NUM_SETORES * por_setor
+    lote, total = [], 0
+    for carro in nomes_carros(carros):
+        desgaste = 0.0
+        for volta in range(1, voltas + 1):
+            if volta == voltas // 2:
+                desgaste = 0.0  # parada nos boxes: novo stint
+            for setor in range(NUM_SETORES):
+                for k in range(por_setor):
+                    t = inicio + ((volta - 1) * NUM_SETORES + setor) * por_setor + k
+                    doc = documento_historico(carro, volta, setor, t, rng=rng)
+                    desgaste = min(100.0, desgaste + rng.uniform(0.005, 0.015))
+                    for pneu in doc["pneus"].values():
+                        pneu["desgaste"] = round(desgaste, 2)
+                    doc["_id"] = f"{carro}|{volta}|{doc['sensor_responsavel']}|{t}"
+                    lote.append(doc)
+                    if len(lote) >= TAMANHO_LOTE:
+                        servico.gravar(lote)
+                        total += len(lote)
+                        lote = []
+    if lote:
+        servico.gravar(lote)
+        total += len(lote)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--voltas", type=int, default=70)
+    parser.add_argument("--leituras-por-setor", type=int, default=20)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--sem-carga", action="store_true", help="reaproveita os dados já gravados")
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(MONGO_URI)
+    banco = client[BANCO_BENCH]
+    if not args.sem_carga:
+        resetar_banco(banco)
+        inicio = time.perf_counter()
+        total = gravar_corrida(banco, args.carros, args.voltas, args.leituras_por_setor)
+        print(json.dumps({"leituras_gravadas": total, "segundos": round(time.perf_counter() - inicio, 1)}),
+              flush=True)
+
+    carro = nomes_carros(args.carros)[0]
+    consultas = {
+        "pneus_fr_temp_voltas_10_30_lttb": f"/api/historico/{carro}/pneus?pneus=fr&volta_ini=10&volta_fim=30",
+        "pneus_todos_corrida_minmax": f"/api/historico/{carro}/pneus?metodo=minmax&pontos=500",
+        "setores_volta_20": f"/api/historico/{carro}/setores?volta=20",
+        "voltas_corrida": f"/api/historico/{carro}/voltas",
+        "degradacao_stints": f"/api/historico/{carro}/degradacao",
+    }
+    cliente = ssvcp.app.test_client()
+    for nome, rota in consultas.items():
+        resposta = cliente.get(rota)
+        if resposta.status_code != 200:
+            print(json.dumps({"consulta": nome, "erro": resposta.status_code}))
+            continue
+        linha = {"consulta": nome, "bytes": len(resposta.data)}
+        linha.update(resumo_latencias(cronometrar(lambda: cliente.get(rota), args.repeticoes)))
+        linha["dentro_da_meta"] = linha["p99_ms"] <= META_MS
+        print(json.dumps(linha), flush=True)
+
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
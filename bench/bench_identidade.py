@@ -0,0 +1,183 @@
+"""Tempo até a identidade com N carros largando ao mesmo tempo.
+
+Compara, no banco de benchmark:
+
+- "insercao": o registro antigo de car/main_car.py (nomes embaralhados,
+  insert_one até não dar DuplicateKeyError; sem o sleep aleatório de até 5s,
+  que só somaria ao tempo);
+- "lease": car/identidade.py (pool pré-populado, um find_one_and_update por
+  carro, lease renovado).
+
+Cada carro simulado é uma thread com o seu próprio MongoClient, todas
+liberadas ao mesmo tempo. Reporta p50/p99/máx do tempo até a identidade,
+operações no banco por carro e se algum nome foi dado a dois carros. No modo
+lease também derruba todos os carros sem liberar os nomes (queda dos
+processos) e mede quanto tempo os substitutos levam para assumi-los (~ lease).
+
+Falha (código de saída 1) se algum carro ficar sem nome ou algum nome for
+dado a dois carros (em qualquer modo) e, no lease, se o p99 do tempo até a
+identidade passar de --p99-max-ms ou se os substitutos não assumirem todos
+os nomes em até o lease mais a espera máxima entre tentativas (2s) e 1s de
+folga.
+
+Uso:
+    python bench/bench_identidade.py --carros 24 100 500 --lease 3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+import pymongo
+from pymongo.errors import DuplicateKeyError
+
+from util_bench import MONGO_URI, BANCO_BENCH, resumo_latencias
+from car.identidade import ReservaPiloto, nomes_pool, semear_pool
+from car.main_car import PILOTOS
+
+
+class ColecaoContada:
+    """Conta as operações de um carro na coleção."""
+
+    def __init__(self, colecao):
+        self.colecao = colecao
+        self.operacoes = 0
+
+    def __getattr__(self, nome):
+        metodo = getattr(self.colecao, nome)
+
+        def contado(*args, **kwargs):
+            self.operacoes += 1
+            return metodo(*args, **kwargs)
+        return contado
+
+
+def registro_insercao(colecao, nomes):
+    tentativas = list(nomes)
+    random.shuffle(tentativas)
+    for nome in tentativas:
+        try:
+            colecao.insert_one({"_id": nome, "timestamp": time.time()})
+            return nome
+        except DuplicateKeyError:
+            continue
+    return None
+
+
+def largar(qtd, registrar):
+    """Libera `qtd` carros ao mesmo tempo; devolve [(nome, segundos, operações, extra)]."""
+    resultados = [None] * qtd
+    clientes = [pymongo.MongoClient(MONGO_URI) for _ in range(qtd)]
+    for c in clientes:
+        c.admin.command("ping")  # conexão aberta antes da largada
+    barreira = threading.Barrier(qtd + 1)
+
+    def carro(i):
+        colecao = ColecaoContada(clientes[i][BANCO_BENCH]["grid_f1"])
+        barreira.wait()
+        inicio = time.perf_counter()
+        nome, extra = registrar(colecao)
+        resultados[i] = (nome, time.perf_counter() - inicio, colecao.operacoes, extra)
+
+    threads = [threading.Thread(target=carro, args=(i,)) for i in range(qtd)]
+    for t in threads:
+        t.start()
+    barreira.wait()
+    for t in threads:
+        t.join()
+    return resultados, clientes
+
+
+def resumir(modo, qtd, resultados):
+    nomes = [r[0] for r in resultados if r[0]]
+    return {"modo": modo, "carros": qtd, "com_identidade": len(nomes),
+            "nomes_duplicados": len(nomes) - len(set(nomes)),
+            "tempo_ate_identidade": resumo_latencias([r[1] for r in resultados]),
+            "operacoes_por_carro": round(sum(r[2] for r in resultados) / qtd, 2)}
+
+
+def medir_insercao(banco, qtd):
+    banco.drop_collection("grid_f1")
+    nomes = nomes_pool(PILOTOS, qtd)
+    resultados, clientes = largar(qtd, lambda col: (registro_insercao(col, nomes), None))
+    for c in clientes:
+        c.close()
+    return resumir("insercao", qtd, resultados)
+
+
+def medir_lease(banco, qtd, lease_s):
+    banco.drop_collection("grid_f1")
+    semear_pool(banco["grid_f1"], nomes_pool(PILOTOS, qtd))
+
+    def registrar(colecao):
+        reserva = ReservaPiloto(colecao, lease_s)
+        nome = reserva.reservar()
+        reserva.iniciar_batimentos()
+        return nome, reserva
+
+    resultados, clientes = largar(qtd, registrar)
+    linha = resumir("lease", qtd, resultados)
+
+    # Queda da frota: param de renovar sem liberar o nome; os substitutos esperam o lease vencer
+    for r in resultados:
+        r[3]._parar.set()
+    substitutos, clientes_sub = largar(qtd, registrar)
+    linha["recuperacao_apos_queda"] = resumo_latencias([r[1] for r in substitutos])
+    linha["nomes_recuperados"] = len({r[0] for r in substitutos} & {r[0] for r in resultados})
+    linha["nomes_duplicados_recuperacao"] = qtd - len({r[0] for r in substitutos})
+    for r in substitutos:
+        r[3].liberar()
+    for c in clientes + clientes_sub:
+        c.close()
+    return linha
+
+
+def verificar(linha, args):
+    """Lista o que a linha do relatório viola (vazia se passou)."""
+    qtd = linha["carros"]
+    prefixo = f"{linha['modo']} com {qtd} carros"
+    falhas = []
+    if linha["com_identidade"] < qtd:
+        falhas.append(f"{prefixo}: só {linha['com_identidade']} carros com nome")
+    if linha["nomes_duplicados"]:
+        falhas.append(f"{prefixo}: {linha['nomes_duplicados']} nomes dados a dois carros")
+    if linha["modo"] != "lease":
+        return falhas
+    if linha["tempo_ate_identidade"]["p99_ms"] > args.p99_max_ms:
+        falhas.append(f"{prefixo}: p99 de {linha['tempo_ate_identidade']['p99_ms']} ms até a identidade")
+    if linha["nomes_recuperados"] < qtd or linha["nomes_duplicados_recuperacao"]:
+        falhas.append(f"{prefixo}: substitutos assumiram {linha['nomes_recuperados']} nomes "
+                      f"({linha['nomes_duplicados_recuperacao']} duplicados)")
+    limite_ms = (args.lease + 2.0 + 1.0) * 1000
+    if linha["recuperacao_apos_queda"]["max_ms"] > limite_ms:
+        falhas.append(f"{prefixo}: recuperação levou {linha['recuperacao_apos_queda']['max_ms']} ms")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carros", type=int, nargs="+", default=[24, 100, 500])
+    parser.add_argument("--lease", type=float, default=3.0, help="duração do lease (s) no teste de queda")
+    parser.add_argument("--modos", nargs="+", default=["insercao", "lease"], choices=["insercao", "lease"])
+    parser.add_argument("--p99-max-ms", type=float, default=1000.0, help="p99 máximo até a identidade no lease")
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(MONGO_URI)
+    banco = client[BANCO_BENCH]
+    falhas = []
+    for qtd in args.carros:
+        for modo in args.modos:
+            linha = medir_insercao(banco, qtd) if modo == "insercao" else medir_lease(banco, qtd, args.lease)
+            print(json.dumps(linha), flush=True)
+            falhas.extend(verificar(linha, args))
+    banco.drop_collection("grid_f1")
+    client.close()
+    for falha in falhas:
+        print(f"[BENCH] FALHOU: {falha}")
+    if falhas:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Compara o layout antigo de `pneus` com a coleção time-series.
+
+- legado: coleção comum, timestamp string, _id = chave idempotente,
+  índice (carro_id, timestamp)
+- timeseries: timeField=timestamp (datetime), metaField=carro_id
+
+Mede taxa de inserção, tamanho em disco (dados + índices) e latência de
+consultas por carro em uma janela de tempo.
+
+Uso:
+    python bench/bench_layout_pneus.py --documentos 1000000 --consultas 200
+"""
+import argparse
+import json
+import random
+import time
+from datetime import timedelta
+
+import pymongo
+
+from util_bench import MONGO_URI, BANCO_BENCH, gerar_historico, nomes_carros, resumo_latencias, cronometrar
+
+TAMANHO_INSERT = 5000
+
+
+def preparar(banco, layout):
+    nome = f"layout_{layout}"
+    banco.drop_collection(nome)
+    if layout == "timeseries":
+        banco.create_collection(nome, timeseries={"timeField": "timestamp", "metaField": "carro_id",
+                                                  "granularity": "seconds"})
+    banco[nome].create_index([("carro_id", 1), ("timestamp", 1)])
+    return banco[nome]
+
+
+def como_legado(doc):
+    antigo = dict(doc)
+    antigo["timestamp"] = str(doc["timestamp"].timestamp())
+    antigo["_id"] = f"{doc['carro_id']}|{doc['volta']}|{doc['sensor_responsavel']}|{antigo['timestamp']}"
+    return antigo
+
+
+def inserir(colecao, documentos, layout):
+    inicio = time.perf_counter()
+    for i in range(0, len(documentos), TAMANHO_INSERT):
+        lote = documentos[i:i + TAMANHO_INSERT]
+        if layout == "legado":
+            lote = [como_legado(d) for d in lote]
+        else:
+            lote = [dict(d) for d in lote]
+        colecao.insert_many(lote, ordered=False)
+    return len(documentos) / (time.perf_counter() - inicio)
+
+
+def tamanho_bytes(banco, nome):
+    stats = banco.command("collStats", nome)
+    return {"dados_bytes": stats.get("storageSize", 0), "indices_bytes": stats.get("totalIndexSize", 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documentos", type=int, default=1_000_000)
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--janela-s", type=float, default=300, help="tamanho da janela consultada")
+    args = parser.parse_args()
+
+    inicio_corrida = time.time() - 86400
+    documentos = list(gerar_historico(args.documentos, args.carros, inicio=inicio_corrida, rng=random.Random(5)))
+    fim_corrida = documentos[-1]["timestamp"]
+    carros = nomes_carros(args.carros)
+
+    client = pymongo.MongoClient(MONGO_URI)
+    banco = client[BANCO_BENCH]
+    for layout in ("legado", "timeseries"):
+        colecao = preparar(banco, layout)
+        taxa = inserir(colecao, documentos, layout)
+
+        rng = random.Random(9)
+        primeira = documentos[0]["timestamp"]
+        duracao = (fim_corrida - primeira).total_seconds()
+
+        def consulta():
+            carro = rng.choice(carros)
+            a = primeira + timedelta(seconds=rng.uniform(0, max(0.0, duracao - args.janela_s)))
+            b = a + timedelta(seconds=args.janela_s)
+            if layout == "legado":
+                filtro = {"carro_id": carro, "timestamp": {"$gte": str(a.timestamp()), "$lt": str(b.timestamp())}}
+            else:
+                filtro = {"carro_id": carro, "timestamp": {"$gte": a, "$lt": b}}
+            list(colecao.find(filtro, {"_id": 0}))
+
+        print(json.dumps({
+            "layout": layout,
+            "documentos": args.documentos,
+            "insercao_docs_s": round(taxa, 1),
+            **tamanho_bytes(banco, colecao.name),
+            "consulta_por_carro": resumo_latencias(cronometrar(consulta, args.consultas)),
+        }), flush=True)
+        banco.drop_collection(colecao.name)
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
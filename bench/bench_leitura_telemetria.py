@@ -0,0 +1,73 @@
+"""Compara os dois caminhos de leitura do /api/telemetria.
+
+- histórico: agregação $sort/$group/$first sobre toda a coleção `pneus`
+- snapshot:  find() na coleção `latest_by_car` mantida pelo SSACP
+
+Uso:
+    python bench/bench_leitura_telemetria.py --tamanhos 10000 1000000 10000000
+"""
+import argparse
+import json
+import random
+
+import pymongo
+
+from util_bench import MONGO_URI, BANCO_BENCH, gerar_historico, cronometrar, resumo_latencias
+from ssacp.main_server import montar_operacoes_snapshot
+from ssvcp.app import ler_ultimo_estado_historico, ler_ultimo_estado_snapshot
+
+TAMANHO_INSERT = 10000
+
+
+def completar_historico(historico, snapshot, gerador, faltam):
+    lote = []
+    for doc in gerador:
+        lote.append(doc)
+        if len(lote) == TAMANHO_INSERT or len(lote) == faltam:
+            snapshot.bulk_write(montar_operacoes_snapshot(lote), ordered=False)
+            historico.insert_many(lote)
+            faltam -= len(lote)
+            lote = []
+        if faltam == 0:
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(MONGO_URI)
+    db = client[BANCO_BENCH]
+    db.drop_collection("pneus")
+    db.drop_collection("latest_by_car")
+    historico, snapshot = db["pneus"], db["latest_by_car"]
+
+    # Gerador único: cada tamanho só insere a diferença em relação ao anterior
+    gerador = gerar_historico(max(args.tamanhos), args.carros, rng=random.Random(42))
+    resultados = []
+    total = 0
+    for tamanho in sorted(args.tamanhos):
+        completar_historico(historico, snapshot, gerador, tamanho - total)
+        total = tamanho
+
+        repeticoes_hist = max(1, args.repeticoes if tamanho <= 1_000_000 else args.repeticoes // 10)
+        linha = {"documentos": tamanho}
+        try:
+            linha["historico"] = resumo_latencias(
+                cronometrar(lambda: ler_ultimo_estado_historico(historico), repeticoes_hist))
+        except pymongo.errors.OperationFailure as e:
+            linha["historico"] = {"erro": str(e)}
+        linha["snapshot"] = resumo_latencias(
+            cronometrar(lambda: ler_ultimo_estado_snapshot(snapshot), args.repeticoes))
+        resultados.append(linha)
+        print(json.dumps(linha), flush=True)
+
+    client.close()
+    return resultados
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Microbenchmark do payload dos carros: JSON x protobuf (DadosCarro) no ISCCP.
+
+Para cada formato mede:
+- bytes por mensagem publicada no MQTT;
+- custo no carro para codificar;
+- vazão da ponte por núcleo: on_message (decodificar e enfileirar) + montagem
+  dos lotes LoteSequenciado enviados ao SSACP, em um único processo.
+
+"json_antigo" reproduz o caminho anterior da ponte (json.loads, objetos
+protobuf na fila e LoteSequenciado reserializado a cada lote) como referência.
+
+Uso:
+    python bench/bench_payload.py --mensagens 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from util_bench import NUM_SETORES, nomes_carros, payload_carro
+from car.main_car import codificar_payload
+from isccp.codificacao import json_para_dados_carro, montar_lote_sequenciado
+from isccp.main_isccp import PonteISCCP
+from protos import f1_pb2
+
+TAMANHO_LOTE = 500
+
+
+class MensagemMqtt:
+    def __init__(self, payload):
+        self.payload = payload
+
+
+def gerar_payloads(qtd, rng):
+    carros = nomes_carros(24)
+    inicio = time.time()
+    return [payload_carro(carros[i % 24], 1 + (i // 24) // NUM_SETORES, (i // 24) % NUM_SETORES,
+                          inicio + i * 0.01, rng) for i in range(qtd)]
+
+
+def medir_codificacao(payloads, formato):
+    inicio = time.perf_counter()
+    mensagens = [codificar_payload(p, formato) for p in payloads]
+    duracao = time.perf_counter() - inicio
+    mensagens = [m.encode() if isinstance(m, str) else m for m in mensagens]
+    return mensagens, duracao
+
+
+def medir_ponte(mensagens, validar_binario):
+    ponte = PonteISCCP(grpc_host="localhost:1", buffer_max=len(mensagens) + 1, validar_binario=validar_binario)
+    inicio = time.perf_counter()
+    for m in mensagens:
+        ponte.on_message(None, None, MensagemMqtt(m))
+    itens = ponte.fila.retirar(len(mensagens))
+    for seq, i in enumerate(range(0, len(itens), TAMANHO_LOTE), start=1):
+        montar_lote_sequenciado(seq, itens[i:i + TAMANHO_LOTE])
+    duracao = time.perf_counter() - inicio
+    ponte.channel.close()
+    return duracao
+
+
+def medir_ponte_antiga(mensagens):
+    inicio = time.perf_counter()
+    objetos = [json_para_dados_carro(json.loads(m.decode())) for m in mensagens]
+    for seq, i in enumerate(range(0, len(objetos), TAMANHO_LOTE), start=1):
+        f1_pb2.LoteSequenciado(sequencia=seq, dados=objetos[i:i + TAMANHO_LOTE]).SerializeToString()
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mensagens", type=int, default=200_000)
+    args = parser.parse_args()
+
+    payloads = gerar_payloads(args.mensagens, random.Random(5))
+    n = args.mensagens
+
+    json_bytes, tempo_json = medir_codificacao(payloads, "json")
+    proto_bytes, tempo_proto = medir_codificacao(payloads, "protobuf")
+
+    linhas = [
+        ("json_antigo", json_bytes, tempo_json, medir_ponte_antiga(json_bytes)),
+        ("json", json_bytes, tempo_json, medir_ponte(json_bytes, True)),
+        ("protobuf", proto_bytes, tempo_proto, medir_ponte(proto_bytes, True)),
+        ("protobuf_sem_validacao", proto_bytes, tempo_proto, medir_ponte(proto_bytes, False)),
+    ]
+    for formato, mensagens, tempo_carro, tempo_ponte in linhas:
+        print(json.dumps({
+            "formato": formato,
+            "bytes_por_mensagem": round(sum(len(m) for m in mensagens) / n, 1),
+            "carro_us_por_mensagem": round(tempo_carro / n * 1e6, 2),
+            "ponte_msgs_s_por_nucleo": round(n / tempo_ponte),
+        }), flush=True)
+
+
+if __name__ == '__main__':
+    main()
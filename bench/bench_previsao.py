@@ -0,0 +1,193 @@
+"""Precisão e latência da previsão de desgaste (ssacp/previsao.py + /api/previsao).
+
+Gera uma corrida da frota vetorizada (car/frota.py) longa o bastante para os
+pneus passarem de --limite e usa a própria corrida como gabarito: a volta em
+que cada pneu cruza o limite. As leituras entram em ordem de timestamp, em
+lotes de --lote, pelo mesmo caminho do SSACP (aplicar_modelos_desgaste na
+coleção `modelos_desgaste`). Ao fim de cada volta de --pontos (quando todos os
+carros a completaram), o CachePrevisoes do SSVCP responde e o relatório traz:
+
+- erro da volta prevista para cada pneu que ainda não cruzou o limite (médio,
+  p90, viés e fração dentro de +-1 volta);
+- latência da consulta com todos os carros alterados e logo depois (cache);
+- o mesmo ajuste refeito do zero com numpy sobre todas as leituras até ali
+  (custo que as somas incrementais evitam) e a maior diferença de taxa entre
+  os dois.
+
+Falha (código de saída 1) se, em algum ponto, o erro médio passar de
+--erro-max-voltas, a fração dentro de +-1 volta ficar abaixo de
+--dentro-min, algum pneu ficar sem previsão, a taxa incremental se afastar
+mais de --diferenca-max da refeita do zero, ou a segunda consulta (sem dados
+novos) recalcular algum carro.
+
+Uso:
+    python bench/bench_previsao.py --carros 200 --voltas 32 --pontos 3 6 10 14 --mongo mock
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from util_bench import BANCO_BENCH, MONGO_URI, abrir_mongo, corrida_frota, percentil
+from isccp.codificacao import json_para_dados_carro
+from ssacp.persistencia import aplicar_modelos_desgaste, colecao_modelos, converter_item
+from ssacp.previsao import EXPOSICAO_VOLTA, NUM_SETORES, POSICOES_PNEU, montar_operacoes_modelo, variaveis
+from ssvcp.cache_previsao import CachePrevisoes
+
+
+def gabarito(documentos, limite):
+    """(carro, pneu) -> primeira volta com desgaste >= limite (só os que cruzam na corrida)."""
+    cruzou = {}
+    for doc in documentos:
+        for p in POSICOES_PNEU:
+            chave = (doc["carro_id"], p)
+            if chave not in cruzou and doc["pneus"][p]["desgaste"] >= limite:
+                cruzou[chave] = doc["volta"]
+    return cruzou
+
+
+def fim_das_voltas(documentos, pontos):
+    """Volta k -> instante em que o último carro terminou a volta k."""
+    ultimo = {}
+    for doc in documentos:
+        ultimo[(doc["carro_id"], doc["volta"])] = doc["timestamp"]
+    carros = {doc["carro_id"] for doc in documentos}
+    return {k: max(ultimo[(carro, k)] for carro in carros) for k in pontos}
+
+
+def taxas_refeitas(documentos):
+    """Mesmo modelo ajustado do zero (numpy) com todas as leituras: (carro, pneu) -> desgaste por volta."""
+    por_carro = {}
+    for doc in documentos:
+        s, exposicao = variaveis(doc["volta"], doc["sensor_responsavel"])
+        por_carro.setdefault(doc["carro_id"], []).append((s, exposicao, doc["pneus"]))
+    taxas = {}
+    for carro, leituras in por_carro.items():
+        s = np.array([le[0] for le in leituras], dtype=float)
+        for p in POSICOES_PNEU:
+            x = np.array([le[1][p] for le in leituras])
+            y = np.array([le[2][p]["desgaste"] for le in leituras])
+            (a, c, _), *_ = np.linalg.lstsq(np.column_stack([x, s, np.ones_like(s)]), y, rcond=None)
+            taxas[(carro, p)] = a * EXPOSICAO_VOLTA[p] + c * NUM_SETORES
+    return taxas
+
+
+def avaliar(previsoes, verdade, volta_atual):
+    erros, sem_previsao = [], 0
+    for previsao in previsoes:
+        for p, pneu in previsao["pneus"].items():
+            real = verdade.get((previsao["carro_id"], p))
+            if real is None or real <= volta_atual:
+                continue
+            if pneu["volta_limite"] is None:
+                sem_previsao += 1
+                continue
+            erros.append(pneu["volta_limite"] - real)
+    absolutos = [abs(e) for e in erros]
+    return {"pneus_avaliados": len(erros), "sem_previsao": sem_previsao,
+            "erro_medio_voltas": round(sum(absolutos) / len(erros), 3) if erros else None,
+            "erro_p90_voltas": percentil(absolutos, 90) if erros else None,
+            "vies_voltas": round(sum(erros) / len(erros), 3) if erros else None,
+            "dentro_de_1_volta": round(sum(a <= 1 for a in absolutos) / len(erros), 3) if erros else None}
+
+
+def verificar(linha, args):
+    """Lista o que a linha de um ponto de avaliação viola (vazia se passou)."""
+    falhas = []
+    if not linha["pneus_avaliados"]:
+        return ["nenhum pneu avaliado"]
+    if linha["erro_medio_voltas"] > args.erro_max_voltas:
+        falhas.append(f"erro médio de {linha['erro_medio_voltas']} voltas")
+    if linha["dentro_de_1_volta"] < args.dentro_min:
+        falhas.append(f"só {linha['dentro_de_1_volta']} dentro de +-1 volta")
+    if linha["sem_previsao"]:
+        falhas.append(f"{linha['sem_previsao']} pneus sem previsão")
+    if linha["maior_diferenca_taxa"] > args.diferenca_max:
+        falhas.append(f"taxa incremental difere {linha['maior_diferenca_taxa']} da refeita")
+    if linha["recalculadas_cache"]:
+        falhas.append(f"{linha['recalculadas_cache']} carros recalculados sem dados novos")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carros", type=int, default=200)
+    parser.add_argument("--voltas", type=int, default=32, help="voltas simuladas (gabarito)")
+    parser.add_argument("--pontos", type=int, nargs="+", default=[3, 6, 10, 14], help="voltas em que se avalia")
+    parser.add_argument("--limite", type=float, default=75.0)
+    parser.add_argument("--lote", type=int, default=500)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--mongo", default=MONGO_URI, help='URI do Mongo ou "mock"')
+    parser.add_argument("--erro-max-voltas", type=float, default=1.0, help="erro médio máximo da volta prevista")
+    parser.add_argument("--dentro-min", type=float, default=0.9, help="fração mínima dentro de +-1 volta")
+    parser.add_argument("--diferenca-max", type=float, default=1e-3,
+                        help="diferença máxima de taxa (desgaste/volta) entre incremental e refeita")
+    args = parser.parse_args()
+
+    documentos = [converter_item(json_para_dados_carro(p)) for p in corrida_frota(args.carros, args.voltas,
+                                                                                   args.semente)]
+    verdade = gabarito(documentos, args.limite)
+    fins = fim_das_voltas(documentos, args.pontos)
+    print(json.dumps({"leituras": len(documentos), "pneus_que_cruzam": len(verdade),
+                      "pneus_total": args.carros * len(POSICOES_PNEU)}), flush=True)
+
+    client = abrir_mongo(args.mongo)
+    banco = client[BANCO_BENCH]
+    banco.drop_collection("modelos_desgaste")
+    modelos = colecao_modelos(banco)
+    modelos.create_index("atualizado_em")
+    cache = CachePrevisoes(modelos, intervalo_consulta=0)
+
+    montar_s = gravar_s = 0.0
+    gravadas = 0
+    falhas = []
+    for volta in sorted(args.pontos):
+        lote = []
+        while gravadas < len(documentos) and documentos[gravadas]["timestamp"] <= fins[volta]:
+            lote.append(documentos[gravadas])
+            gravadas += 1
+            if len(lote) == args.lote or gravadas == len(documentos) or \
+                    documentos[gravadas]["timestamp"] > fins[volta]:
+                inicio = time.perf_counter()
+                montar_operacoes_modelo(lote)
+                montar_s += time.perf_counter() - inicio
+                inicio = time.perf_counter()
+                aplicar_modelos_desgaste(modelos, lote)
+                gravar_s += time.perf_counter() - inicio
+                lote = []
+
+        recalculadas = cache.recalculadas
+        inicio = time.perf_counter()
+        previsoes = cache.previsoes(args.limite)
+        consulta_alterados_ms = (time.perf_counter() - inicio) * 1000
+        recalculadas_alterados = cache.recalculadas - recalculadas
+        inicio = time.perf_counter()
+        cache.previsoes(args.limite)
+        consulta_cache_ms = (time.perf_counter() - inicio) * 1000
+        recalculadas_cache = cache.recalculadas - recalculadas - recalculadas_alterados
+
+        inicio = time.perf_counter()
+        refeitas = taxas_refeitas(documentos[:gravadas])
+        refazer_ms = (time.perf_counter() - inicio) * 1000
+        diferenca = max(abs(pr["pneus"][p]["taxa_por_volta"] - refeitas[(pr["carro_id"], p)])
+                        for pr in previsoes for p in POSICOES_PNEU if pr["pneus"][p]["taxa_por_volta"] is not None)
+
+        linha = {"volta": volta, "leituras_ate_aqui": gravadas, **avaliar(previsoes, verdade, volta),
+                 "consulta_alterados_ms": round(consulta_alterados_ms, 2), "recalculadas": recalculadas_alterados,
+                 "consulta_cache_ms": round(consulta_cache_ms, 2), "recalculadas_cache": recalculadas_cache,
+                 "refazer_numpy_ms": round(refazer_ms, 2), "maior_diferenca_taxa": round(diferenca, 6)}
+        print(json.dumps(linha), flush=True)
+        falhas.extend(f"volta {volta}: {falha}" for falha in verificar(linha, args))
+
+    print(json.dumps({"ssacp_us_por_leitura_montar": round(montar_s / gravadas * 1e6, 2),
+                      "ssacp_us_por_leitura_gravar": round(gravar_s / gravadas * 1e6, 2)}), flush=True)
+    client.close()
+    for falha in falhas:
+        print(f"[BENCH] FALHOU: {falha}")
+    if falhas:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
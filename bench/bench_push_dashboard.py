@@ -0,0 +1,220 @@
+"""Compara o dashboard por push (SSE em /api/stream) com o polling de /api/telemetria.
+
+Sobe o SSVCP no próprio processo apontando para o banco de benchmark, atualiza
+o latest_by_car a uma taxa fixa (como o SSACP faria) e mede, com N clientes
+simultâneos em cada modo:
+
+- latência de atualização: momento em que o cliente vê o carro novo menos o
+  momento em que o escritor gravou (campo `t_envio` no documento)
+- carga no banco: operações (query/getmore/command) no serverStatus durante a
+  janela e leituras feitas pelo SSVCP
+
+Falha (código de saída 1) se algum cliente não conectar ou não vir nenhuma
+atualização, se o p99 da latência do push passar de --p99-max-ms ou se o
+push fizer tantas operações no banco quanto o polling.
+
+Uso:
+    python bench/bench_push_dashboard.py --clientes 500 --carros 24 --duracao 20
+"""
+import os
+import json
+import logging
+import time
+import random
+import argparse
+import threading
+import http.client
+
+import pymongo
+
+from util_bench import MONGO_URI, BANCO_BENCH, nomes_carros, documento_historico, resetar_banco, resumo_latencias
+
+os.environ["SSVCP_BANCO"] = BANCO_BENCH
+os.environ.setdefault("SSVCP_INTERVALO_PING_SSE", "5")
+# Um processo só atende todos os clientes (o limite por worker do gunicorn não se aplica)
+os.environ.setdefault("SSVCP_SSE_MAX", "100000")
+from werkzeug.serving import make_server  # noqa: E402
+
+from ssacp.persistencia import montar_operacoes_snapshot  # noqa: E402
+from ssvcp import app as ssvcp  # noqa: E402
+
+ssvcp.logger.setLevel("WARNING")
+logging.getLogger("werkzeug").setLevel("WARNING")
+PORTA_BENCH = 5055
+
+
+def escritor(snapshot, carros, taxa, parar):
+    """Atualiza `taxa` carros por segundo no latest_by_car."""
+    rng = random.Random(7)
+    volta = 1
+    intervalo = 1.0 / taxa
+    i = 0
+    while not parar.is_set():
+        inicio = time.time()
+        doc = documento_historico(carros[i % len(carros)], volta, i % 15, inicio, rng=rng)
+        doc["t_envio"] = inicio
+        snapshot.bulk_write(montar_operacoes_snapshot([doc]), ordered=False)
+        i += 1
+        if i % len(carros) == 0:
+            volta += 1
+        time.sleep(max(0.0, intervalo - (time.time() - inicio)))
+
+
+def cliente_push(latencias, lock, parar, pronto, resultado):
+    conexao = http.client.HTTPConnection("127.0.0.1", PORTA_BENCH, timeout=30)
+    try:
+        conexao.request("GET", "/api/stream")
+        resposta = conexao.getresponse()
+        resultado["conectou"] = resposta.status == 200
+    except (OSError, http.client.HTTPException):
+        pass
+    finally:
+        pronto.release()
+    if not resultado["conectou"]:
+        conexao.close()
+        return
+    tipo = None
+    while not parar.is_set():
+        linha = resposta.fp.readline()
+        if not linha:
+            break
+        linha = linha.decode().rstrip("\n")
+        if linha.startswith("event: "):
+            tipo = linha[7:]
+        elif linha.startswith("data: ") and tipo == "delta":
+            agora = time.time()
+            vistas = [agora - d["t_envio"] for d in json.loads(linha[6:]) if "t_envio" in d]
+            resultado["atualizacoes"] += len(vistas)
+            with lock:
+                latencias.extend(vistas)
+    conexao.close()
+
+
+def cliente_polling(latencias, lock, parar, pronto, resultado, intervalo):
+    conexao = http.client.HTTPConnection("127.0.0.1", PORTA_BENCH, timeout=30)
+    vistos = {}
+    pronto.release()
+    while not parar.is_set():
+        inicio = time.time()
+        try:
+            conexao.request("GET", "/api/telemetria")
+            dados = json.loads(conexao.getresponse().read())
+            resultado["conectou"] = True
+        except (OSError, http.client.HTTPException, ValueError):
+            conexao.close()
+            conexao = http.client.HTTPConnection("127.0.0.1", PORTA_BENCH, timeout=30)
+            continue
+        agora = time.time()
+        novas = []
+        for d in dados if isinstance(dados, list) else []:
+            t = d.get("t_envio")
+            if t is not None and vistos.get(d["carro_id"]) != t:
+                if d["carro_id"] in vistos:
+                    novas.append(agora - t)
+                vistos[d["carro_id"]] = t
+        resultado["atualizacoes"] += len(novas)
+        with lock:
+            latencias.extend(novas)
+        time.sleep(max(0.0, intervalo - (time.time() - inicio)))
+    conexao.close()
+
+
+def operacoes_banco(client):
+    try:
+        contadores = client.admin.command("serverStatus")["opcounters"]
+        return contadores["query"] + contadores["getmore"] + contadores["command"]
+    except pymongo.errors.PyMongoError:
+        return None
+
+
+def medir(modo, args, client):
+    latencias, lock = [], threading.Lock()
+    parar_clientes = threading.Event()
+    pronto = threading.Semaphore(0)
+    if modo == "push":
+        alvo, extra = cliente_push, ()
+    else:
+        alvo, extra = cliente_polling, (args.intervalo_polling,)
+    resultados = [{"conectou": False, "atualizacoes": 0} for _ in range(args.clientes)]
+    clientes = [threading.Thread(target=alvo, args=(latencias, lock, parar_clientes, pronto, resultado) + extra,
+                                 daemon=True)
+                for resultado in resultados]
+    for t in clientes:
+        t.start()
+    for _ in clientes:
+        pronto.acquire()
+
+    transmissor = ssvcp._transmissor
+    leituras_antes = transmissor.eventos_db if transmissor else 0
+    ops_antes = operacoes_banco(client)
+    parar_escritor = threading.Event()
+    t_escritor = threading.Thread(target=escritor,
+                                  args=(client[BANCO_BENCH]["latest_by_car"], nomes_carros(args.carros),
+                                        args.taxa, parar_escritor), daemon=True)
+    t_escritor.start()
+    time.sleep(args.duracao)
+    parar_escritor.set()
+    t_escritor.join()
+    ops_depois = operacoes_banco(client)
+    transmissor = ssvcp._transmissor
+
+    parar_clientes.set()
+    with lock:
+        linha = {"modo": modo, "clientes": args.clientes,
+                 "conectados": sum(r["conectou"] for r in resultados),
+                 "com_atualizacao": sum(r["atualizacoes"] > 0 for r in resultados),
+                 "latencia_atualizacao": resumo_latencias(latencias)}
+    if ops_antes is not None and ops_depois is not None:
+        linha["ops_banco_por_s"] = round((ops_depois - ops_antes) / args.duracao, 1)
+    if modo == "push" and transmissor:
+        linha["leituras_ssvcp_por_s"] = round((transmissor.eventos_db - leituras_antes) / args.duracao, 1)
+        linha["modo_transmissor"] = transmissor.modo
+    return linha
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clientes", type=int, default=500)
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--taxa", type=float, default=48.0, help="atualizações de carro por segundo")
+    parser.add_argument("--duracao", type=float, default=20.0)
+    parser.add_argument("--intervalo-polling", type=float, default=1.0)
+    parser.add_argument("--modos", nargs="+", default=["push", "polling"], choices=["push", "polling"])
+    parser.add_argument("--p99-max-ms", type=float, default=1500.0,
+                        help="p99 máximo da latência do push (sem replica set o SSVCP consulta a cada 0.5s)")
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(MONGO_URI)
+    resetar_banco(client[BANCO_BENCH])
+
+    servidor = make_server("127.0.0.1", PORTA_BENCH, ssvcp.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    resultados = []
+    for modo in args.modos:
+        linha = medir(modo, args, client)
+        resultados.append(linha)
+        print(json.dumps(linha), flush=True)
+
+    servidor.shutdown()
+    client.close()
+
+    falhas = []
+    for linha in resultados:
+        if linha["conectados"] < args.clientes or linha["com_atualizacao"] < args.clientes:
+            falhas.append(f"{linha['modo']}: {linha['conectados']} de {args.clientes} clientes conectados, "
+                          f"{linha['com_atualizacao']} com atualização")
+        if linha["modo"] == "push" and linha["latencia_atualizacao"]["p99_ms"] > args.p99_max_ms:
+            falhas.append(f"push: p99 de {linha['latencia_atualizacao']['p99_ms']} ms acima de {args.p99_max_ms}")
+    ops = {linha["modo"]: linha.get("ops_banco_por_s") for linha in resultados}
+    if ops.get("push") is not None and ops.get("polling") is not None and ops["push"] >= ops["polling"]:
+        falhas.append(f"push fez {ops['push']} operações/s no banco, polling {ops['polling']}")
+    for falha in falhas:
+        print(f"[BENCH] FALHOU: {falha}")
+    if falhas:
+        raise SystemExit(1)
+    return resultados
+
+
+if __name__ == '__main__':
+    main()
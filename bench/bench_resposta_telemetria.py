@@ -0,0 +1,136 @@
+"""Bytes na rede e CPU do servidor por requisição do /api/telemetria.
+
+Para cada tamanho de frota em --carros, grava o snapshot `latest_by_car` de
+uma frota simulada (car/frota.py) pelo mesmo caminho do SSACP e mede, com o
+cliente de teste do Flask (sem rede), cada combinação de formato
+(json/colunas/msgpack) e compressão (nenhuma/gzip/br):
+
+- versao_nova: o corpo é gerado do zero (cache de corpos limpo a cada vez);
+- mesma_versao: o corpo sai do cache (outro cliente já pediu esta versão);
+
+e ainda o 304 (If-None-Match com a versão atual) e o ?since=<versao> depois de
+--alterados carros mudarem. CPU é o tempo de processo por requisição (inclui a
+consulta ao Mongo quando ele roda no mesmo processo, como no --mongo mock, e
+por isso também sai separado o custo só de serializar e comprimir); bytes são
+corpo + cabeçalhos da resposta.
+
+Uso:
+    python bench/bench_resposta_telemetria.py --carros 24 200 2000 --mongo mock
+"""
+import argparse
+import json
+import os
+import time
+from datetime import timedelta
+
+from util_bench import BANCO_BENCH, MONGO_URI, abrir_mongo, corrida_frota
+
+os.environ["SSVCP_BANCO"] = BANCO_BENCH
+os.environ.setdefault("SSVCP_LOG_LEVEL", "WARNING")
+from isccp.codificacao import json_para_dados_carro  # noqa: E402
+from ssacp.persistencia import converter_item, montar_operacoes_snapshot  # noqa: E402
+from ssvcp import app as ssvcp  # noqa: E402
+
+FORMATOS = ("json", "colunas", "msgpack")
+COMPRESSOES = {"nenhuma": "identity", "gzip": "gzip", "br": "br"}
+
+
+def gravar_snapshot(snapshot, carros):
+    snapshot.delete_many({})
+    documentos = [converter_item(json_para_dados_carro(p)) for p in corrida_frota(carros, 1)]
+    snapshot.bulk_write(montar_operacoes_snapshot(documentos), ordered=False)
+    # Última leitura de cada carro (o que ficou no snapshot)
+    return list({doc["carro_id"]: doc for doc in documentos}.values())
+
+
+def tamanho(resposta):
+    cabecalhos = sum(len(k) + len(v) + 4 for k, v in resposta.headers.items())
+    return len(resposta.data) + cabecalhos
+
+
+def medir(cliente, rota, cabecalhos, repeticoes, antes=None):
+    """(bytes da última resposta, CPU média em ms, status)."""
+    total = 0.0
+    for _ in range(repeticoes):
+        if antes:
+            antes()
+        inicio = time.process_time()
+        resposta = cliente.get(rota, headers=cabecalhos)
+        total += time.process_time() - inicio
+    return tamanho(resposta), round(total / repeticoes * 1000, 3), resposta.status_code
+
+
+def medir_codificacao(carros, formato, codificacao, repeticoes):
+    """CPU (ms) só de serializar e comprimir, sem Flask nem consulta ao banco."""
+    def dumps_json(dados):
+        return ssvcp.app.json.dumps(dados, separators=(",", ":"))
+
+    inicio = time.process_time()
+    for _ in range(repeticoes):
+        corpo, _ = ssvcp.resposta.serializar(carros, formato, dumps_json)
+        ssvcp.resposta.comprimir(corpo, codificacao, ssvcp.COMPRESSAO_MIN_BYTES)
+    return round((time.process_time() - inicio) / repeticoes * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carros", type=int, nargs="+", default=[24, 200, 2000])
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--alterados", type=float, default=0.05, help="fração de carros alterados para o ?since")
+    parser.add_argument("--mongo", default=MONGO_URI, help='URI do Mongo ou "mock"')
+    args = parser.parse_args()
+
+    client = abrir_mongo(args.mongo)
+    # O app usa o cliente único do processo: aponta para o do bench (Mongo real ou mongomock)
+    ssvcp._client, ssvcp._client_pid = client, os.getpid()
+    snapshot = client[BANCO_BENCH]["latest_by_car"]
+    snapshot.create_index("atualizado_em")
+    cliente = ssvcp.app.test_client()
+    cache = ssvcp._corpos_telemetria
+
+    def limpar_cache():
+        cache.versao = None
+
+    for carros in args.carros:
+        documentos = gravar_snapshot(snapshot, carros)
+        with ssvcp.app.app_context():
+            lidos = ssvcp.ler_ultimo_estado_snapshot(snapshot)
+        base = None
+        for formato in FORMATOS:
+            for nome, aceita in COMPRESSOES.items():
+                rota = f"/api/telemetria?formato={formato}"
+                cabecalhos = {"Accept-Encoding": aceita}
+                bytes_novo, cpu_novo, _ = medir(cliente, rota, cabecalhos, args.repeticoes, limpar_cache)
+                _, cpu_cache, _ = medir(cliente, rota, cabecalhos, args.repeticoes)
+                with ssvcp.app.app_context():
+                    cpu_codificar = medir_codificacao(lidos, formato, None if aceita == "identity" else aceita,
+                                                      args.repeticoes)
+                base = base or bytes_novo
+                print(json.dumps({"carros": carros, "formato": formato, "compressao": nome, "bytes": bytes_novo,
+                                  "fracao_do_json": round(bytes_novo / base, 3), "cpu_ms_versao_nova": cpu_novo,
+                                  "cpu_ms_mesma_versao": cpu_cache, "cpu_ms_so_codificar": cpu_codificar}),
+                      flush=True)
+
+        versao = cliente.get("/api/telemetria").headers["X-Versao"]
+        bytes_304, cpu_304, status = medir(cliente, "/api/telemetria", {"If-None-Match": f'W/"{versao}"'},
+                                           args.repeticoes)
+        print(json.dumps({"carros": carros, "modo": "304", "status": status, "bytes": bytes_304,
+                          "fracao_do_json": round(bytes_304 / base, 4), "cpu_ms": cpu_304}), flush=True)
+
+        # Alguns carros recebem leituras novas; o ?since devolve só eles (e os do limite da versão)
+        alterados = documentos[-max(1, int(carros * args.alterados)):]
+        for doc in alterados:
+            doc["timestamp"] += timedelta(seconds=1)
+        snapshot.bulk_write(montar_operacoes_snapshot(alterados), ordered=False)
+        for nome, aceita in COMPRESSOES.items():
+            rota = f"/api/telemetria?since={versao}"
+            bytes_delta, cpu_delta, _ = medir(cliente, rota, {"Accept-Encoding": aceita}, args.repeticoes)
+            carros_delta = len(json.loads(ssvcp.app.test_client().get(rota).data))
+            print(json.dumps({"carros": carros, "modo": "since", "compressao": nome, "alterados": len(alterados),
+                              "carros_na_resposta": carros_delta, "bytes": bytes_delta,
+                              "fracao_do_json": round(bytes_delta / base, 4), "cpu_ms": cpu_delta}), flush=True)
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
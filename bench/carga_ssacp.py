@@ -0,0 +1,105 @@
+"""Gerador de carga para o SSACP: vazão total em função do número de pontes.
+
+Cada ponte roda em um processo próprio (PonteISCCP sem MQTT) e enfileira
+mensagens o mais rápido possível durante --duracao segundos. O SSACP pode
+ser iniciado pelo próprio script em qualquer modo, gravando no banco de
+benchmark, para comparar threads x aio e w=1 x majority.
+
+Uso:
+    python bench/carga_ssacp.py --servidor aio --write-concern 1 --pontes 1 5 15 30
+    python bench/carga_ssacp.py --servidor threads --pontes 1 5 15 30
+    python bench/carga_ssacp.py --servidor nenhum --alvo ssacp:50051
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import pymongo
+
+from util_bench import MONGO_URI, BANCO_BENCH, nomes_carros, resetar_banco
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PORTA_GRPC = 50064
+
+
+def rodar_ponte(alvo, modo, duracao, indice, resultados):
+    # Importa aqui: cada processo cria seu próprio canal gRPC
+    from bench_envio_grpc import PonteMedida, gerar_mensagem
+
+    rng = random.Random(indice)
+    carros = nomes_carros(24)
+    ponte = PonteMedida(grpc_host=alvo, modo_envio=modo, buffer_max=200000)
+    parar = threading.Event()
+    envio = threading.Thread(target=ponte.rotina_envio_periodico, args=(parar,), daemon=True)
+    envio.start()
+
+    seq = indice * 10_000_000
+    inicio = time.monotonic()
+    while time.monotonic() - inicio < duracao:
+        if len(ponte.fila) > 20000:  # não deixa a fila crescer sem limite
+            time.sleep(0.001)
+            continue
+        ponte.enfileirar(gerar_mensagem(carros[seq % 24], seq, rng))
+        seq += 1
+    confirmadas = ponte.confirmadas
+    parar.set()
+    envio.join(5)
+    ponte.parar(espera_confirmacoes=0)
+    resultados.put(confirmadas)
+
+
+def medir(alvo, modo, pontes, duracao):
+    ctx = multiprocessing.get_context("spawn")
+    resultados = ctx.Queue()
+    processos = [ctx.Process(target=rodar_ponte, args=(alvo, modo, duracao, i, resultados)) for i in range(pontes)]
+    for p in processos:
+        p.start()
+    total = sum(resultados.get() for _ in processos)
+    for p in processos:
+        p.join()
+    return total / duracao
+
+
+def iniciar_servidor(modo, write_concern):
+    env = dict(os.environ, SSACP_MODO_SERVIDOR=modo, SSACP_PORTA=str(PORTA_GRPC),
+               SSACP_BANCO=BANCO_BENCH, SSACP_WRITE_CONCERN=write_concern, MONGO_URI=MONGO_URI)
+    processo = subprocess.Popen([sys.executable, os.path.join(RAIZ, "ssacp", "main_server.py")], env=env,
+                                stdout=subprocess.DEVNULL)
+    time.sleep(2)
+    return processo
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--servidor", choices=["threads", "aio", "nenhum"], default="aio")
+    parser.add_argument("--alvo", default=f"localhost:{PORTA_GRPC}")
+    parser.add_argument("--write-concern", default="", help="1, majority ou vazio (padrão do servidor)")
+    parser.add_argument("--modo-envio", default="fluxo")
+    parser.add_argument("--pontes", type=int, nargs="+", default=[1, 5, 15, 30])
+    parser.add_argument("--duracao", type=float, default=15)
+    args = parser.parse_args()
+
+    servidor = None
+    if args.servidor != "nenhum":
+        resetar_banco(pymongo.MongoClient(MONGO_URI)[BANCO_BENCH])
+        servidor = iniciar_servidor(args.servidor, args.write_concern)
+    try:
+        for pontes in args.pontes:
+            vazao = medir(args.alvo, args.modo_envio, pontes, args.duracao)
+            print(json.dumps({"servidor": args.servidor, "write_concern": args.write_concern,
+                              "modo_envio": args.modo_envio, "pontes": pontes,
+                              "vazao_msgs_s": round(vazao, 1)}), flush=True)
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+
+if __name__ == '__main__':
+    main()
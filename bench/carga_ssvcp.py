@@ -0,0 +1,150 @@
+"""Teste de carga do SSVCP: req/s e latência com 1, 50 e 500 clientes simultâneos.
+
+Os clientes ficam em vários processos (threads com conexão keep-alive em cada
+um) para o próprio gerador não ser o gargalo. O SSVCP pode ser iniciado pelo
+script (servidor de desenvolvimento ou gunicorn) lendo o banco de benchmark.
+
+Uso:
+    python bench/carga_ssvcp.py --servidor gunicorn --workers 4 --clientes 1 50 500
+    python bench/carga_ssvcp.py --servidor dev --clientes 1 50 500
+    python bench/carga_ssvcp.py --servidor nenhum --alvo localhost:5000
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import pymongo
+
+from util_bench import (MONGO_URI, BANCO_BENCH, NUM_SETORES, nomes_carros, documento_historico,
+                        resetar_banco, resumo_latencias)
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PORTA_HTTP = 5065
+
+
+def cliente(host, porta, rota, fim, latencias, erros):
+    conexao = http.client.HTTPConnection(host, porta, timeout=30)
+    while time.monotonic() < fim:
+        inicio = time.perf_counter()
+        try:
+            conexao.request("GET", rota)
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status != 200:
+                erros.append(resposta.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            erros.append("conexao")
+            conexao.close()
+            conexao = http.client.HTTPConnection(host, porta, timeout=30)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+    conexao.close()
+
+
+def rodar_processo(alvo, rota, threads, duracao, resultados):
+    host, porta = alvo.rsplit(":", 1)
+    latencias, erros = [], []
+    fim = time.monotonic() + duracao
+    clientes = [threading.Thread(target=cliente, args=(host, int(porta), rota, fim, latencias, erros))
+                for _ in range(threads)]
+    for t in clientes:
+        t.start()
+    for t in clientes:
+        t.join()
+    resultados.put((latencias, len(erros)))
+
+
+def medir(alvo, rota, clientes, duracao, processos_max):
+    ctx = multiprocessing.get_context("spawn")
+    resultados = ctx.Queue()
+    qtd_processos = min(clientes, processos_max)
+    divisao = [clientes // qtd_processos + (1 if i < clientes % qtd_processos else 0) for i in range(qtd_processos)]
+    processos = [ctx.Process(target=rodar_processo, args=(alvo, rota, n, duracao, resultados)) for n in divisao]
+    for p in processos:
+        p.start()
+    latencias, erros = [], 0
+    for _ in processos:
+        parcial, erros_parcial = resultados.get()
+        latencias.extend(parcial)
+        erros += erros_parcial
+    for p in processos:
+        p.join()
+    return latencias, erros
+
+
+def popular_snapshot(banco, carros):
+    from ssacp.persistencia import montar_operacoes_snapshot
+
+    rng = random.Random(3)
+    agora = time.time()
+    docs = [documento_historico(c, 10, i % NUM_SETORES, agora, rng=rng) for i, c in enumerate(nomes_carros(carros))]
+    banco["latest_by_car"].bulk_write(montar_operacoes_snapshot(docs), ordered=False)
+
+
+def iniciar_servidor(modo, workers, threads):
+    env = dict(os.environ, SSVCP_BANCO=BANCO_BENCH, MONGO_URI=MONGO_URI, SSVCP_LOG_LEVEL="WARNING",
+               SSVCP_PORTA=str(PORTA_HTTP), SSVCP_BIND=f"127.0.0.1:{PORTA_HTTP}",
+               SSVCP_WORKERS=str(workers), SSVCP_THREADS=str(threads))
+    if modo == "gunicorn":
+        comando = [sys.executable, "-m", "gunicorn", "-c", os.path.join(RAIZ, "ssvcp", "gunicorn.conf.py"),
+                   "ssvcp.app:app"]
+    else:
+        comando = [sys.executable, os.path.join(RAIZ, "ssvcp", "app.py")]
+    processo = subprocess.Popen(comando, env=env, cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # Espera o /readyz responder
+    for _ in range(50):
+        try:
+            conexao = http.client.HTTPConnection("127.0.0.1", PORTA_HTTP, timeout=1)
+            conexao.request("GET", "/readyz")
+            if conexao.getresponse().status == 200:
+                break
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return processo
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--servidor", choices=["dev", "gunicorn", "nenhum"], default="gunicorn")
+    parser.add_argument("--alvo", default=f"127.0.0.1:{PORTA_HTTP}")
+    parser.add_argument("--rota", default="/api/telemetria")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=136)
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--duracao", type=float, default=15)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 4,
+                        help="processos geradores de carga")
+    args = parser.parse_args()
+
+    servidor = None
+    if args.servidor != "nenhum":
+        client = pymongo.MongoClient(MONGO_URI)
+        resetar_banco(client[BANCO_BENCH])
+        popular_snapshot(client[BANCO_BENCH], args.carros)
+        client.close()
+        servidor = iniciar_servidor(args.servidor, args.workers, args.threads)
+    try:
+        for clientes in args.clientes:
+            latencias, erros = medir(args.alvo, args.rota, clientes, args.duracao, args.processos)
+            linha = {"servidor": args.servidor, "rota": args.rota, "clientes": clientes,
+                     "req_s": round(len(latencias) / args.duracao, 1), "erros": erros}
+            linha.update(resumo_latencias(latencias))
+            print(json.dumps(linha), flush=True)
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""Balanceamento das pontes entre 3 réplicas do SSACP e failover.
+
+Sobe 3 SSACPs em processo (portas 50081-50083, cada um com o seu grpc.health.v1)
+e --pontes pontes ISCCP apontando para a lista das três
+("ipv4:127.0.0.1:50081,127.0.0.1:50082,127.0.0.1:50083"), alimentadas
+direto pelo on_message com a telemetria de uma frota simulada. Fases de
+--fase segundos cada:
+
+1. equilibrio: as três servindo; cada uma deve receber ~1/3 das leituras;
+2. not_serving: a réplica 2 se declara NOT_SERVING e deve sair do rodízio;
+3. queda: a 2 volta a SERVING e a 3 é derrubada (stop(0));
+4. volta: a 3 sobe de novo na mesma porta e volta ao rodízio;
+5. travada: a 3 é trocada por um servidor que se declara SERVING, aceita os
+   lotes e nunca responde (nem confirma no fluxo); os lotes enviados a ela
+   devem vencer o --timeout-rpc, voltar à fila e ir para as outras réplicas,
+   mesmo com a thread de envio parada esperando vaga em voo.
+
+Depois da travada a 3 volta a ser um SSACP normal e as pontes drenam a fila.
+
+No modo unário o rodízio é por lote; no modo fluxo é por fluxo, que é
+renovado a cada --fluxo-idade-max segundos (curto, para uma fase ter fluxos
+bastantes para espalhar a carga). O relatório traz, por fase, a fração das
+leituras que cada réplica gravou e, no fim, publicadas x gravadas (as
+leituras em voo na réplica derrubada ou travada voltam à fila e são
+reenviadas) e as falhas de envio.
+
+Falha (código de saída 1) se, no equilíbrio, alguma réplica se afastar mais
+de --tolerancia do 1/3; se a réplica NOT_SERVING receber mais que essa
+fração; se a réplica derrubada gravar qualquer leitura durante a queda; se a
+fila não drenar; ou se alguma leitura publicada não for gravada.
+
+Uso:
+    python bench/cenario_balanceamento_ssacp.py --modo unario
+    python bench/cenario_balanceamento_ssacp.py --modo fluxo --pontes 6 --fluxo-idade-max 0.5
+    python bench/cenario_balanceamento_ssacp.py --modo fluxo --taxa 40 --mongo mock
+
+Com --mongo mock cada gravação varre as coleções inteiras: acima de umas 40
+leituras/s por ponte as réplicas não dão conta e a fila não drena.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent import futures
+from types import SimpleNamespace
+
+import grpc
+from grpc_health.v1 import health
+
+from util_bench import BANCO_BENCH, MONGO_URI, abrir_mongo, nomes_carros, payload_carro, resetar_banco
+from comum.metricas import Registro
+from isccp.main_isccp import PonteISCCP
+from protos import f1_pb2_grpc
+from ssacp.conexao import FORA, SERVINDO, registrar_saude
+from ssacp.main_server import criar_servidor
+
+PORTAS = (50081, 50082, 50083)
+ALVO = "ipv4:" + ",".join(f"127.0.0.1:{porta}" for porta in PORTAS)
+# Cada fase só começa a contar depois disto (s): os lotes que já estavam
+# sendo gravados na hora da troca não entram na conta da fase nova
+ASSENTAR_S = 1.0
+
+
+class Replica:
+    """Um SSACP em processo; os contadores somam as encarnações (queda e volta)."""
+
+    def __init__(self, porta, banco):
+        self.porta = porta
+        self.banco = banco
+        self.registros = []
+        self.subir()
+
+    def subir(self):
+        registro = Registro()
+        self.saude = health.HealthServicer()
+        # Sem monitor do banco: o estado de saúde é definido pelo cenário
+        self.servidor = criar_servidor(self.porta, self.banco, registro, self.saude, intervalo_saude=0)
+        self.servidor.start()
+        self.registros.append(registro)
+
+    def derrubar(self):
+        self.servidor.stop(0).wait()
+
+    def travar(self):
+        """Troca o SSACP por um servidor travado na mesma porta."""
+        self.derrubar()
+        self.servidor = grpc.server(futures.ThreadPoolExecutor(max_workers=32))
+        f1_pb2_grpc.add_MonitoramentoServicer_to_server(ServicoTravado(), self.servidor)
+        registrar_saude(self.servidor)
+        self.servidor.add_insecure_port(f'[::]:{self.porta}')
+        self.servidor.start()
+
+    def leituras(self):
+        return sum(r.buscar("ssacp_leituras_total")[0].valor for r in self.registros)
+
+
+class ServicoTravado(f1_pb2_grpc.MonitoramentoServicer):
+    """Recebe os lotes e nunca responde: nem a resposta unária, nem as confirmações do fluxo."""
+
+    def EnviarLotePneus(self, request, context):
+        while context.is_active():
+            time.sleep(0.1)
+        return None
+
+    def FluxoPneus(self, request_iterator, context):
+        for _ in request_iterator:
+            pass
+        return iter(())
+
+
+def alimentar(ponte, carros, taxa, parar, contador):
+    """Entrega `taxa` leituras/s à ponte como se viessem do broker."""
+    rng = random.Random(hash(carros[0]))
+    inicio = time.time()
+    passo = 0
+    while not parar.is_set():
+        t0 = time.monotonic()
+        for carro in carros:
+            payload = payload_carro(carro, 1 + passo // 15, passo % 15, round(inicio + passo * 0.001, 3), rng)
+            ponte.on_message(None, None, SimpleNamespace(payload=json.dumps(payload).encode()))
+            contador[0] += 1
+        passo += 1
+        parar.wait(max(0.0, len(carros) / taxa - (time.monotonic() - t0)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modo", choices=["unario", "fluxo"], default="unario")
+    parser.add_argument("--pontes", type=int, default=3)
+    parser.add_argument("--carros-por-ponte", type=int, default=8)
+    parser.add_argument("--taxa", type=float, default=400, help="leituras/s por ponte")
+    parser.add_argument("--fase", type=float, default=8, help="duração de cada fase (s)")
+    parser.add_argument("--fluxo-idade-max", type=float, default=0.5, help="renovação do fluxo (s)")
+    parser.add_argument("--compressao", default="", help='"" ou gzip')
+    parser.add_argument("--envios-em-voo", type=int, default=2,
+                        help="lotes sem confirmação por ponte (pequeno, para a travada lotar a janela)")
+    parser.add_argument("--timeout-rpc", type=float, default=2, help="prazo de resposta/confirmação (s)")
+    parser.add_argument("--tolerancia", type=float, default=0.1,
+                        help="desvio máximo da fração de 1/3 no equilíbrio (e fração máxima da NOT_SERVING)")
+    parser.add_argument("--mongo", default=MONGO_URI, help='URI do Mongo ou "mock"')
+    args = parser.parse_args()
+
+    client = abrir_mongo(args.mongo)
+    banco = client[BANCO_BENCH]
+    try:
+        resetar_banco(banco)
+    except Exception as e:
+        print(f"[BENCH] Preparação do banco incompleta ({e}); usando coleções simples.")
+    replicas = [Replica(porta, banco) for porta in PORTAS]
+
+    carros = nomes_carros(args.pontes * args.carros_por_ponte)
+    pontes, publicadas = [], [0]
+    parar_frota, parar_pontes = threading.Event(), threading.Event()
+    for i in range(args.pontes):
+        ponte = PonteISCCP(grpc_host=ALVO, grupo="", modo_envio=args.modo, lote_max=50, lote_idade_max=0.1,
+                           envios_em_voo=args.envios_em_voo,
+                           compressao=args.compressao, fluxo_idade_max=args.fluxo_idade_max,
+                           timeout_rpc=args.timeout_rpc)
+        threading.Thread(target=ponte.rotina_envio_periodico, args=(parar_pontes,), daemon=True).start()
+        threading.Thread(target=alimentar, daemon=True,
+                         args=(ponte, carros[i::args.pontes], args.taxa, parar_frota, publicadas)).start()
+        pontes.append(ponte)
+
+    fases = []
+
+    def fase(nome, antes=None):
+        if antes:
+            antes()
+        time.sleep(ASSENTAR_S)
+        inicio = [r.leituras() for r in replicas]
+        time.sleep(args.fase)
+        delta = [r.leituras() - i for r, i in zip(replicas, inicio)]
+        total = sum(delta) or 1
+        linha = {"fase": nome, "leituras_por_replica": delta,
+                 "fracao_por_replica": [round(d / total, 3) for d in delta]}
+        print(json.dumps(linha), flush=True)
+        fases.append(linha)
+
+    time.sleep(1)  # conexões e health checks das pontes
+    fase("equilibrio")
+    fase("not_serving", lambda: replicas[1].saude.set(health.OVERALL_HEALTH, FORA))
+
+    def derrubar():
+        replicas[1].saude.set(health.OVERALL_HEALTH, SERVINDO)
+        replicas[2].derrubar()
+
+    fase("queda", derrubar)
+    fase("volta", replicas[2].subir)
+    fase("travada", replicas[2].travar)
+
+    parar_frota.set()
+    replicas[2].derrubar()
+    replicas[2].subir()
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite and not all(p.ocioso() for p in pontes):
+        time.sleep(0.2)
+    drenou = all(p.ocioso() for p in pontes)
+    gravadas = banco["pneus"].count_documents({})
+
+    equilibrio = fases[0]["fracao_por_replica"]
+    relatorio = {
+        "modo": args.modo,
+        "pontes": args.pontes,
+        "desvio_max_equilibrio": round(max(abs(f - 1 / len(PORTAS)) for f in equilibrio), 3),
+        "publicadas": publicadas[0],
+        "gravadas": gravadas,
+        "perdidas": publicadas[0] - gravadas,
+        "falhas_envio": sum(p.falhas_envio.valor for p in pontes),
+        "drenou": drenou,
+        "fases": fases,
+    }
+    falhas = []
+    if relatorio["desvio_max_equilibrio"] > args.tolerancia:
+        falhas.append(f"equilíbrio: desvio {relatorio['desvio_max_equilibrio']} acima de {args.tolerancia}")
+    if fases[1]["fracao_por_replica"][1] > args.tolerancia:
+        falhas.append(f"not_serving: a réplica 2 ainda gravou {fases[1]['fracao_por_replica'][1]} das leituras")
+    if fases[2]["leituras_por_replica"][2]:
+        falhas.append(f"queda: a réplica 3 derrubada gravou {fases[2]['leituras_por_replica'][2]} leituras")
+    if not drenou:
+        falhas.append("as pontes não drenaram a fila em 60s")
+    if relatorio["perdidas"]:
+        falhas.append(f"{relatorio['perdidas']} leituras publicadas não foram gravadas")
+    relatorio["falhas"] = falhas
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+    parar_pontes.set()
+    for ponte in pontes:
+        ponte.parar()
+    for replica in replicas:
+        replica.derrubar()
+    client.close()
+    if falhas:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Injeção de falha: o SSACP cai por 60s enquanto 24 carros publicam.
+
+Sobe um SSACP em processo, uma ponte ISCCP com buffer limitado e um
+publicador que simula a frota. Depois do aquecimento o servidor é parado,
+fica fora por --queda segundos e volta na mesma porta. O relatório mostra o
+que foi publicado, gravado, descartado e mandado para o disco, além do
+tempo que a ponte levou para drenar a fila depois da volta do servidor.
+
+Falha (código de saída 1) se a fila não drenar em 120s ou, com a política
+"disco", se alguma leitura publicada não for gravada.
+
+Uso:
+    python bench/cenario_falha_ssacp.py --politica disco --buffer 1000
+    python bench/cenario_falha_ssacp.py --politica descartar_antigas --buffer 1000
+"""
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+import pymongo
+
+from util_bench import (MONGO_URI, BANCO_BENCH, NUM_SETORES, nomes_carros, payload_carro, resetar_banco,
+                        topico_carro)
+from isccp.main_isccp import PonteISCCP
+from ssacp.main_server import criar_servidor
+
+PORTA_GRPC = 50062
+
+
+def publicar_frota(publicador, carros, intervalo, parar, contador):
+    rng = random.Random(3)
+    passo = 0
+    while not parar.is_set():
+        agora = time.time()
+        for carro in carros:
+            payload = payload_carro(carro, 1 + passo // NUM_SETORES, passo % NUM_SETORES, agora, rng)
+            publicador.publish(topico_carro(carro), json.dumps(payload), qos=1)
+            contador[0] += 1
+        passo += 1
+        parar.wait(intervalo)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--intervalo", type=float, default=0.4, help="segundos entre setores de cada carro")
+    parser.add_argument("--aquecimento", type=float, default=10)
+    parser.add_argument("--queda", type=float, default=60)
+    parser.add_argument("--depois", type=float, default=20)
+    parser.add_argument("--buffer", type=int, default=1000)
+    parser.add_argument("--politica", default="disco")
+    args = parser.parse_args()
+
+    mongo = pymongo.MongoClient(MONGO_URI)
+    banco = mongo[BANCO_BENCH]
+    resetar_banco(banco)
+
+    dir_disco = tempfile.mkdtemp(prefix="isccp_fila_")
+    servidor = criar_servidor(PORTA_GRPC, banco)
+    servidor.start()
+
+    ponte = PonteISCCP(broker=args.broker, grpc_host=f"localhost:{PORTA_GRPC}", grupo="",
+                       buffer_max=args.buffer, politica_excesso=args.politica, dir_disco=dir_disco)
+    ponte.conectar()
+    parar_ponte = threading.Event()
+    threading.Thread(target=ponte.rotina_envio_periodico, args=(parar_ponte,), daemon=True).start()
+    time.sleep(2)
+
+    publicador = mqtt.Client(client_id=f"Bench_Frota_{random.randint(1000, 99999)}")
+    publicador.connect(args.broker, 1883)
+    publicador.loop_start()
+    parar_frota = threading.Event()
+    publicadas = [0]
+    threading.Thread(target=publicar_frota,
+                     args=(publicador, nomes_carros(args.carros), args.intervalo, parar_frota, publicadas),
+                     daemon=True).start()
+
+    maior_fila = [0]
+
+    def amostrar_fila():
+        while not parar_ponte.is_set():
+            with ponte.lock:
+                maior_fila[0] = max(maior_fila[0], len(ponte.fila))
+            time.sleep(0.2)
+
+    threading.Thread(target=amostrar_fila, daemon=True).start()
+
+    time.sleep(args.aquecimento)
+    print(f"[BENCH] Derrubando o SSACP por {args.queda:.0f}s...")
+    servidor.stop(0)
+    time.sleep(args.queda)
+    servidor = criar_servidor(PORTA_GRPC, banco)
+    servidor.start()
+    volta_servidor = time.monotonic()
+    print("[BENCH] SSACP de volta.")
+
+    time.sleep(args.depois)
+    parar_frota.set()
+    time.sleep(1)
+
+    # Espera a fila (memória + disco) esvaziar
+    limite = time.monotonic() + 120
+    drenou = False
+    while time.monotonic() < limite:
+        if ponte.ocioso():
+            drenou = True
+            break
+        time.sleep(0.5)
+    tempo_drenagem = time.monotonic() - volta_servidor
+
+    gravadas = banco["pneus"].count_documents({})
+    relatorio = {
+        "politica": args.politica,
+        "buffer_max": args.buffer,
+        "queda_s": args.queda,
+        "publicadas": publicadas[0],
+        "recebidas_ponte": ponte.recebidas,
+        "gravadas": gravadas,
+        "perdidas": publicadas[0] - gravadas,
+        "descartadas_politica": ponte.fila.descartadas,
+        "enviadas_ao_disco": ponte.fila.enviadas_ao_disco,
+        "maior_fila_memoria": maior_fila[0],
+        "drenou": drenou,
+        "tempo_ate_drenar_s": round(tempo_drenagem, 1),
+        "lote": ponte.hist_tamanho_lote.resumo(),
+        "latencia_envio": ponte.hist_latencia_envio.resumo(),
+    }
+    # Com o disco nada pode ser descartado: tudo que foi publicado tem de chegar ao banco
+    falhas = []
+    if not drenou:
+        falhas.append("a fila da ponte não drenou em 120s")
+    if args.politica == "disco" and gravadas != publicadas[0]:
+        falhas.append(f"política disco: {gravadas} gravadas de {publicadas[0]} publicadas")
+    relatorio["falhas"] = falhas
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+    parar_ponte.set()
+    publicador.loop_stop()
+    ponte.parar()
+    servidor.stop(0)
+    mongo.close()
+    shutil.rmtree(dir_disco, ignore_errors=True)
+    if falhas:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Verifica a ingestão particionada: N pontes ISCCP no mesmo processo,
+assinatura compartilhada no broker local e um SSACP em processo.
+
+Cada mensagem publicada deve ser gravada exatamente uma vez, inclusive
+quando uma fração delas é republicada (simulando reentrega do broker).
+
+Uso:
+    python bench/cenario_ingestao_particionada.py --pontes 5 --carros 24 --mensagens 2400
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+import pymongo
+
+from util_bench import (MONGO_URI, BANCO_BENCH, NUM_SETORES, nomes_carros, payload_carro, resetar_banco,
+                        topico_carro)
+from isccp.main_isccp import PonteISCCP
+from ssacp.main_server import criar_servidor
+
+PORTA_GRPC = 50061
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--pontes", type=int, default=5)
+    parser.add_argument("--carros", type=int, default=24)
+    parser.add_argument("--mensagens", type=int, default=2400)
+    parser.add_argument("--grupo", default="isccp_bench",
+                        help="grupo $share; vazio = todas as pontes recebem tudo (testa só a deduplicação)")
+    parser.add_argument("--reentrega", type=float, default=0.1, help="fração republicada")
+    args = parser.parse_args()
+
+    mongo = pymongo.MongoClient(MONGO_URI)
+    banco = mongo[BANCO_BENCH]
+    resetar_banco(banco)
+
+    servidor = criar_servidor(PORTA_GRPC, banco)
+    servidor.start()
+
+    parar = threading.Event()
+    pontes = [PonteISCCP(broker=args.broker, grpc_host=f"localhost:{PORTA_GRPC}", grupo=args.grupo)
+              for _ in range(args.pontes)]
+    for ponte in pontes:
+        ponte.conectar()
+        threading.Thread(target=ponte.rotina_envio_periodico, args=(parar,), daemon=True).start()
+    time.sleep(2)  # espera as assinaturas
+
+    publicador = mqtt.Client(client_id=f"Bench_Pub_{random.randint(1000, 99999)}")
+    publicador.connect(args.broker, 1883)
+    publicador.loop_start()
+
+    rng = random.Random(7)
+    carros = nomes_carros(args.carros)
+    mensagens = []
+    inicio = time.time()
+    for i in range(args.mensagens):
+        passo = i // args.carros
+        carro = carros[i % args.carros]
+        payload = payload_carro(carro, 1 + passo // NUM_SETORES, passo % NUM_SETORES, inicio + passo * 0.5, rng)
+        mensagens.append((topico_carro(carro), json.dumps(payload)))
+
+    republicadas = rng.sample(mensagens, int(len(mensagens) * args.reentrega))
+    for topico, payload in mensagens + republicadas:
+        publicador.publish(topico, payload, qos=1).wait_for_publish()
+
+    # Espera os buffers esvaziarem (envio periódico de 3s)
+    limite = time.time() + 30
+    while time.time() < limite and banco["pneus"].count_documents({}) < len(mensagens):
+        time.sleep(1)
+    time.sleep(4)
+
+    gravadas = banco["pneus"].count_documents({})
+    por_ponte = [p.recebidas for p in pontes]
+    relatorio = {
+        "pontes": args.pontes,
+        "publicadas": len(mensagens),
+        "republicadas": len(republicadas),
+        "recebidas_por_ponte": por_ponte,
+        "recebidas_total": sum(por_ponte),
+        "gravadas": gravadas,
+        "exatamente_uma_vez": gravadas == len(mensagens),
+        "carros_no_snapshot": banco["latest_by_car"].count_documents({}),
+    }
+    print(json.dumps(relatorio, indent=2))
+
+    parar.set()
+    publicador.loop_stop()
+    for ponte in pontes:
+        ponte.parar()
+    servidor.stop(0)
+    mongo.close()
+    if not relatorio["exatamente_uma_vez"]:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
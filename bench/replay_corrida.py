@@ -0,0 +1,333 @@
+"""Grava e reproduz corridas para testar regressões no caminho de ingestão.
+
+Três comandos:
+
+    gerar       corrida sintética da frota (car/frota.py, semente fixa)
+    gravar      assina f1/pneus/# num broker e grava o que os carros publicarem
+    reproduzir  reenvia a corrida a 1x, 10x... ou na velocidade máxima
+
+O arquivo é JSONL, uma mensagem por linha: {"t": segundos desde o início,
+"topico": ..., "json": {...}} ou, para payloads protobuf, {"pb": base64}.
+
+Na reprodução o destino pode ser:
+
+    mqtt    publica no broker (--broker; ex. um mosquitto local); uma ponte
+            ISCCP e um SSACP sobem no próprio processo, assinando esse broker
+    isccp   entrega direto no on_message da ponte ISCCP local (sem broker)
+    ssacp   monta os lotes como a ponte e chama o SSACP local por gRPC
+
+O SSACP local grava em --mongo (um mongod local; "mock" usa o mongomock, se
+instalado). Cada leitura recebe o timestamp do momento do reenvio (a latência
+é medida a partir dele e a mesma corrida pode ser reproduzida de novo no mesmo
+banco); --manter-timestamp mantém o original, para testar a deduplicação.
+
+O relatório (JSON, na saída e em --relatorio) traz vazão oferecida e gravada,
+percentis de latência por salto (histogramas do SSACP, ver comum/metricas.py),
+leituras perdidas/duplicadas e o tamanho do banco. A reprodução sai com
+código 1 se alguma leitura da corrida não for gravada, for gravada duas vezes
+ou aparecer uma leitura que não estava na corrida.
+
+Uso:
+    python bench/replay_corrida.py gerar --carros 24 --voltas 10 --saida corrida.jsonl
+    python bench/replay_corrida.py gravar --broker localhost --duracao 300 --saida corrida.jsonl
+    python bench/replay_corrida.py reproduzir corrida.jsonl --destino isccp --velocidade max --mongo mock
+    python bench/replay_corrida.py reproduzir corrida.jsonl --destino mqtt --velocidade 10 --relatorio rel.json
+"""
+import argparse
+import base64
+import json
+import threading
+import time
+
+import grpc
+import paho.mqtt.client as mqtt
+
+from util_bench import MONGO_URI, BANCO_BENCH, abrir_mongo, corrida_frota, resetar_banco, topico_carro
+from car.main_car import codificar_payload
+from comum.metricas import Registro
+from isccp.codificacao import StubBytes, carimbar_recebido, json_para_dados_carro, montar_lista
+from isccp.main_isccp import PonteISCCP, MODO_FLUXO
+from protos import f1_pb2
+from ssacp.main_server import criar_servidor
+from ssacp.persistencia import chave_idempotente
+
+PORTA_SSACP = 50061
+DESTINOS = ("mqtt", "isccp", "ssacp")
+
+
+class MensagemMqtt:
+    def __init__(self, topico, payload):
+        self.topic = topico
+        self.payload = payload
+
+
+# --- Arquivo da corrida ---
+
+def linha_corrida(t, topico, payload):
+    """Mensagem MQTT (bytes) -> linha do arquivo."""
+    if payload[:1] == b"{":
+        return {"t": round(t, 4), "topico": topico, "json": json.loads(payload)}
+    return {"t": round(t, 4), "topico": topico, "pb": base64.b64encode(payload).decode()}
+
+
+def ler_corrida(caminho):
+    """Linhas do arquivo -> [(t, tópico, "json"|"pb", dict ou DadosCarro)] em ordem de t."""
+    mensagens = []
+    with open(caminho) as arquivo:
+        for linha in arquivo:
+            if not linha.strip():
+                continue
+            registro = json.loads(linha)
+            if "json" in registro:
+                mensagens.append((registro["t"], registro["topico"], "json", registro["json"]))
+            else:
+                item = f1_pb2.DadosCarro.FromString(base64.b64decode(registro["pb"]))
+                mensagens.append((registro["t"], registro["topico"], "pb", item))
+    mensagens.sort(key=lambda m: m[0])
+    return mensagens
+
+
+def comando_gerar(args):
+    payloads = corrida_frota(args.carros, args.voltas, args.semente, args.amostras_por_setor)
+    with open(args.saida, "w") as arquivo:
+        for p in payloads:
+            payload = codificar_payload(p, args.formato)
+            payload = payload.encode() if isinstance(payload, str) else payload
+            arquivo.write(json.dumps(linha_corrida(p["timestamp"], topico_carro(p["carro_id"]), payload)) + "\n")
+    print(json.dumps({"arquivo": args.saida, "mensagens": len(payloads), "carros": args.carros}))
+
+
+def comando_gravar(args):
+    inicio = None
+    gravadas = 0
+    lock = threading.Lock()
+    arquivo = open(args.saida, "w")
+
+    def on_message(client, userdata, msg):
+        nonlocal inicio, gravadas
+        agora = time.time()
+        with lock:
+            if inicio is None:
+                inicio = agora
+            arquivo.write(json.dumps(linha_corrida(agora - inicio, msg.topic, msg.payload)) + "\n")
+            gravadas += 1
+
+    client = mqtt.Client(client_id=f"F1Gravador_{int(time.time())}")
+    client.on_message = on_message
+    client.connect(args.broker, args.porta_broker)
+    client.subscribe("f1/pneus/#")
+    client.loop_start()
+    try:
+        time.sleep(args.duracao)
+    except KeyboardInterrupt:
+        pass
+    client.loop_stop()
+    client.disconnect()
+    arquivo.close()
+    print(json.dumps({"arquivo": args.saida, "mensagens": gravadas}))
+
+
+# --- Reprodução ---
+
+def preparar_mensagem(formato, dados, manter_timestamp):
+    """Aplica o timestamp do reenvio. Retorna (DadosCarro, bytes no formato original)."""
+    if formato == "json":
+        payload = dict(dados)
+        if not manter_timestamp:
+            payload["timestamp"] = time.time()
+        return json_para_dados_carro(payload), json.dumps(payload).encode()
+    item = f1_pb2.DadosCarro()
+    item.CopyFrom(dados)
+    if not manter_timestamp:
+        item.timestamp = str(time.time())
+    return item, item.SerializeToString()
+
+
+class EntradaSSACP:
+    """Destino "ssacp": lotes montados como a ponte, enviados por EnviarLotePneus."""
+
+    def __init__(self, canal, lote_max, lote_idade_max=0.1):
+        self.stub = StubBytes(canal)
+        self.lote_max = lote_max
+        self.lote_idade_max = lote_idade_max
+        self.itens = []
+        self.inicio = 0.0
+
+    def enviar(self, dados):
+        if not self.itens:
+            self.inicio = time.monotonic()
+        self.itens.append(carimbar_recebido(dados, time.time()))
+        if len(self.itens) >= self.lote_max or time.monotonic() - self.inicio >= self.lote_idade_max:
+            self.descarregar()
+
+    def descarregar(self):
+        if self.itens:
+            self.stub.EnviarLotePneus(montar_lista(self.itens, time.time()), timeout=30)
+            self.itens = []
+
+
+def tamanho_banco(banco):
+    try:
+        estatisticas = banco.command("dbStats")
+        return {"dados_bytes": estatisticas.get("dataSize"), "armazenamento_bytes": estatisticas.get("storageSize"),
+                "indices_bytes": estatisticas.get("indexSize")}
+    except Exception:
+        return None  # mongomock não implementa dbStats
+
+
+def esperar_gravacao(pneus, esperadas, ponte, limite_s):
+    """Espera a ponte esvaziar e o total de leituras parar de crescer."""
+    fim = time.monotonic() + limite_s
+    anterior = -1
+    while time.monotonic() < fim:
+        total = pneus.count_documents({})
+        if total >= esperadas and (ponte is None or ponte.ocioso()):
+            return total
+        if total == anterior and ponte is not None and ponte.ocioso():
+            return total
+        anterior = total
+        time.sleep(0.5)
+    return pneus.count_documents({})
+
+
+def resumo_saltos(registro):
+    resumo = {}
+    for hist in registro.buscar("f1_latencia_salto_s"):
+        _, soma, total = hist.estado()
+        if total:
+            resumo[hist.rotulos["salto"]] = {"n": total, "media_ms": round(soma / total * 1000, 3),
+                             "p50_ms<=": hist.percentil(50) * 1000, "p99_ms<=": hist.percentil(99) * 1000}
+    return resumo
+
+
+def comando_reproduzir(args):
+    mensagens = ler_corrida(args.arquivo)
+    if args.limite:
+        mensagens = mensagens[:args.limite]
+    velocidade = None if args.velocidade == "max" else float(args.velocidade)
+
+    client = abrir_mongo(args.mongo)
+    banco = client[BANCO_BENCH]
+    try:
+        resetar_banco(banco)
+    except Exception as e:
+        # mongomock não cria coleções time-series; segue com coleções comuns
+        print(f"[REPLAY] Preparação do banco incompleta ({e}); usando coleções simples.")
+    registro = Registro()
+    servidor = criar_servidor(PORTA_SSACP, banco, registro)
+    servidor.start()
+    canal = grpc.insecure_channel(f"localhost:{PORTA_SSACP}")
+
+    ponte = entrada = publicador = None
+    if args.destino in ("mqtt", "isccp"):
+        ponte = PonteISCCP(broker=args.broker, porta_broker=args.porta_broker, grpc_host=f"localhost:{PORTA_SSACP}",
+                           buffer_max=len(mensagens) + 1, modo_envio=MODO_FLUXO)
+        parar_ponte = threading.Event()
+        t_ponte = threading.Thread(target=ponte.rotina_envio_periodico, args=(parar_ponte,), daemon=True)
+        t_ponte.start()
+        if args.destino == "mqtt":
+            ponte.conectar()
+            publicador = mqtt.Client(client_id=f"F1Replay_{int(time.time())}")
+            publicador.connect(args.broker, args.porta_broker)
+            publicador.loop_start()
+            time.sleep(1.0)  # assinatura da ponte ativa antes do primeiro publish
+    else:
+        entrada = EntradaSSACP(canal, args.lote)
+
+    esperadas = set()
+    inicio = time.monotonic()
+    t0 = mensagens[0][0] if mensagens else 0.0
+    for t, topico, formato, dados in mensagens:
+        if velocidade:
+            atraso = inicio + (t - t0) / velocidade - time.monotonic()
+            if atraso > 0:
+                time.sleep(atraso)
+        item, payload = preparar_mensagem(formato, dados, args.manter_timestamp)
+        esperadas.add(chave_idempotente(item))
+        if args.destino == "mqtt":
+            publicador.publish(topico, payload)
+        elif args.destino == "isccp":
+            ponte.on_message(None, None, MensagemMqtt(topico, payload))
+        else:
+            entrada.enviar(item.SerializeToString())
+    if entrada is not None:
+        entrada.descarregar()
+    duracao_envio = time.monotonic() - inicio
+
+    pneus = banco["pneus"]
+    total = esperar_gravacao(pneus, len(esperadas), ponte, args.espera_max)
+    duracao_total = time.monotonic() - inicio
+    gravadas = {doc["_id"] for doc in pneus.find({}, {"_id": 1})}
+
+    relatorio = {
+        "arquivo": args.arquivo, "destino": args.destino, "velocidade": args.velocidade, "mongo": args.mongo,
+        "mensagens": len(mensagens), "leituras_unicas": len(esperadas),
+        "duracao_envio_s": round(duracao_envio, 3), "duracao_ate_gravar_s": round(duracao_total, 3),
+        "vazao_oferecida_msgs_s": round(len(mensagens) / duracao_envio, 1) if duracao_envio else None,
+        "vazao_gravada_msgs_s": round(len(gravadas) / duracao_total, 1) if duracao_total else None,
+        "latencia_por_salto": resumo_saltos(registro),
+        "perdidas": len(esperadas - gravadas),
+        "duplicadas": total - len(gravadas),
+        "inesperadas": len(gravadas - esperadas),
+        "banco": {"documentos": total, **(tamanho_banco(banco) or {})},
+    }
+    if ponte is not None:
+        relatorio["isccp_descartadas"] = ponte.fila.descartadas
+        if publicador is not None:
+            publicador.loop_stop()
+            publicador.disconnect()
+            ponte.client.loop_stop()
+            ponte.client.disconnect()
+        parar_ponte.set()
+        t_ponte.join()
+        ponte.channel.close()
+    canal.close()
+    servidor.stop(0)
+
+    texto = json.dumps(relatorio, indent=2)
+    print(texto)
+    if args.relatorio:
+        with open(args.relatorio, "w") as arquivo:
+            arquivo.write(texto + "\n")
+    if relatorio["perdidas"] or relatorio["duplicadas"] or relatorio["inesperadas"]:
+        raise SystemExit(1)
+    return relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    gerar = comandos.add_parser("gerar", help="corrida sintética da frota")
+    gerar.add_argument("--carros", type=int, default=24)
+    gerar.add_argument("--voltas", type=int, default=10)
+    gerar.add_argument("--semente", type=int, default=42)
+    gerar.add_argument("--amostras-por-setor", type=int, default=1)
+    gerar.add_argument("--formato", choices=["json", "protobuf"], default="json")
+    gerar.add_argument("--saida", required=True)
+
+    gravar = comandos.add_parser("gravar", help="grava o que os carros publicam no broker")
+    gravar.add_argument("--broker", default="localhost")
+    gravar.add_argument("--porta-broker", type=int, default=1883)
+    gravar.add_argument("--duracao", type=float, default=300.0)
+    gravar.add_argument("--saida", required=True)
+
+    reproduzir = comandos.add_parser("reproduzir", help="reenvia a corrida e gera o relatório")
+    reproduzir.add_argument("arquivo")
+    reproduzir.add_argument("--destino", choices=DESTINOS, default="isccp")
+    reproduzir.add_argument("--velocidade", default="max", help="1, 10, ... ou max")
+    reproduzir.add_argument("--mongo", default=MONGO_URI, help='URI do Mongo ou "mock"')
+    reproduzir.add_argument("--broker", default="localhost")
+    reproduzir.add_argument("--porta-broker", type=int, default=1883)
+    reproduzir.add_argument("--lote", type=int, default=500, help="tamanho do lote no destino ssacp")
+    reproduzir.add_argument("--limite", type=int, default=0, help="reproduz só as N primeiras mensagens")
+    reproduzir.add_argument("--manter-timestamp", action="store_true")
+    reproduzir.add_argument("--espera-max", type=float, default=60.0, help="espera (s) pela gravação no fim")
+    reproduzir.add_argument("--relatorio", help="também grava o relatório JSON neste arquivo")
+
+    args = parser.parse_args()
+    {"gerar": comando_gerar, "gravar": comando_gravar, "reproduzir": comando_reproduzir}[args.comando](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Utilitários compartilhados pelos scripts de benchmark.
+
+Os benchmarks rodam contra a infraestrutura local do docker-compose.dev.yml
+(Mongo em localhost:27017, Mosquitto em localhost:1883) e usam um banco
+separado (f1_bench) para não sujar os dados da corrida.
+"""
+import os
+import re
+import sys
+import time
+import random
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from comum.pista import NUM_SETORES  # noqa: E402
+from ssacp.persistencia import POSICOES_PNEU  # noqa: E402
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BANCO_BENCH = os.getenv("BANCO_BENCH", "f1_bench")
+
+
+def nomes_carros(qtd):
+    return [f"Carro_{i:04d}" for i in range(qtd)]
+
+
+def documento_historico(carro_id, volta, setor, timestamp, rng=random):
+    """Documento no mesmo formato que o SSACP grava em `pneus`."""
+    def pneu():
+        return {"temp": round(rng.uniform(80, 120), 1),
+                "desgaste": round(rng.uniform(0, 100), 2),
+                "press": round(rng.uniform(22, 24), 2)}
+
+    return {
+        "carro_id": carro_id,
+        "sensor_responsavel": f"Setor {setor + 1}",
+        "velocidade": float(rng.randint(70, 340)),
+        "volta": volta,
+        "timestamp": datetime.fromtimestamp(timestamp, tz=timezone.utc),
+        "pneus": {"fl": pneu(), "fr": pneu(), "rl": pneu(), "rr": pneu()},
+    }
+
+
+def abrir_mongo(uri):
+    """MongoClient para `uri`; "mock" usa o mongomock (opcional) para rodar sem Mongo."""
+    if uri == "mock":
+        import mongomock
+        return mongomock.MongoClient()
+    import pymongo
+    return pymongo.MongoClient(uri)
+
+
+def resetar_banco(banco):
+    """Apaga os dados do SSACP no banco de benchmark e recria as coleções."""
+    from ssacp.persistencia import preparar_colecoes
+
+    # modelos_desgaste soma com $inc: sem apagar, a rodada seguinte parte dos totais da anterior
+    for nome in ("pneus", "latest_by_car", "chaves_ingestao", "rollups_setor", "rollups_volta",
+                 "modelos_desgaste", "alertas"):
+        banco.drop_collection(nome)
+    preparar_colecoes(banco)
+
+
+def gerar_historico(qtd_docs, qtd_carros=24, inicio=None, rng=random):
+    """Gera `qtd_docs` leituras em ordem de tempo, intercalando os carros."""
+    inicio = inicio or time.time()
+    carros = nomes_carros(qtd_carros)
+    for i in range(qtd_docs):
+        passo = i // qtd_carros
+        yield documento_historico(
+            carros[i % qtd_carros],
+            volta=1 + passo // NUM_SETORES,
+            setor=passo % NUM_SETORES,
+            timestamp=round(inicio + passo * 0.5 + (i % qtd_carros) * 0.001, 3),
+            rng=rng,
+        )
+
+
+def payload_carro(carro_id, volta, setor, timestamp, rng=random):
+    """Mensagem MQTT no formato JSON publicado por car/main_car.py."""
+    def pneu():
+        return {"temperatura": round(rng.uniform(80, 120), 1),
+                "desgaste": round(rng.uniform(0, 100), 2),
+                "pressao": round(rng.uniform(22, 24), 2)}
+
+    return {
+        "carro_id": carro_id,
+        "sensor_responsavel": f"Setor {setor + 1}",
+        "volta": volta,
+        "velocidade": float(rng.randint(70, 340)),
+        "timestamp": timestamp,
+        "pneus": {"fl": pneu(), "fr": pneu(), "rl": pneu(), "rr": pneu()},
+    }
+
+
+def corrida_frota(carros, voltas, semente=42, amostras_por_setor=1):
+    """Corrida gravada sintética: payloads JSON da frota (car/frota.py) em ordem de timestamp.
+
+    O timestamp de cada carro começa em 0 e avança pelo tempo de setor;
+    `amostras_por_setor` > 1 interpola leituras entre setores consecutivos.
+    """
+    import numpy as np
+    from car.frota import SimuladorFrota, nomes_frota, tempo_setor, NOMES_SETOR
+
+    simulador = SimuladorFrota(nomes_frota(carros), semente)
+    relogio = np.zeros(carros)
+    anterior = None
+    payloads = []
+    while simulador.volta.min() <= voltas:
+        indices, velocidade, setor, volta = simulador.passo()
+        atual = simulador.estado.copy()
+        duracao = tempo_setor(velocidade)
+        for k in range(1, amostras_por_setor + 1):
+            # Sem histórico (primeiro setor) só existe a leitura do fim do setor
+            if anterior is None and k < amostras_por_setor:
+                continue
+            fracao = k / amostras_por_setor
+            estado = atual if anterior is None else anterior + (atual - anterior) * fracao
+            for i in indices.tolist():
+                pneus = {p: {"temperatura": round(float(estado[i, j, 1]), 1),
+                             "desgaste": round(float(estado[i, j, 0]), 2),
+                             "pressao": round(float(estado[i, j, 2]), 2)} for j, p in enumerate(POSICOES_PNEU)}
+                payloads.append({"carro_id": simulador.nomes[i], "sensor_responsavel": NOMES_SETOR[setor[i]],
+                                 "volta": int(volta[i]), "velocidade": round(float(velocidade[i]), 0),
+                                 "timestamp": round(float(relogio[i] + duracao[i] * fracao), 3),
+                                 "pneus": pneus})
+        relogio += duracao
+        anterior = atual
+    payloads.sort(key=lambda p: p["timestamp"])
+    return payloads
+
+
+def topico_carro(carro_id):
+    # Mesma regra de car/main_car.py:topico_do_carro
+    return f"f1/pneus/{re.sub(r'[^A-Za-z0-9_-]+', '_', carro_id)}"
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, int(round(p / 100.0 * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+
+def resumo_latencias(valores_s):
+    """Resumo em milissegundos (p50/p99/máx) de uma lista de durações em segundos."""
+    return {
+        "n": len(valores_s),
+        "p50_ms": round(percentil(valores_s, 50) * 1000, 3),
+        "p99_ms": round(percentil(valores_s, 99) * 1000, 3),
+        "max_ms": round(max(valores_s) * 1000, 3) if valores_s else 0.0,
+    }
+
+
+def cronometrar(funcao, repeticoes):
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        duracoes.append(time.perf_counter() - inicio)
+    return duracoes
@@ -0,0 +1,86 @@
+"""Lê o /metrics dos serviços e mostra a latência de cada salto da leitura.
+
+Junta os histogramas f1_latencia_salto_s{salto=...} de todos os endpoints
+(somando réplicas) e imprime, por salto, contagem, média e p50/p99 (limite
+superior do bucket), na ordem do caminho da leitura. Com --intervalo, mostra
+só o que aconteceu entre duas coletas.
+
+Uso:
+    python bench/ver_saltos.py http://localhost:9103/metrics http://localhost:5000/metrics
+    python bench/ver_saltos.py --intervalo 30 http://localhost:9103/metrics
+"""
+import argparse
+import json
+import re
+import time
+import urllib.request
+
+import util_bench  # noqa: F401  (raiz do repositório no sys.path)
+from comum.metricas import SALTOS
+
+_LINHA = re.compile(r'^f1_latencia_salto_s_(bucket|sum|count)\{(.*)\} (\S+)$')
+_ROTULO = re.compile(r'(\w+)="([^"]*)"')
+
+
+def coletar(urls):
+    """{salto: {"buckets": {le: acumulado}, "sum": s, "count": n}} somado entre os endpoints."""
+    saltos = {}
+    for url in urls:
+        with urllib.request.urlopen(url, timeout=5) as resposta:
+            texto = resposta.read().decode()
+        for linha in texto.splitlines():
+            casamento = _LINHA.match(linha)
+            if not casamento:
+                continue
+            tipo, rotulos, valor = casamento.groups()
+            rotulos = dict(_ROTULO.findall(rotulos))
+            salto = saltos.setdefault(rotulos["salto"], {"buckets": {}, "sum": 0.0, "count": 0.0})
+            if tipo == "bucket":
+                le = float(rotulos["le"])
+                salto["buckets"][le] = salto["buckets"].get(le, 0.0) + float(valor)
+            else:
+                salto[tipo] += float(valor)
+    return saltos
+
+
+def diferenca(depois, antes):
+    resultado = {}
+    for nome, d in depois.items():
+        a = antes.get(nome, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        resultado[nome] = {"buckets": {le: n - a["buckets"].get(le, 0.0) for le, n in d["buckets"].items()},
+                           "sum": d["sum"] - a["sum"], "count": d["count"] - a["count"]}
+    return resultado
+
+
+def percentil(buckets, total, p):
+    alvo = total * p / 100.0
+    for le, acumulado in sorted(buckets.items()):
+        if acumulado >= alvo:
+            return le
+    return float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--intervalo", type=float, default=0.0, help="segundos entre duas coletas (0 = acumulado)")
+    args = parser.parse_args()
+
+    saltos = coletar(args.urls)
+    if args.intervalo > 0:
+        antes = saltos
+        time.sleep(args.intervalo)
+        saltos = diferenca(coletar(args.urls), antes)
+
+    for nome in sorted(saltos, key=lambda s: SALTOS.index(s) if s in SALTOS else len(SALTOS)):
+        d = saltos[nome]
+        if not d["count"]:
+            continue
+        print(json.dumps({"salto": nome, "n": int(d["count"]),
+                          "media_ms": round(d["sum"] / d["count"] * 1000, 2),
+                          "p50_ms<=": percentil(d["buckets"], d["count"], 50) * 1000,
+                          "p99_ms<=": percentil(d["buckets"], d["count"], 99) * 1000}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Frota de carros simulada em um único processo (modo de carga).
+
+O estado de todos os pneus fica em um array NumPy (carros x 4 pneus x
+{desgaste, temperatura, pressão}) e cada passo aplica as mesmas regras de
+`simular_fisica_realista` (TRACK_MAP, lado de apoio, inércia térmica) para
+vários carros de uma vez. Todos os carros publicam pela mesma conexão MQTT,
+cada um no seu tópico f1/pneus/<carro>.
+
+Os carros da frota não passam pelo registro no grid_f1: os nomes são
+<FROTA_PREFIXO>_0000, _0001, ...
+
+    FROTA_CARROS=500 FROTA_SEMENTE=42 python car/frota.py
+"""
+import os
+import sys
+import time
+import random
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from comum.pista import TRACK_MAP, PNEUS_DIREITA, PNEUS_ESQUERDA
+from car.main_car import BROKER_ADDRESS, BROKER_PORT, FORMATO_PAYLOAD, topico_do_carro, codificar_payload
+
+NUM_CARROS = int(os.getenv("FROTA_CARROS", "200"))
+# Semente do gerador: a mesma semente reproduz a mesma corrida (vazio = aleatória)
+SEMENTE = os.getenv("FROTA_SEMENTE", "")
+PREFIXO = os.getenv("FROTA_PREFIXO", "Frota")
+# Divide o tempo de cada setor (2 = carros passam pelos setores 2x mais rápido)
+ACELERAR = float(os.getenv("FROTA_ACELERAR", "1"))
+INTERVALO_RELATORIO = float(os.getenv("FROTA_INTERVALO_RELATORIO", "10"))
+
+POSICOES = ("fl", "fr", "rl", "rr")
+DESGASTE, TEMP, PRESSAO = 0, 1, 2
+
+# TRACK_MAP em forma de colunas, indexadas pelo setor
+VEL_MIN = np.array([s["vel_min"] for s in TRACK_MAP], dtype=float)
+VEL_MAX = np.array([s["vel_max"] for s in TRACK_MAP], dtype=float)
+STRESS = np.array([s["stress"] for s in TRACK_MAP], dtype=float)
+NOMES_SETOR = [s["nome"] for s in TRACK_MAP]
+# APOIO[setor, pneu]: pneu do lado de apoio naquele setor (80% mais desgaste/calor)
+APOIO = np.array([[(s["lado_apoio"] == "direita" and p in PNEUS_DIREITA) or
+                   (s["lado_apoio"] == "esquerda" and p in PNEUS_ESQUERDA) for p in POSICOES]
+                  for s in TRACK_MAP])
+
+
+def tempo_setor(velocidades):
+    # Mesmo ritmo de car/main_car.py: 7200 / vel com o tempo acelerado x5
+    return 7200.0 / velocidades * 0.2
+
+
+class SimuladorFrota:
+    def __init__(self, nomes, semente=None):
+        self.nomes = list(nomes)
+        self.topicos = [topico_do_carro(nome) for nome in self.nomes]
+        self.rng = np.random.default_rng(semente)
+        n = len(self.nomes)
+        self.estado = np.empty((n, len(POSICOES), 3))
+        self.estado[:, :, DESGASTE] = 0.0
+        self.estado[:, :, TEMP] = 80.0
+        # Pressão base fria (psi): dianteiros 22, traseiros 20
+        self.estado[:, :, PRESSAO] = [22.0, 22.0, 20.0, 20.0]
+        self.volta = np.ones(n, dtype=np.int64)
+        self.indice_setor = np.zeros(n, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def passo(self, carros=None):
+        """Avança um setor para os carros dados (índices; None = todos).
+
+        Retorna (índices, velocidades, setor percorrido, volta do setor).
+        """
+        carros = np.arange(len(self)) if carros is None else np.asarray(carros)
+        qtd = carros.size
+        setor = self.indice_setor[carros]
+        volta = self.volta[carros]
+
+        velocidade = self.rng.uniform(VEL_MIN[setor], VEL_MAX[setor])
+
+        stress_real = STRESS[setor][:, None] * self.rng.uniform(0.08, 0.12, (qtd, len(POSICOES)))
+        stress_real = np.where(APOIO[setor], stress_real * 1.8, stress_real)
+        # Velocidade extrema também desgasta (mesmo em retas)
+        stress_real += np.where(velocidade > 300, 0.05, 0.0)[:, None]
+
+        estado = self.estado[carros]
+        estado[:, :, DESGASTE] = np.minimum(estado[:, :, DESGASTE] + stress_real, 100.0)
+
+        # Curvas esquentam; nas retas resfria um pouco, mas a rotação mantém quente
+        alvo = np.where((STRESS[setor] < 1.0)[:, None], (85 + velocidade * 0.05)[:, None], 90 + stress_real * 100)
+        estado[:, :, TEMP] = (estado[:, :, TEMP] * 0.8 + alvo * 0.2 +
+                              self.rng.uniform(-1, 1, (qtd, len(POSICOES))))
+        estado[:, :, PRESSAO] = 20.0 + (estado[:, :, TEMP] / 100.0) * 3.5
+        self.estado[carros] = estado
+
+        proximo = setor + 1
+        completou = proximo >= len(TRACK_MAP)
+        self.indice_setor[carros] = np.where(completou, 0, proximo)
+        self.volta[carros] = volta + completou
+        return carros, velocidade, setor, volta
+
+    def payloads(self, carros, velocidade, setor, volta, timestamp, formato=FORMATO_PAYLOAD):
+        """Mensagens (no formato de car/main_car.py, JSON ou protobuf) para os carros de um passo."""
+        estado = np.round(self.estado[carros], 2)
+        estado[:, :, TEMP] = np.round(estado[:, :, TEMP], 1)
+        estado = estado.tolist()
+        mensagens = []
+        for i, carro in enumerate(carros.tolist()):
+            pneus = {p: {"temperatura": estado[i][j][TEMP], "desgaste": estado[i][j][DESGASTE],
+                         "pressao": estado[i][j][PRESSAO]} for j, p in enumerate(POSICOES)}
+            mensagens.append((self.topicos[carro], codificar_payload({
+                "carro_id": self.nomes[carro],
+                "sensor_responsavel": NOMES_SETOR[setor[i]],
+                "volta": int(volta[i]),
+                "velocidade": round(float(velocidade[i]), 0),
+                "timestamp": timestamp,
+                "pneus": pneus,
+            }, formato)))
+        return mensagens
+
+
+def nomes_frota(qtd, prefixo=PREFIXO):
+    return [f"{prefixo}_{i:04d}" for i in range(qtd)]
+
+
+def rodar(simulador, client, acelerar=ACELERAR, parar=None):
+    """Publica cada carro no seu próprio ritmo (tempo do setor), como os processos individuais."""
+    n = len(simulador)
+    # Largada espalhada em até 10s, como em main_car.py
+    proximo = time.monotonic() + simulador.rng.uniform(0, 10, n) / acelerar
+    publicadas = 0
+    proximo_relatorio = time.monotonic() + INTERVALO_RELATORIO
+    while parar is None or not parar.is_set():
+        agora = time.monotonic()
+        prontos = np.flatnonzero(proximo <= agora)
+        if prontos.size:
+            carros, velocidade, setor, volta = simulador.passo(prontos)
+            for topico, payload in simulador.payloads(carros, velocidade, setor, volta, time.time()):
+                client.publish(topico, payload)
+            publicadas += prontos.size
+            proximo[prontos] = agora + tempo_setor(velocidade) / acelerar
+
+        if agora >= proximo_relatorio:
+            print(f"[FROTA] {n} carros, {publicadas / INTERVALO_RELATORIO:.0f} msgs/s")
+            publicadas = 0
+            proximo_relatorio = agora + INTERVALO_RELATORIO
+        time.sleep(max(0.0, min(proximo.min(), proximo_relatorio) - time.monotonic()))
+
+
+def main():
+    semente = int(SEMENTE) if SEMENTE else None
+    simulador = SimuladorFrota(nomes_frota(NUM_CARROS), semente)
+
+    client = mqtt.Client(client_id=f"F1Frota_{random.randint(1000, 99999)}")
+    while True:
+        try:
+            client.connect(BROKER_ADDRESS, BROKER_PORT)
+            break
+        except Exception:
+            time.sleep(2)
+    client.loop_start()
+    print(f"[FROTA] {NUM_CARROS} carros em uma conexão MQTT (semente={semente}, acelerar={ACELERAR}).")
+
+    try:
+        rodar(simulador, client)
+    except KeyboardInterrupt:
+        client.loop_stop()
+        client.disconnect()
+
+
+if __name__ == '__main__':
+    main()
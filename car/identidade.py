@@ -0,0 +1,115 @@
+"""Identidade dos carros por arrendamento (lease) no grid_f1.
+
+O grid_f1 é um pool pré-populado com um documento por nome de piloto:
+{_id: nome, dono: <token do processo> ou null, expira_em: datetime}. Um carro
+reserva o nome com um único find_one_and_update atômico (livre ou com lease
+vencido -> dono = token), e uma thread renova o lease a cada
+`lease_s / 3` segundos. Se o processo morrer, o lease vence e o nome volta a
+ficar disponível sem intervenção; no desligamento normal o nome é liberado na
+hora. Documentos antigos ({_id, timestamp}, sem `dono`) contam como livres.
+
+O vencimento é comparado na própria consulta (não há índice TTL apagando
+documentos do pool); os relógios dos carros só precisam concordar dentro de
+uma fração do lease.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError
+
+
+def _agora():
+    return datetime.now(timezone.utc)
+
+
+def nomes_pool(pilotos, tamanho):
+    """Nomes do pool: os pilotos e, se o grid for maior, reservas numeradas."""
+    nomes = list(pilotos[:tamanho])
+    nomes.extend(f"Reserva - {i:03d}" for i in range(len(nomes) + 1, tamanho + 1))
+    return nomes
+
+
+def semear_pool(colecao, nomes):
+    """Garante um documento por nome no pool (idempotente, uma ida ao banco)."""
+    colecao.bulk_write([UpdateOne({"_id": nome}, {"$setOnInsert": {"dono": None, "expira_em": None}}, upsert=True)
+                        for nome in nomes], ordered=False)
+
+
+class ReservaPiloto:
+    """Lease de um nome do grid_f1, renovado por uma thread em segundo plano."""
+
+    def __init__(self, colecao, lease_s=15.0):
+        self.colecao = colecao
+        self.lease_s = lease_s
+        self.token = uuid.uuid4().hex
+        self.nome = None
+        self.perdida = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _filtro_livre(self):
+        return {"$or": [{"dono": None}, {"expira_em": {"$lt": _agora()}}]}
+
+    def tentar(self, preferido=None):
+        """Uma tentativa de reserva (preferindo `preferido`). Devolve o nome ou None."""
+        filtro = self._filtro_livre()
+        if preferido:
+            filtro = {"$and": [{"_id": preferido}, filtro]}
+        doc = self.colecao.find_one_and_update(
+            filtro,
+            {"$set": {"dono": self.token, "expira_em": _agora() + timedelta(seconds=self.lease_s)}},
+            projection={"_id": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            return None
+        self.nome = doc["_id"]
+        return self.nome
+
+    def reservar(self, preferido=None, espera_max=2.0):
+        """Tenta até conseguir um nome; com o grid cheio espera um lease vencer."""
+        espera = 0.1
+        while True:
+            try:
+                nome = (self.tentar(preferido) if preferido else None) or self.tentar()
+                if nome:
+                    return nome
+            except PyMongoError:
+                pass
+            time.sleep(espera)
+            espera = min(espera * 2, espera_max)
+
+    def renovar(self):
+        """Estende o lease. False se outro processo ficou com o nome."""
+        resultado = self.colecao.update_one(
+            {"_id": self.nome, "dono": self.token},
+            {"$set": {"expira_em": _agora() + timedelta(seconds=self.lease_s)}})
+        return resultado.matched_count == 1
+
+    def _batimentos(self):
+        while not self._parar.wait(self.lease_s / 3):
+            try:
+                if not self.renovar():
+                    # O lease venceu (carro parado/sem banco) e o nome foi reservado por outro
+                    self.perdida.set()
+                    return
+            except PyMongoError:
+                continue
+
+    def iniciar_batimentos(self):
+        self._thread = threading.Thread(target=self._batimentos, daemon=True)
+        self._thread.start()
+
+    def liberar(self):
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+        if self.nome:
+            try:
+                self.colecao.update_one({"_id": self.nome, "dono": self.token},
+                                        {"$set": {"dono": None, "expira_em": None}})
+            except PyMongoError:
+                pass  # o lease vence sozinho
@@ -2,37 +2,37 @@ import time
 import json
 import random
 import os
+import re
+import sys
+import signal
 import paho.mqtt.client as mqtt
 import pymongo
-from pymongo.errors import DuplicateKeyError, ConnectionFailure
+from pymongo.errors import PyMongoError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from protos import f1_pb2
+from comum.metricas import LIMITES_LATENCIA, Registro, servir_metricas
+from comum.pista import TRACK_MAP, PNEUS_DIREITA, PNEUS_ESQUERDA
+from car.identidade import ReservaPiloto, nomes_pool, semear_pool
 
 # --- CONFIGURAÇÕES ---
 BROKER_ADDRESS = os.getenv("BROKER_ADDRESS", "localhost")
 BROKER_PORT = 1883
 TOPIC = "f1/pneus"
+# Publica em f1/pneus/<carro> para permitir particionar a ingestão por carro.
+# TOPICO_POR_CARRO=0 volta ao tópico único antigo.
+TOPICO_POR_CARRO = os.getenv("TOPICO_POR_CARRO", "1") == "1"
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-
-# --- MAPEAMENTO DA PISTA DE INTERLAGOS (BASEADO NA FIGURA 1) ---
-# Interlagos é Anti-Horário (Esquerda). Pneus da DIREITA sofrem mais.
-# stress: 1.0 = normal, >1 = curva forte, <1 = reta
-TRACK_MAP = [
-    {"id": 1, "nome": "S do Senna (Entrada)", "vel_min": 70, "vel_max": 110, "stress": 2.5, "lado_apoio": "direita"},
-    {"id": 2, "nome": "S do Senna (Saída)", "vel_min": 120, "vel_max": 180, "stress": 2.0, "lado_apoio": "direita"},
-    {"id": 3, "nome": "Curva do Sol", "vel_min": 180, "vel_max": 230, "stress": 1.8, "lado_apoio": "direita"},
-    {"id": 4, "nome": "Reta Oposta", "vel_min": 290, "vel_max": 330, "stress": 0.5, "lado_apoio": "neutro"},
-    {"id": 5, "nome": "Descida do Lago", "vel_min": 130, "vel_max": 170, "stress": 2.2, "lado_apoio": "direita"},
-    {"id": 6, "nome": "Ferradura", "vel_min": 150, "vel_max": 200, "stress": 2.0, "lado_apoio": "direita"},
-    {"id": 7, "nome": "Laranjinha", "vel_min": 160, "vel_max": 210, "stress": 1.8, "lado_apoio": "direita"},
-    {"id": 8, "nome": "Pinheirinho", "vel_min": 80, "vel_max": 120, "stress": 2.3, "lado_apoio": "esquerda"},
-    # Curva p/ direita (rara em Interlagos)
-    {"id": 9, "nome": "Bico de Pato", "vel_min": 70, "vel_max": 100, "stress": 2.5, "lado_apoio": "direita"},
-    {"id": 10, "nome": "Mergulho", "vel_min": 180, "vel_max": 220, "stress": 1.5, "lado_apoio": "direita"},
-    {"id": 11, "nome": "Junção", "vel_min": 110, "vel_max": 140, "stress": 2.4, "lado_apoio": "direita"},
-    {"id": 12, "nome": "Subida dos Boxes", "vel_min": 240, "vel_max": 280, "stress": 1.0, "lado_apoio": "direita"},
-    {"id": 13, "nome": "Arquibancadas A", "vel_min": 290, "vel_max": 315, "stress": 0.6, "lado_apoio": "neutro"},
-    {"id": 14, "nome": "Arquibancadas B", "vel_min": 300, "vel_max": 325, "stress": 0.6, "lado_apoio": "neutro"},
-    {"id": 15, "nome": "Reta Principal", "vel_min": 310, "vel_max": 340, "stress": 0.5, "lado_apoio": "neutro"},
-]
+# Formato publicado: "json" (original) ou "protobuf" (DadosCarro serializado,
+# repassado pelo ISCCP sem reconverter). O ISCCP aceita os dois ao mesmo tempo.
+FORMATO_PAYLOAD = os.getenv("FORMATO_PAYLOAD", "json")
+# Identidade: nomes do grid_f1 reservados por lease renovado a cada LEASE_PILOTO_S/3.
+# GRID_TAMANHO > 24 completa o grid com reservas numeradas; PILOTO pede um nome.
+GRID_TAMANHO = int(os.getenv("GRID_TAMANHO", "24"))
+LEASE_S = float(os.getenv("LEASE_PILOTO_S", "15"))
+PILOTO_PREFERIDO = os.getenv("PILOTO", "")
+# GET /metrics (formato Prometheus) nesta porta; 0 desliga
+METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "9101"))
 
 PILOTOS = [
     "RedBull - Verstappen", "RedBull - Perez", "Ferrari - Leclerc", "Ferrari - Sainz",
@@ -44,33 +44,34 @@ PILOTOS = [
 ]
 
 
+def topico_do_carro(carro_id):
+    if not TOPICO_POR_CARRO:
+        return TOPIC
+    # Remove caracteres especiais de tópico MQTT (/, +, #) e espaços
+    return f"{TOPIC}/{re.sub(r'[^A-Za-z0-9_-]+', '_', carro_id)}"
+
+
 # --- REGISTRO DE IDENTIDADE ---
-def registrar_identidade():
-    time.sleep(random.uniform(0, 5))
+def registrar_identidade(banco="f1_telemetria"):
+    """Reserva um nome do grid_f1 por lease (car/identidade.py) e inicia a renovação."""
+    client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=3000)
+    col = client[banco]["grid_f1"]
     while True:
-        client = None
         try:
-            client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=3000)
-            db = client["f1_telemetria"]
-            col = db["grid_f1"]
-            tentativas = list(PILOTOS)
-            random.shuffle(tentativas)
-            for nome in tentativas:
-                try:
-                    col.insert_one({"_id": nome, "timestamp": time.time()})
-                    print(f"--- PILOTO CONFIRMADO: {nome} ---")
-                    client.close()
-                    return nome
-                except DuplicateKeyError:
-                    continue
-            time.sleep(5)
-        except Exception:
+            semear_pool(col, nomes_pool(PILOTOS, GRID_TAMANHO))
+            break
+        except PyMongoError:
             time.sleep(3)
-        finally:
-            if client: client.close()
+    reserva = ReservaPiloto(col, LEASE_S)
+    nome = reserva.reservar(PILOTO_PREFERIDO or None)
+    reserva.iniciar_batimentos()
+    print(f"--- PILOTO CONFIRMADO: {nome} ---")
+    return reserva
 
 
-CAR_ID = registrar_identidade()
+# Definidos em main(), depois do registro no grid
+CAR_ID = None
+TOPICO_CARRO = None
 
 # --- ESTADO INICIAL ---
 # Pressão base fria (psi)
@@ -82,6 +83,7 @@ estado_pneus = {
 }
 volta_atual = 1
 indice_setor = 0  # Começa no setor 1
+seq_mensagem = 0  # Número da mensagem do carro (detecta perdas no caminho)
 
 
 def simular_fisica_realista():
@@ -99,9 +101,9 @@ def simular_fisica_realista():
         stress_real = setor["stress"] * random.uniform(0.08, 0.12)
 
         # Interlagos é Anti-Horário: Pneus da DIREITA sofrem mais
-        if setor["lado_apoio"] == "direita" and "r" in posicao:  # fr ou rr
+        if setor["lado_apoio"] == "direita" and posicao in PNEUS_DIREITA:
             stress_real *= 1.8  # 80% mais desgaste/calor nos pneus de apoio
-        elif setor["lado_apoio"] == "esquerda" and "l" in posicao:  # fl ou rl
+        elif setor["lado_apoio"] == "esquerda" and posicao in PNEUS_ESQUERDA:
             stress_real *= 1.8
 
         # Velocidade extrema também desgasta (mesmo em retas)
@@ -137,12 +139,15 @@ def simular_fisica_realista():
 
 
 def gerar_payload(velocidade, setor_nome):
+    global seq_mensagem
+    seq_mensagem += 1
     return {
         "carro_id": CAR_ID,
         "sensor_responsavel": setor_nome,  # AQUI O TRUQUE: O carro avisa onde está
         "volta": volta_atual,
         "velocidade": round(velocidade, 0),
-        "timestamp": time.time(),
+        "timestamp": time.time(),  # instante da publicação (primeiro carimbo da leitura)
+        "seq": seq_mensagem,
         "pneus": {
             k: {
                 "temperatura": round(v["temp"], 1),
@@ -153,40 +158,91 @@ def gerar_payload(velocidade, setor_nome):
     }
 
 
+def codificar_payload(payload, formato=None):
+    """Payload (dict de gerar_payload) -> bytes/str publicados no MQTT."""
+    if (formato or FORMATO_PAYLOAD) != "protobuf":
+        return json.dumps(payload)
+
+    def pneu(p):
+        return f1_pb2.Pneu(temperatura=p["temperatura"], desgaste=p["desgaste"], pressao=p["pressao"])
+
+    pneus = payload["pneus"]
+    return f1_pb2.DadosCarro(
+        carro_id=payload["carro_id"], sensor_id=payload["sensor_responsavel"], velocidade=payload["velocidade"],
+        volta=payload["volta"], timestamp=str(payload["timestamp"]), seq=payload.get("seq", 0),
+        pneu_fl=pneu(pneus["fl"]), pneu_fr=pneu(pneus["fr"]), pneu_rl=pneu(pneus["rl"]), pneu_rr=pneu(pneus["rr"]),
+    ).SerializeToString()
+
+
 # --- CONEXÃO MQTT ---
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
         print(f"[{CAR_ID}] Pronto para largada!")
 
 
-client = mqtt.Client(client_id=f"F1Car_{random.randint(1000, 99999)}")
-client.on_connect = on_connect
-
-while True:
-    try:
-        client.connect(BROKER_ADDRESS, BROKER_PORT)
-        break
-    except:
-        time.sleep(2)
-
-client.loop_start()
-
-try:
-    # Largada aleatória para espalhar o grid
-    time.sleep(random.uniform(0, 10))
+def main():
+    global CAR_ID, TOPICO_CARRO
+    # docker stop manda SIGTERM: sai pelo finally para liberar o nome na hora
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    reserva = registrar_identidade()
+    CAR_ID = reserva.nome
+    TOPICO_CARRO = topico_do_carro(CAR_ID)
+
+    registro = Registro()
+    publicadas = registro.contador("carro_mensagens_publicadas_total", "Leituras publicadas no MQTT",
+                                   {"carro": CAR_ID})
+    falhas = registro.contador("carro_falhas_publicacao_total", "publish recusado pelo cliente MQTT",
+                               {"carro": CAR_ID})
+    hist_publicacao = registro.histograma("carro_publicacao_s", LIMITES_LATENCIA,
+                                          "Tempo para gerar e entregar a leitura ao cliente MQTT (s)",
+                                          {"carro": CAR_ID})
+    registro.medidor("carro_volta", lambda: volta_atual, "Volta atual", {"carro": CAR_ID})
+    if METRICAS_PORTA:
+        servir_metricas(registro, METRICAS_PORTA)
+
+    client = mqtt.Client(client_id=f"F1Car_{random.randint(1000, 99999)}")
+    client.on_connect = on_connect
 
     while True:
-        # Simula um trecho da pista
-        vel, trecho = simular_fisica_realista()
-
-        payload = json.dumps(gerar_payload(vel, trecho))
-        client.publish(TOPIC, payload)
+        try:
+            client.connect(BROKER_ADDRESS, BROKER_PORT)
+            break
+        except:
+            time.sleep(2)
 
-        # Tempo para percorrer o setor (Retas são rápidas, Curvas lentas)
-        # Ajustado para dar uma volta em ~1min10s
-        tempo_setor = 7200 / vel  # Ex: 300km/h = ~2.4s, 80km/h = ~9s (escala reduzida)
-        time.sleep(tempo_setor * 0.2)  # Aceleramos o tempo x5 para a demo ser dinâmica
+    client.loop_start()
 
-except KeyboardInterrupt:
-    client.loop_stop()
-    client.disconnect()
\ No newline at end of file
+    try:
+        # Largada aleatória para espalhar o grid
+        time.sleep(random.uniform(0, 10))
+
+        while not reserva.perdida.is_set():
+            # Simula um trecho da pista
+            vel, trecho = simular_fisica_realista()
+
+            inicio = time.perf_counter()
+            payload = codificar_payload(gerar_payload(vel, trecho))
+            if client.publish(TOPICO_CARRO, payload).rc == mqtt.MQTT_ERR_SUCCESS:
+                publicadas.incrementar()
+            else:
+                falhas.incrementar()
+            hist_publicacao.observar(time.perf_counter() - inicio)
+
+            # Tempo para percorrer o setor (Retas são rápidas, Curvas lentas)
+            # Ajustado para dar uma volta em ~1min10s
+            tempo_setor = 7200 / vel  # Ex: 300km/h = ~2.4s, 80km/h = ~9s (escala reduzida)
+            time.sleep(tempo_setor * 0.2)  # Aceleramos o tempo x5 para a demo ser dinâmica
+
+        # Sem renovar a tempo, outro carro assumiu o nome: encerra para reiniciar com outro
+        print(f"[{CAR_ID}] Lease do piloto perdido, encerrando.")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        reserva.liberar()
+
+
+if __name__ == '__main__':
+    main()
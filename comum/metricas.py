@@ -0,0 +1,229 @@
+"""Métricas dos serviços: histogramas, contadores e medidores.
+
+Cada serviço junta as suas métricas num `Registro` e o expõe no formato texto
+do Prometheus: o SSVCP na rota /metrics do Flask e os demais com
+`servir_metricas` (servidor HTTP mínimo em uma thread).
+"""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Limites padrão (segundos) para latências de envio/gravação
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Limites padrão para tamanhos de lote (número de mensagens)
+LIMITES_LOTE = (1, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Saltos de uma leitura até o dashboard, medidos com os carimbos do DadosCarro
+# (timestamp do carro, recebido_isccp, enviado_isccp do lote):
+#   carro_isccp   publicação no carro -> recebida pela ponte (inclui o broker)
+#   fila_isccp    recebida pela ponte -> lote enviado
+#   grpc          lote enviado -> recebido pelo SSACP
+#   banco         recebido pelo SSACP -> gravação confirmada pelo Mongo
+#   ponta_a_ponta publicação no carro -> gravação confirmada
+#   ssvcp         publicação no carro -> enviada aos dashboards pelo SSVCP
+SALTOS = ("carro_isccp", "fila_isccp", "grpc", "banco", "ponta_a_ponta", "ssvcp")
+
+
+class Histograma:
+    """Histograma de buckets fixos, seguro para uso entre threads.
+
+    Guarda contagens por bucket (não cumulativas), soma e total, o suficiente
+    para estimar percentis sem guardar cada observação.
+    """
+
+    tipo = "histogram"
+
+    def __init__(self, nome, limites, ajuda="", rotulos=None):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos or {}
+        self.limites = tuple(limites)
+        self._contagens = [0] * (len(self.limites) + 1)  # último = +Inf
+        self._soma = 0.0
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        idx = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self._contagens[idx] += 1
+            self._soma += valor
+            self._total += 1
+
+    def estado(self):
+        with self._lock:
+            return list(self._contagens), self._soma, self._total
+
+    def percentil(self, p):
+        """Limite superior do bucket que contém o percentil `p` (0-100)."""
+        contagens, _, total = self.estado()
+        if total == 0:
+            return 0.0
+        alvo = total * p / 100.0
+        acumulado = 0
+        for idx, qtd in enumerate(contagens):
+            acumulado += qtd
+            if acumulado >= alvo:
+                return self.limites[idx] if idx < len(self.limites) else float("inf")
+        return float("inf")
+
+    def resumo(self):
+        _, soma, total = self.estado()
+        media = soma / total if total else 0.0
+        return (f"{self.nome}: n={total} média={media:.4g} "
+                f"p50<={self.percentil(50):.4g} p99<={self.percentil(99):.4g}")
+
+    def amostras(self):
+        contagens, soma, total = self.estado()
+        acumulado = 0
+        for limite, qtd in zip(self.limites, contagens):
+            acumulado += qtd
+            yield "_bucket", dict(self.rotulos, le=_numero(limite)), acumulado
+        yield "_bucket", dict(self.rotulos, le="+Inf"), total
+        yield "_sum", self.rotulos, soma
+        yield "_count", self.rotulos, total
+
+
+class Contador:
+    """Contador monotônico, seguro para uso entre threads."""
+
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda="", rotulos=None):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos or {}
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def incrementar(self, quantidade=1):
+        with self._lock:
+            self.valor += quantidade
+
+    def amostras(self):
+        yield "", self.rotulos, self.valor
+
+
+class Medidor:
+    """Valor lido de `funcao` na coleta: instantâneo (profundidade de fila, clientes...)
+    ou, com tipo="counter", um contador que o serviço já mantém."""
+
+    def __init__(self, nome, funcao, ajuda="", rotulos=None, tipo="gauge"):
+        self.nome = nome
+        self.tipo = tipo
+        self.ajuda = ajuda
+        self.rotulos = rotulos or {}
+        self.funcao = funcao
+
+    def amostras(self):
+        yield "", self.rotulos, self.funcao()
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in rotulos.items()) + "}"
+
+
+class Registro:
+    """Conjunto de métricas de um serviço."""
+
+    def __init__(self):
+        self._metricas = []
+        self._lock = threading.Lock()
+
+    def registrar(self, metrica):
+        with self._lock:
+            self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nome, limites, ajuda="", rotulos=None):
+        return self.registrar(Histograma(nome, limites, ajuda, rotulos))
+
+    def contador(self, nome, ajuda="", rotulos=None):
+        return self.registrar(Contador(nome, ajuda, rotulos))
+
+    def medidor(self, nome, funcao, ajuda="", rotulos=None, tipo="gauge"):
+        return self.registrar(Medidor(nome, funcao, ajuda, rotulos, tipo))
+
+    def buscar(self, nome):
+        """Métricas registradas com este nome (uma por combinação de rótulos)."""
+        with self._lock:
+            return [m for m in self._metricas if m.nome == nome]
+
+    def texto(self):
+        """Todas as métricas no formato texto do Prometheus (versão 0.0.4)."""
+        with self._lock:
+            metricas = list(self._metricas)
+        linhas = []
+        vistos = set()
+        # Métricas com o mesmo nome (rótulos diferentes) saem juntas, sob um só HELP/TYPE
+        for nome in dict.fromkeys(m.nome for m in metricas):
+            for metrica in (m for m in metricas if m.nome == nome):
+                if nome not in vistos:
+                    vistos.add(nome)
+                    if metrica.ajuda:
+                        linhas.append(f"# HELP {nome} {metrica.ajuda}")
+                    linhas.append(f"# TYPE {nome} {metrica.tipo}")
+                for sufixo, rotulos, valor in metrica.amostras():
+                    linhas.append(f"{nome}{sufixo}{_rotulos(rotulos)} {_numero(valor)}")
+        return "\n".join(linhas) + "\n"
+
+
+def histogramas_saltos(registro, saltos):
+    """Um histograma f1_latencia_salto_s{salto=...} para cada salto medido pelo serviço."""
+    return {salto: registro.histograma("f1_latencia_salto_s", LIMITES_LATENCIA,
+                                       "Latência de cada salto da leitura (s)", {"salto": salto})
+            for salto in saltos}
+
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def servir_metricas(registro, porta, perfil=None):
+    """Expõe GET /metrics (e /debug/perfil, com PERFIL_HABILITADO=1) numa thread.
+
+    Retorna o servidor, ou None se a porta estiver ocupada.
+    """
+    from comum.perfil import HABILITADO, responder_perfil
+    perfil = HABILITADO if perfil is None else perfil
+
+    class Tratador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/metrics":
+                status, tipo, corpo = 200, TIPO_CONTEUDO, registro.texto()
+            elif url.path == "/debug/perfil" and perfil:
+                status, tipo, corpo = responder_perfil(parse_qs(url.query))
+            else:
+                status, tipo, corpo = 404, "text/plain", "não encontrado\n"
+            dados = corpo.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        servidor = ThreadingHTTPServer(("", porta), Tratador)
+    except OSError as e:
+        # Outro serviço na mesma máquina já usa a porta: segue sem métricas
+        print(f"[METRICAS] Não foi possível abrir a porta {porta}: {e}")
+        return None
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
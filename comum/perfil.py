@@ -0,0 +1,65 @@
+"""Perfilador por amostragem, ligado sob demanda.
+
+Enquanto ativo, uma thread lê a pilha de todas as outras threads
+(`sys._current_frames`) a cada `intervalo` segundos e conta as pilhas
+iguais. A saída é o formato "colapsado" (uma pilha por linha, quadros
+separados por ';' e a contagem no fim), aceito por flamegraph.pl e speedscope.
+Fora de uma sessão não há custo nenhum.
+
+Exposto em GET /debug/perfil?segundos=10&intervalo_ms=5 pelos serviços com
+PERFIL_HABILITADO=1. Só uma sessão roda por vez.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+HABILITADO = os.getenv("PERFIL_HABILITADO", "0") == "1"
+SEGUNDOS_MAX = 120.0
+
+_sessao = threading.Lock()
+
+
+def _quadro(frame):
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+def amostrar(segundos, intervalo=0.005):
+    """Amostra as pilhas das outras threads por `segundos`. Retorna Counter pilha -> amostras."""
+    contagens = Counter()
+    propria = threading.get_ident()
+    fim = time.monotonic() + segundos
+    while time.monotonic() < fim:
+        nomes = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == propria:
+                continue
+            pilha = []
+            while frame is not None:
+                pilha.append(_quadro(frame))
+                frame = frame.f_back
+            pilha.append(nomes.get(ident, f"thread-{ident}"))
+            contagens[";".join(reversed(pilha))] += 1
+        time.sleep(intervalo)
+    return contagens
+
+
+def formato_colapsado(contagens):
+    return "".join(f"{pilha} {qtd}\n" for pilha, qtd in contagens.most_common())
+
+
+def responder_perfil(parametros):
+    """Trata GET /debug/perfil. `parametros` no formato de parse_qs; retorna (status, tipo, corpo)."""
+    try:
+        segundos = min(float(parametros.get("segundos", ["10"])[0]), SEGUNDOS_MAX)
+        intervalo = float(parametros.get("intervalo_ms", ["5"])[0]) / 1000.0
+    except ValueError:
+        return 400, "text/plain", "segundos e intervalo_ms devem ser números\n"
+    if not _sessao.acquire(blocking=False):
+        return 409, "text/plain", "já existe uma sessão de perfil em andamento\n"
+    try:
+        return 200, "text/plain; charset=utf-8", formato_colapsado(amostrar(segundos, max(intervalo, 0.001)))
+    finally:
+        _sessao.release()
@@ -0,0 +1,36 @@
+"""Pista e lados do carro, compartilhados pelo carro, pelo SSACP e pelo SSVCP.
+
+O carro simula a física por setor a partir do TRACK_MAP; o SSACP usa o
+estresse de cada setor na previsão de desgaste e a ordem dos setores para
+contar o progresso na corrida, e o SSVCP a mesma ordem na classificação e na
+exportação. Sem dependências, para quem importa não carregar o carro.
+"""
+
+# --- MAPEAMENTO DA PISTA DE INTERLAGOS (BASEADO NA FIGURA 1) ---
+# Interlagos é Anti-Horário (Esquerda). Pneus da DIREITA sofrem mais.
+# stress: 1.0 = normal, >1 = curva forte, <1 = reta
+TRACK_MAP = [
+    {"id": 1, "nome": "S do Senna (Entrada)", "vel_min": 70, "vel_max": 110, "stress": 2.5, "lado_apoio": "direita"},
+    {"id": 2, "nome": "S do Senna (Saída)", "vel_min": 120, "vel_max": 180, "stress": 2.0, "lado_apoio": "direita"},
+    {"id": 3, "nome": "Curva do Sol", "vel_min": 180, "vel_max": 230, "stress": 1.8, "lado_apoio": "direita"},
+    {"id": 4, "nome": "Reta Oposta", "vel_min": 290, "vel_max": 330, "stress": 0.5, "lado_apoio": "neutro"},
+    {"id": 5, "nome": "Descida do Lago", "vel_min": 130, "vel_max": 170, "stress": 2.2, "lado_apoio": "direita"},
+    {"id": 6, "nome": "Ferradura", "vel_min": 150, "vel_max": 200, "stress": 2.0, "lado_apoio": "direita"},
+    {"id": 7, "nome": "Laranjinha", "vel_min": 160, "vel_max": 210, "stress": 1.8, "lado_apoio": "direita"},
+    {"id": 8, "nome": "Pinheirinho", "vel_min": 80, "vel_max": 120, "stress": 2.3, "lado_apoio": "esquerda"},
+    # Curva p/ direita (rara em Interlagos)
+    {"id": 9, "nome": "Bico de Pato", "vel_min": 70, "vel_max": 100, "stress": 2.5, "lado_apoio": "direita"},
+    {"id": 10, "nome": "Mergulho", "vel_min": 180, "vel_max": 220, "stress": 1.5, "lado_apoio": "direita"},
+    {"id": 11, "nome": "Junção", "vel_min": 110, "vel_max": 140, "stress": 2.4, "lado_apoio": "direita"},
+    {"id": 12, "nome": "Subida dos Boxes", "vel_min": 240, "vel_max": 280, "stress": 1.0, "lado_apoio": "direita"},
+    {"id": 13, "nome": "Arquibancadas A", "vel_min": 290, "vel_max": 315, "stress": 0.6, "lado_apoio": "neutro"},
+    {"id": 14, "nome": "Arquibancadas B", "vel_min": 300, "vel_max": 325, "stress": 0.6, "lado_apoio": "neutro"},
+    {"id": 15, "nome": "Reta Principal", "vel_min": 310, "vel_max": 340, "stress": 0.5, "lado_apoio": "neutro"},
+]
+
+# Setores por volta
+NUM_SETORES = len(TRACK_MAP)
+
+# Pneus de cada lado do carro (apoio nas curvas)
+PNEUS_DIREITA = ("fr", "rr")
+PNEUS_ESQUERDA = ("fl", "rl")
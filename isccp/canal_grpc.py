@@ -0,0 +1,64 @@
+"""Canal gRPC da ponte para as réplicas do SSACP.
+
+Uma conexão HTTP/2 dura enquanto o processo viver, então com o resolvedor e a
+política padrões (pick_first) cada ponte fica presa à réplica que o DNS
+devolveu primeiro. Aqui o canal usa round_robin sobre todos os endereços do
+alvo e o health checking do gRPC (grpc.health.v1, servido pelo SSACP): uma
+réplica que cai ou se declara NOT_SERVING sai do rodízio até voltar.
+
+O alvo é qualquer endereço aceito pelo gRPC:
+
+- ``dns:///ssacp:50051``: todas as réplicas atrás do nome (serviço escalado
+  no compose). O nome é resolvido de novo quando uma conexão cai, e o SSACP
+  fecha conexões antigas (SSACP_IDADE_MAX_CONEXAO_S) para novas réplicas
+  entrarem no rodízio;
+- ``ipv4:10.0.0.2:50051,10.0.0.3:50051``: lista fixa de réplicas;
+- ``localhost:50051``: uma réplica só (o rodízio não muda nada).
+
+Keepalive: a ponte manda PING a cada `keepalive_s` mesmo sem RPC em curso e
+derruba a conexão se o SSACP não responder em `keepalive_timeout_s` (réplica
+sumiu sem fechar o TCP). O servidor precisa aceitar PINGs nesse ritmo (ver
+ssacp/conexao.py).
+"""
+import json
+
+import grpc
+
+# Compressão das mensagens da ponte (os lotes); o SSACP descomprime sozinho
+COMPRESSOES = {
+    "": grpc.Compression.NoCompression,
+    "nenhuma": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+def config_servico(balanceamento="round_robin", health_check=True):
+    """Service config (JSON) com a política de balanceamento e o health checking."""
+    config = {"loadBalancingConfig": [{balanceamento: {}}]}
+    if health_check:
+        # "" = estado geral do servidor, o que o SSACP publica
+        config["healthCheckConfig"] = {"serviceName": ""}
+    return json.dumps(config)
+
+
+def opcoes_canal(balanceamento="round_robin", health_check=True, keepalive_s=20.0, keepalive_timeout_s=10.0,
+                 reconexao_max_s=5.0):
+    return [
+        ("grpc.service_config", config_servico(balanceamento, health_check)),
+        # O service config vem só daqui, nunca de registros TXT do DNS
+        ("grpc.service_config_disable_resolution", 1),
+        ("grpc.keepalive_time_ms", int(keepalive_s * 1000)),
+        ("grpc.keepalive_timeout_ms", int(keepalive_timeout_s * 1000)),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        # Reconexão rápida depois que a réplica volta (o padrão do gRPC chega a 120s)
+        ("grpc.max_reconnect_backoff_ms", int(reconexao_max_s * 1000)),
+    ]
+
+
+def criar_canal(alvo, compressao="", **kwargs):
+    """Canal inseguro para `alvo` com balanceamento, health checking e keepalive."""
+    if compressao not in COMPRESSOES:
+        raise ValueError(f"compressão desconhecida: {compressao!r} (use {', '.join(c for c in COMPRESSOES if c)})")
+    return grpc.insecure_channel(alvo, options=opcoes_canal(**kwargs), compression=COMPRESSOES[compressao])
@@ -0,0 +1,141 @@
+"""Formato das mensagens dos carros e montagem dos lotes gRPC sem reserializar.
+
+Os carros publicam JSON (formato original) ou o DadosCarro serializado em
+protobuf. A fila da ponte guarda sempre o DadosCarro já serializado: o binário
+do carro entra como chegou e o JSON é convertido uma única vez. Os lotes
+(ListaDadosCarro / LoteSequenciado) são montados concatenando esses bytes com
+o cabeçalho de cada campo repetido, sem criar objetos protobuf de novo.
+"""
+import json
+import math
+import struct
+
+from protos import f1_pb2
+
+# Cabeçalhos (número do campo << 3 | wire type) usados na montagem dos lotes
+_CAMPO_DADOS_LISTA = b"\x0a"        # ListaDadosCarro.dados = 1, tipo LEN
+_CAMPO_SEQUENCIA = b"\x08"          # LoteSequenciado.sequencia = 1, tipo VARINT
+_CAMPO_DADOS_SEQUENCIADO = b"\x12"  # LoteSequenciado.dados = 2, tipo LEN
+# Carimbos de tempo (double, tipo I64) acrescentados aos bytes já serializados
+_CAMPO_RECEBIDO_ISCCP = b"\x61"      # DadosCarro.recebido_isccp = 12
+_CAMPO_ENVIADO_LISTA = b"\x11"       # ListaDadosCarro.enviado_isccp = 2
+_CAMPO_ENVIADO_SEQUENCIADO = b"\x19"  # LoteSequenciado.enviado_isccp = 3
+
+
+def varint(valor):
+    saida = bytearray()
+    while valor > 0x7F:
+        saida.append((valor & 0x7F) | 0x80)
+        valor >>= 7
+    saida.append(valor)
+    return bytes(saida)
+
+
+def validar_timestamp(timestamp):
+    """Confere que o timestamp é um epoch numérico e finito (o SSACP o converte em data)."""
+    try:
+        valor = float(timestamp)
+    except (TypeError, ValueError):
+        raise ValueError(f"timestamp inválido: {timestamp!r}") from None
+    if not math.isfinite(valor):
+        raise ValueError(f"timestamp inválido: {timestamp!r}")
+
+
+def json_para_dados_carro(payload):
+    """Payload JSON do carro -> DadosCarro (objeto)."""
+    p_fl = payload['pneus']['fl']
+    p_fr = payload['pneus']['fr']
+    p_rl = payload['pneus']['rl']
+    p_rr = payload['pneus']['rr']
+
+    # O carro calcula onde ele está (GPS), então usamos isso. Sem o campo, o
+    # setor fica vazio (como no protobuf): o sensor entra na chave de
+    # idempotência do SSACP, então não pode variar entre reentregas
+    sensor_atual = payload.get('sensor_responsavel', "")
+    validar_timestamp(payload['timestamp'])
+
+    return f1_pb2.DadosCarro(
+        carro_id=payload['carro_id'],
+        sensor_id=sensor_atual,  # Usa o nome do setor da pista (ex: "S do Senna")
+        velocidade=payload['velocidade'],
+        volta=payload['volta'],
+        timestamp=str(payload['timestamp']),
+        seq=payload.get('seq', 0),
+        pneu_fl=f1_pb2.Pneu(temperatura=p_fl['temperatura'], desgaste=p_fl['desgaste'], pressao=p_fl['pressao']),
+        pneu_fr=f1_pb2.Pneu(temperatura=p_fr['temperatura'], desgaste=p_fr['desgaste'], pressao=p_fr['pressao']),
+        pneu_rl=f1_pb2.Pneu(temperatura=p_rl['temperatura'], desgaste=p_rl['desgaste'], pressao=p_rl['pressao']),
+        pneu_rr=f1_pb2.Pneu(temperatura=p_rr['temperatura'], desgaste=p_rr['desgaste'], pressao=p_rr['pressao']),
+    )
+
+
+def dados_carro_da_mensagem(payload):
+    """Bytes MQTT do carro (JSON ou protobuf) -> DadosCarro (objeto)."""
+    if payload[:1] == b"{":
+        return json_para_dados_carro(json.loads(payload.decode()))
+    item = f1_pb2.DadosCarro.FromString(payload)
+    validar_timestamp(item.timestamp)
+    return item
+
+
+def mensagem_para_fila(payload, validar_binario=True):
+    """Bytes MQTT do carro -> DadosCarro serializado, pronto para entrar no lote.
+
+    JSON é convertido; binário passa direto. Com `validar_binario` o binário é
+    decodificado só para conferir (uma mensagem inválida derrubaria o lote
+    inteiro no SSACP), mas os bytes originais é que seguem.
+    """
+    # Um DadosCarro serializado nunca começa com '{' (0x7B seria o campo 15 com
+    # wire type 3, que não existe na mensagem)
+    if payload[:1] == b"{":
+        return json_para_dados_carro(json.loads(payload.decode())).SerializeToString()
+    dados = bytes(payload)
+    if validar_binario:
+        item = f1_pb2.DadosCarro.FromString(dados)
+        if not item.carro_id:
+            raise ValueError("DadosCarro sem carro_id")
+        validar_timestamp(item.timestamp)
+    return dados
+
+
+def carimbar_recebido(dados, instante):
+    """Acrescenta DadosCarro.recebido_isccp aos bytes (o protobuf junta campos concatenados)."""
+    return dados + _CAMPO_RECEBIDO_ISCCP + struct.pack("<d", instante)
+
+
+def _carimbo(cabecalho, instante):
+    return cabecalho + struct.pack("<d", instante) if instante else b""
+
+
+def _campo_repetido(cabecalho, itens):
+    return b"".join(cabecalho + varint(len(item)) + item for item in itens)
+
+
+def tamanho_lista(itens):
+    """Tamanho em bytes da ListaDadosCarro formada por estes itens serializados."""
+    return sum(1 + len(varint(len(item))) + len(item) for item in itens) + 9
+
+
+def montar_lista(itens, enviado=None):
+    """ListaDadosCarro serializada (requisição do EnviarLotePneus), com o instante de envio."""
+    return _campo_repetido(_CAMPO_DADOS_LISTA, itens) + _carimbo(_CAMPO_ENVIADO_LISTA, enviado)
+
+
+def montar_lote_sequenciado(sequencia, itens, enviado=None):
+    """LoteSequenciado serializado (requisição do FluxoPneus), com o instante de envio."""
+    return (_CAMPO_SEQUENCIA + varint(sequencia) + _campo_repetido(_CAMPO_DADOS_SEQUENCIADO, itens) +
+            _carimbo(_CAMPO_ENVIADO_SEQUENCIADO, enviado))
+
+
+class StubBytes:
+    """Stub do serviço Monitoramento que envia requisições já serializadas."""
+
+    def __init__(self, channel):
+        self.EnviarLotePneus = channel.unary_unary(
+            '/f1.Monitoramento/EnviarLotePneus',
+            request_serializer=None,
+            response_deserializer=f1_pb2.Resposta.FromString)
+        self.FluxoPneus = channel.stream_stream(
+            '/f1.Monitoramento/FluxoPneus',
+            request_serializer=None,
+            response_deserializer=f1_pb2.Confirmacao.FromString)
+
@@ -0,0 +1,104 @@
+"""Compressão por banda morta na borda (ISCCP).
+
+Para cada carro guarda os valores da última leitura enviada ao SSACP. Uma
+leitura nova só é enviada se algum pneu mudar além da banda configurada
+(temperatura, desgaste ou pressão), se a volta mudar ou se a última enviada
+tiver mais de `janela_max_s` segundos. As leituras descartadas entram na
+janela do carro, e a próxima leitura enviada leva o resumo da janela em
+DadosCarro.janela (só quando houve descarte): mín/máx/média de temperatura de cada pneu e desgaste
+ganho. Assim os picos chegam ao banco mesmo quando a leitura não é enviada.
+
+O tempo usado é o timestamp do carro, então a mesma corrida gravada produz
+sempre a mesma saída.
+"""
+POSICOES = ("fl", "fr", "rl", "rr")
+
+
+def _pneus(item):
+    return (item.pneu_fl, item.pneu_fr, item.pneu_rl, item.pneu_rr)
+
+
+class _EstadoCarro:
+    __slots__ = ("enviada", "volta", "timestamp_enviada", "inicio_janela", "amostras",
+                 "temp_min", "temp_max", "temp_soma")
+
+    def __init__(self):
+        self.enviada = None  # (temp, desgaste, pressao) de cada pneu na última enviada
+        self.volta = None
+        self.timestamp_enviada = 0.0
+        self.abrir_janela()
+
+    def abrir_janela(self):
+        self.inicio_janela = ""
+        self.amostras = 0
+        self.temp_min = [float("inf")] * 4
+        self.temp_max = [float("-inf")] * 4
+        self.temp_soma = [0.0] * 4
+
+    def acumular(self, item):
+        if self.amostras == 0:
+            self.inicio_janela = item.timestamp
+        self.amostras += 1
+        for i, pneu in enumerate(_pneus(item)):
+            self.temp_min[i] = min(self.temp_min[i], pneu.temperatura)
+            self.temp_max[i] = max(self.temp_max[i], pneu.temperatura)
+            self.temp_soma[i] += pneu.temperatura
+
+
+class CompressorBandaMorta:
+    def __init__(self, banda_temp=0.5, banda_desgaste=0.5, banda_pressao=0.05, janela_max_s=5.0):
+        self.bandas = (banda_temp, banda_desgaste, banda_pressao)
+        self.janela_max_s = janela_max_s
+        self.carros = {}
+        self.recebidas = 0
+        self.enviadas = 0
+
+    def _fora_da_banda(self, estado, item):
+        for anterior, pneu in zip(estado.enviada, _pneus(item)):
+            atual = (pneu.temperatura, pneu.desgaste, pneu.pressao)
+            for a, b, banda in zip(anterior, atual, self.bandas):
+                if abs(b - a) > banda:
+                    return True
+        return False
+
+    def processar(self, item):
+        """Recebe um DadosCarro; devolve o DadosCarro a enviar (com a janela) ou None."""
+        self.recebidas += 1
+        estado = self.carros.get(item.carro_id)
+        if estado is None:
+            estado = self.carros[item.carro_id] = _EstadoCarro()
+        try:
+            timestamp = float(item.timestamp)
+        except ValueError:
+            timestamp = estado.timestamp_enviada
+        estado.acumular(item)
+
+        enviar = (estado.enviada is None or item.volta != estado.volta
+                  or timestamp - estado.timestamp_enviada >= self.janela_max_s
+                  or self._fora_da_banda(estado, item))
+        if not enviar:
+            return None
+
+        atuais = [(p.temperatura, p.desgaste, p.pressao) for p in _pneus(item)]
+        # Sem leituras descartadas a própria leitura já é a janela
+        if estado.amostras > 1:
+            janela = item.janela
+            janela.amostras = estado.amostras
+            janela.inicio = estado.inicio_janela
+            for i, posicao in enumerate(POSICOES):
+                agregado = getattr(janela, posicao)
+                agregado.temp_min = estado.temp_min[i]
+                agregado.temp_max = estado.temp_max[i]
+                agregado.temp_media = estado.temp_soma[i] / estado.amostras
+                agregado.desgaste_delta = atuais[i][1] - estado.enviada[i][1]
+
+        estado.enviada = atuais
+        estado.volta = item.volta
+        estado.timestamp_enviada = timestamp
+        estado.abrir_janela()
+        self.enviadas += 1
+        return item
+
+    def taxa_compressao(self):
+        return self.recebidas / self.enviadas if self.enviadas else 0.0
+
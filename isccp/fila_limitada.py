@@ -0,0 +1,249 @@
+import os
+import glob
+import struct
+from collections import deque
+
+DESCARTAR_ANTIGAS = "descartar_antigas"
+DISCO = "disco"
+POLITICAS = (DESCARTAR_ANTIGAS, DISCO)
+
+_TAMANHO = struct.Struct(">I")
+
+
+class SegmentosDisco:
+    """Fila append-only em disco, dividida em segmentos numerados.
+
+    Cada registro é um DadosCarro serializado (os próprios itens da fila)
+    precedido de 4 bytes de tamanho.
+    A leitura avança um cursor, do segmento mais antigo para o mais novo, sem
+    apagar nada: um segmento só sai do disco depois de lido até o fim e de
+    todos os seus registros serem confirmados (`confirmar`), então uma queda
+    da ponte com lotes em voo não perde o que veio do disco. Segmentos
+    deixados por uma execução anterior são relidos do início (o que já tinha
+    sido confirmado é reenviado e descartado pela deduplicação do SSACP).
+    Com `limite_bytes`, o que passaria do limite não é gravado.
+    """
+
+    def __init__(self, diretorio, itens_por_segmento, limite_bytes=0):
+        self.diretorio = diretorio
+        self.itens_por_segmento = max(1, itens_por_segmento)
+        self.limite_bytes = limite_bytes
+        os.makedirs(diretorio, exist_ok=True)
+        # Segmentos com registros ainda não lidos; o primeiro é o do cursor
+        self._segmentos = deque(sorted(glob.glob(os.path.join(diretorio, "segmento_*.bin"))))
+        self._nao_confirmados = {}  # segmento -> registros lidos e ainda não confirmados
+        self._registros = sum(self._contar(caminho) for caminho in self._segmentos)
+        self.bytes = sum(os.path.getsize(caminho) for caminho in self._segmentos)
+        self._proximo_numero = self._numero(self._segmentos[-1]) + 1 if self._segmentos else 0
+        self._arquivo = None
+        self._itens_no_atual = 0
+        self._leitor = None
+
+    @staticmethod
+    def _numero(caminho):
+        return int(os.path.basename(caminho)[len("segmento_"):-len(".bin")])
+
+    @staticmethod
+    def _ler_registro(arquivo):
+        cabecalho = arquivo.read(_TAMANHO.size)
+        if len(cabecalho) < _TAMANHO.size:
+            return None
+        (tamanho,) = _TAMANHO.unpack(cabecalho)
+        registro = arquivo.read(tamanho)
+        return registro if len(registro) == tamanho else None  # truncado: queda no meio da escrita
+
+    @staticmethod
+    def _contar(caminho):
+        """Registros completos de um segmento (sem ler o conteúdo)."""
+        tamanho_arquivo = os.path.getsize(caminho)
+        registros = pos = 0
+        with open(caminho, "rb") as arquivo:
+            while pos + _TAMANHO.size <= tamanho_arquivo:
+                arquivo.seek(pos)
+                (tamanho,) = _TAMANHO.unpack(arquivo.read(_TAMANHO.size))
+                pos += _TAMANHO.size + tamanho
+                if pos > tamanho_arquivo:
+                    break
+                registros += 1
+        return registros
+
+    def _abrir_novo_segmento(self):
+        self._fechar_atual()
+        caminho = os.path.join(self.diretorio, f"segmento_{self._proximo_numero:08d}.bin")
+        self._proximo_numero += 1
+        self._arquivo = open(caminho, "ab")
+        self._itens_no_atual = 0
+        self._segmentos.append(caminho)
+
+    def _fechar_atual(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def gravar(self, itens):
+        """Acrescenta os itens ao fim do disco; devolve quantos couberam no limite."""
+        gravados = 0
+        for item in itens:
+            tamanho = _TAMANHO.size + len(item)
+            if self.limite_bytes and self.bytes + tamanho > self.limite_bytes:
+                break
+            if self._arquivo is None or self._itens_no_atual >= self.itens_por_segmento:
+                self._abrir_novo_segmento()
+            self._arquivo.write(_TAMANHO.pack(len(item)) + item)
+            self._itens_no_atual += 1
+            self._registros += 1
+            self.bytes += tamanho
+            gravados += 1
+        if self._arquivo is not None:
+            self._arquivo.flush()
+        return gravados
+
+    def ler(self, maximo):
+        """Até `maximo` registros a partir do cursor, como pares (registro, segmento)."""
+        lidos = []
+        while len(lidos) < maximo and self._segmentos:
+            caminho = self._segmentos[0]
+            if self._leitor is None:
+                self._leitor = open(caminho, "rb")
+                self._nao_confirmados.setdefault(caminho, 0)
+            registro = self._ler_registro(self._leitor)
+            if registro is None:
+                self._fim_do_segmento(caminho)
+                continue
+            lidos.append((registro, caminho))
+            self._nao_confirmados[caminho] += 1
+            self._registros -= 1
+        return lidos
+
+    def _fim_do_segmento(self, caminho):
+        self._leitor.close()
+        self._leitor = None
+        if self._arquivo is not None and self._arquivo.name == caminho:
+            # O cursor alcançou a escrita: o próximo registro abre outro segmento
+            self._fechar_atual()
+        self._segmentos.popleft()
+        self._apagar_se_confirmado(caminho)
+
+    def confirmar(self, caminho, quantidade):
+        """Registros de `caminho` confirmados pelo SSACP; apaga o segmento quando lido e todo confirmado."""
+        self._nao_confirmados[caminho] -= quantidade
+        self._apagar_se_confirmado(caminho)
+
+    def _apagar_se_confirmado(self, caminho):
+        if self._nao_confirmados.get(caminho) or (self._segmentos and self._segmentos[0] == caminho):
+            return
+        self._nao_confirmados.pop(caminho, None)
+        self.bytes -= os.path.getsize(caminho)
+        os.remove(caminho)
+
+    def __bool__(self):
+        """True enquanto houver registros não lidos."""
+        return self._registros > 0
+
+    def __len__(self):
+        """Registros ainda não lidos."""
+        return self._registros
+
+    def fechar(self):
+        self._fechar_atual()
+        if self._leitor is not None:
+            self._leitor.close()
+            self._leitor = None
+
+
+class FilaLimitada:
+    """Fila de mensagens com capacidade fixa em memória.
+
+    Quando cheia, aplica a política de excesso:
+    - descartar_antigas: remove as mensagens mais antigas da memória;
+    - disco: grava o excedente em segmentos no disco, relidos quando a
+      memória esvazia (ou seja, quando o SSACP voltou a aceitar lotes).
+      Enquanto houver algo não lido no disco, as novas também vão para o
+      disco, para a ordem continuar a de chegada. Os itens retirados e ainda
+      sem confirmação contam na capacidade, então um lote devolvido volta
+      para a frente da memória sem passar dela; os lidos do disco só são
+      apagados de lá em `confirmar`. Acima de `limite_disco_bytes` (0 = sem
+      limite) as novas são descartadas e contadas em `descartadas`.
+    Não é thread-safe: quem usa deve proteger com o próprio lock.
+    """
+
+    def __init__(self, capacidade, politica=DESCARTAR_ANTIGAS, diretorio_disco=None, limite_disco_bytes=0):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de excesso inválida: {politica} (use {', '.join(POLITICAS)})")
+        if politica == DISCO and not diretorio_disco:
+            raise ValueError("A política 'disco' precisa de um diretório")
+        self.capacidade = capacidade
+        self.politica = politica
+        self._memoria = deque()
+        self._disco = (SegmentosDisco(diretorio_disco, capacidade // 4, limite_disco_bytes)
+                       if politica == DISCO else None)
+        self._em_voo = 0
+        # id(item) -> (item, segmento) dos itens lidos do disco e ainda sem confirmação
+        self._origem = {}
+        self.descartadas = 0
+        self.enviadas_ao_disco = 0
+
+    def adicionar(self, item):
+        if self.politica == DISCO:
+            if not self._disco and len(self._memoria) + self._em_voo < self.capacidade:
+                self._memoria.append(item)
+            elif self._disco.gravar([item]):
+                self.enviadas_ao_disco += 1
+            else:
+                self.descartadas += 1
+        elif len(self._memoria) < self.capacidade:
+            self._memoria.append(item)
+        else:
+            self._memoria.popleft()
+            self._memoria.append(item)
+            self.descartadas += 1
+
+    def devolver(self, itens):
+        """Recoloca um lote que falhou na frente da fila."""
+        self._em_voo -= len(itens)
+        self._memoria.extendleft(reversed(itens))
+        if self.politica == DISCO:
+            return  # memória + em voo nunca passa da capacidade
+        excesso = len(self._memoria) - self.capacidade
+        if excesso > 0:
+            for _ in range(excesso):
+                self._memoria.popleft()
+            self.descartadas += excesso
+
+    def retirar(self, quantidade):
+        if not self._memoria and self._disco:
+            # Memória vazia: o SSACP está drenando, então relê o disco (até a capacidade)
+            for item, segmento in self._disco.ler(self.capacidade - self._em_voo):
+                self._origem[id(item)] = (item, segmento)
+                self._memoria.append(item)
+        lote = [self._memoria.popleft() for _ in range(min(quantidade, len(self._memoria)))]
+        self._em_voo += len(lote)
+        return lote
+
+    def confirmar(self, itens):
+        """Itens retirados que o SSACP gravou; os que vieram do disco liberam seus segmentos."""
+        self._em_voo -= len(itens)
+        if not self._origem:
+            return
+        por_segmento = {}
+        for item in itens:
+            origem = self._origem.get(id(item))
+            if origem is not None and origem[0] is item:
+                del self._origem[id(item)]
+                por_segmento[origem[1]] = por_segmento.get(origem[1], 0) + 1
+        for segmento, quantidade in por_segmento.items():
+            self._disco.confirmar(segmento, quantidade)
+
+    def em_disco(self):
+        return len(self._disco) if self._disco is not None else 0
+
+    def __len__(self):
+        return len(self._memoria)
+
+    def __bool__(self):
+        # O disco só conta se ainda houver espaço para trazer algo dele para a memória
+        return bool(self._memoria) or (bool(self._disco) and self._em_voo < self.capacidade)
+
+    def fechar(self):
+        if self._disco is not None:
+            self._disco.fechar()
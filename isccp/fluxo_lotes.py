@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from isccp.codificacao import montar_lote_sequenciado
+
+
+class FluxoLotes:
+    """Um RPC FluxoPneus aberto com o SSACP.
+
+    Os lotes são numerados e ficam guardados até o servidor confirmar que a
+    sequência foi gravada. Se o fluxo cair, os lotes sem confirmação são
+    entregues a `ao_falhar` para voltarem à fila da ponte.
+    """
+
+    def __init__(self, stub, ao_confirmar, ao_falhar, prazo=None):
+        self.ao_confirmar = ao_confirmar
+        self.ao_falhar = ao_falhar
+        self.aberto = True
+        self._saida = queue.Queue()
+        self._pendentes = OrderedDict()  # sequência -> (DadosCarro serializados, instante de envio)
+        self._sequencia = 0
+        self._lock = threading.Lock()
+        self.criado = time.monotonic()
+        self._respostas = stub.FluxoPneus(self._gerar_requisicoes())
+        threading.Thread(target=self._ler_confirmacoes, daemon=True).start()
+        if prazo:
+            # O prazo é vigiado aqui, não na thread de envio: ela pode estar parada esperando vaga em voo
+            threading.Thread(target=self._vigiar_prazo, args=(prazo,), daemon=True).start()
+
+    def _gerar_requisicoes(self):
+        while True:
+            lote = self._saida.get()
+            if lote is None:
+                return
+            yield lote
+
+    def enviar(self, itens):
+        """Coloca o lote (DadosCarro serializados) no fluxo. Retorna False se o fluxo já caiu."""
+        with self._lock:
+            if not self.aberto:
+                return False
+            self._sequencia += 1
+            self._pendentes[self._sequencia] = (itens, time.monotonic())
+            self._saida.put(montar_lote_sequenciado(self._sequencia, itens, time.time()))
+        return True
+
+    def _ler_confirmacoes(self):
+        erro = None
+        try:
+            for confirmacao in self._respostas:
+                confirmados = []
+                with self._lock:
+                    while self._pendentes and next(iter(self._pendentes)) <= confirmacao.ultima_sequencia_gravada:
+                        confirmados.append(self._pendentes.popitem(last=False)[1])
+                for itens, inicio in confirmados:
+                    self.ao_confirmar(itens, inicio)
+        except Exception as e:
+            erro = e
+
+        with self._lock:
+            self.aberto = False
+            restantes = [itens for itens, _ in self._pendentes.values()]
+            self._pendentes.clear()
+        self._saida.put(None)
+        self.ao_falhar(restantes, erro)
+
+    def idade(self):
+        return time.monotonic() - self.criado
+
+    def verificar_prazo(self, prazo):
+        """Cancela o fluxo se o lote mais antigo está há mais de `prazo` s sem confirmação.
+
+        Um fluxo não tem deadline próprio (dura enquanto a ponte viver); o
+        cancelamento cai em ao_falhar, que devolve os lotes pendentes à fila.
+        """
+        with self._lock:
+            if not self.aberto or not self._pendentes:
+                return False
+            _, inicio = next(iter(self._pendentes.values()))
+            vencido = time.monotonic() - inicio > prazo
+        if vencido:
+            self.cancelar()
+        return vencido
+
+    def _vigiar_prazo(self, prazo):
+        intervalo = max(0.05, prazo / 4)
+        while self.aberto:
+            if self.verificar_prazo(prazo):
+                return
+            time.sleep(intervalo)
+
+    def fechar(self):
+        """Encerra o envio; o servidor ainda confirma o que já recebeu."""
+        self._saida.put(None)
+
+    def cancelar(self):
+        self._respostas.cancel()
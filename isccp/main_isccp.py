@@ -1,6 +1,5 @@
 import sys
 import os
-import json
 import time
 import random
 import threading
@@ -8,92 +7,388 @@ import paho.mqtt.client as mqtt
 import grpc
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from protos import f1_pb2, f1_pb2_grpc
+from protos import f1_pb2
+from comum.metricas import LIMITES_LATENCIA, LIMITES_LOTE, Registro, servir_metricas
+from isccp.canal_grpc import criar_canal
+from isccp.fila_limitada import FilaLimitada, DESCARTAR_ANTIGAS
+from isccp.fluxo_lotes import FluxoLotes
+from isccp.codificacao import (StubBytes, carimbar_recebido, dados_carro_da_mensagem, mensagem_para_fila,
+                               montar_lista, tamanho_lista)
+from isccp.compressao import CompressorBandaMorta
 
 # Configurações
 BROKER = os.getenv("BROKER_ADDRESS", "localhost")
-TOPIC = "f1/pneus"
+# '#' casa tanto o tópico antigo (f1/pneus) quanto os tópicos por carro (f1/pneus/<carro>)
+TOPIC = "f1/pneus/#"
+# Alvo gRPC das réplicas do SSACP: "dns:///ssacp:50051" (todas atrás do nome),
+# "ipv4:host1:porta,host2:porta" (lista fixa) ou um endereço só (isccp/canal_grpc.py)
 GRPC_HOST = os.getenv("GRPC_SERVER", "localhost:50051")
+# Assinatura compartilhada ($share/<grupo>/...): o broker entrega cada mensagem
+# a apenas UMA réplica do grupo. Vazio = todas as réplicas recebem tudo (modo antigo).
+GRUPO_COMPARTILHADO = os.getenv("ISCCP_GRUPO_COMPARTILHADO", "isccp")
 
-# Buffer de Lote
-buffer_dados = []
-lock = threading.Lock()
+# Como os lotes chegam ao SSACP: "fluxo" mantém um RPC FluxoPneus aberto e
+# recebe confirmações periódicas; "unario" faz um EnviarLotePneus por lote.
+MODO_FLUXO = "fluxo"
+MODO_UNARIO = "unario"
+MODO_ENVIO = os.getenv("ISCCP_MODO_ENVIO", MODO_FLUXO)
 
-# Config gRPC
-channel = grpc.insecure_channel(GRPC_HOST)
-stub = f1_pb2_grpc.MonitoramentoStub(channel)
+# Envio do lote: o que acontecer primeiro entre tamanho máximo e idade máxima
+LOTE_MAX = int(os.getenv("ISCCP_LOTE_MAX", "500"))
+LOTE_IDADE_MAX = float(os.getenv("ISCCP_LOTE_IDADE_MAX", "1.0"))  # segundos
+# Máximo de lotes enviados e ainda não confirmados pelo SSACP
+ENVIOS_EM_VOO = int(os.getenv("ISCCP_ENVIOS_EM_VOO", "4"))
+# Prazo do RPC unário; no fluxo, prazo para a confirmação de cada lote (vencido, o
+# fluxo é cancelado e os lotes sem confirmação voltam para a fila)
+TIMEOUT_RPC = float(os.getenv("ISCCP_TIMEOUT_RPC", "10"))
+# Balanceamento entre as réplicas: round_robin (por RPC) ou pick_first (uma réplica só)
+BALANCEAMENTO = os.getenv("ISCCP_BALANCEAMENTO", "round_robin")
+# Health checking (grpc.health.v1): réplicas NOT_SERVING saem do rodízio
+HEALTH_CHECK = os.getenv("ISCCP_HEALTH_CHECK", "1") == "1"
+KEEPALIVE_S = float(os.getenv("ISCCP_KEEPALIVE_S", "20"))
+KEEPALIVE_TIMEOUT_S = float(os.getenv("ISCCP_KEEPALIVE_TIMEOUT_S", "10"))
+# Compressão dos lotes no gRPC: "" (nenhuma), gzip ou deflate
+COMPRESSAO_GRPC = os.getenv("ISCCP_COMPRESSAO_GRPC", "")
+# O fluxo FluxoPneus fica numa réplica só enquanto durar; depois disso ele é
+# fechado e reaberto (o round_robin escolhe a próxima réplica). 0 = nunca.
+FLUXO_IDADE_MAX_S = float(os.getenv("ISCCP_FLUXO_IDADE_MAX_S", "60"))
+# Buffer limitado: capacidade em mensagens e o que fazer quando enche
+# (descartar_antigas | disco). No modo disco o excedente vai para segmentos
+# em ISCCP_DIR_DISCO e é reenviado quando o SSACP volta.
+BUFFER_MAX = int(os.getenv("ISCCP_BUFFER_MAX", "50000"))
+POLITICA_EXCESSO = os.getenv("ISCCP_POLITICA_EXCESSO", DESCARTAR_ANTIGAS)
+DIR_DISCO = os.getenv("ISCCP_DIR_DISCO", "/tmp/isccp_fila")
+# Limite do disco; acima dele as novas mensagens são descartadas (0 = sem limite)
+DISCO_MAX_MB = float(os.getenv("ISCCP_DISCO_MAX_MB", "1024"))
+# Lotes acima disso são divididos (o limite padrão do gRPC é 4MB por mensagem)
+LIMITE_LOTE_BYTES = int(os.getenv("ISCCP_LIMITE_LOTE_BYTES", str(4 * 1024 * 1024 - 256 * 1024)))
+# Reenvio após falha: espera base * 2^falhas (até o máximo), com jitter
+BACKOFF_BASE = float(os.getenv("ISCCP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("ISCCP_BACKOFF_MAX", "30"))
+# Mensagens binárias (DadosCarro) são decodificadas só para validação antes de
+# entrar no lote; 0 confia no carro e repassa os bytes sem olhar
+VALIDAR_BINARIO = os.getenv("ISCCP_VALIDAR_BINARIO", "1") == "1"
+# Compressão por banda morta (isccp/compressao.py): só envia a leitura de um
+# carro se algum pneu variar mais que a banda desde a última enviada, se a
+# volta mudar ou a cada ISCCP_JANELA_MAX_S segundos. Desligada por padrão.
+BANDA_MORTA = os.getenv("ISCCP_BANDA_MORTA", "0") == "1"
+BANDA_TEMP = float(os.getenv("ISCCP_BANDA_TEMP", "0.5"))          # °C
+BANDA_DESGASTE = float(os.getenv("ISCCP_BANDA_DESGASTE", "0.5"))  # %
+BANDA_PRESSAO = float(os.getenv("ISCCP_BANDA_PRESSAO", "0.05"))   # psi
+JANELA_MAX_S = float(os.getenv("ISCCP_JANELA_MAX_S", "5"))
+# Intervalo (s) entre os relatórios dos histogramas no log
+INTERVALO_RELATORIO = float(os.getenv("ISCCP_INTERVALO_RELATORIO", "30"))
+# GET /metrics (formato Prometheus) nesta porta; 0 desliga
+METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "9102"))
 
 
-def on_connect(client, userdata, flags, rc):
-    print(f"[ISCCP] Conectado ao Broker. Aguardando carros...")
-    client.subscribe(TOPIC)
+def topico_assinatura(grupo=GRUPO_COMPARTILHADO):
+    if grupo:
+        return f"$share/{grupo}/{TOPIC}"
+    return TOPIC
 
 
-def on_message(client, userdata, msg):
-    try:
-        payload = json.loads(msg.payload.decode())
-
-        # --- CORREÇÃO AQUI: ADAPTANDO PARA AS NOVAS CHAVES (fl, fr, rl, rr) ---
-        p_fl = payload['pneus']['fl']
-        p_fr = payload['pneus']['fr']
-        p_rl = payload['pneus']['rl']
-        p_rr = payload['pneus']['rr']
-
-        # O carro agora calcula onde ele está (GPS), então usamos isso
-        sensor_atual = payload.get('sensor_responsavel', f"Sensor_Backup_{random.randint(1, 99)}")
-
-        objeto_proto = f1_pb2.DadosCarro(
-            carro_id=payload['carro_id'],
-            sensor_id=sensor_atual,  # Usa o nome do setor da pista (ex: "S do Senna")
-            velocidade=payload['velocidade'],
-            volta=payload['volta'],
-            timestamp=str(payload['timestamp']),
-            pneu_fl=f1_pb2.Pneu(temperatura=p_fl['temperatura'], desgaste=p_fl['desgaste'], pressao=p_fl['pressao']),
-            pneu_fr=f1_pb2.Pneu(temperatura=p_fr['temperatura'], desgaste=p_fr['desgaste'], pressao=p_fr['pressao']),
-            pneu_rl=f1_pb2.Pneu(temperatura=p_rl['temperatura'], desgaste=p_rl['desgaste'], pressao=p_rl['pressao']),
-            pneu_rr=f1_pb2.Pneu(temperatura=p_rr['temperatura'], desgaste=p_rr['desgaste'], pressao=p_rr['pressao']),
-        )
-
-        with lock:
-            buffer_dados.append(objeto_proto)
-
-    except Exception as e:
-        # Se der erro de chave, mostra no log para sabermos
-        print(f"[ISCCP] Erro ao ler JSON do carro: {e}")
-
-
-def rotina_envio_periodico():
-    while True:
-        time.sleep(3)  # Envia lote a cada 5 segundos
-        with lock:
-            qtd = len(buffer_dados)
-            if qtd > 0:
-                print(f"[ISCCP] Enviando lote de {qtd} telemetrias...")
-                try:
-                    lote = f1_pb2.ListaDadosCarro(dados=buffer_dados)
-                    stub.EnviarLotePneus(lote)
-                    buffer_dados.clear()
-                    print(f"[ISCCP] Lote enviado com sucesso.")
-                except Exception as e:
-                    print(f"[ISCCP] ERRO gRPC: {e}")
-
-
-# Inicia MQTT
-client = mqtt.Client(client_id=f"ISCCP_Listener_{random.randint(1000, 9999)}")
-client.on_connect = on_connect
-client.on_message = on_message
-
-while True:
+def dividir_lote(lote, limite_bytes=LIMITE_LOTE_BYTES):
+    """Divide o lote (DadosCarro serializados) ao meio até cada parte caber no limite do gRPC."""
+    if len(lote) <= 1 or tamanho_lista(lote) <= limite_bytes:
+        return [lote]
+    meio = len(lote) // 2
+    return dividir_lote(lote[:meio], limite_bytes) + dividir_lote(lote[meio:], limite_bytes)
+
+
+def tempo_backoff(falhas, base=BACKOFF_BASE, maximo=BACKOFF_MAX):
+    # "Full jitter": espalha as réplicas para não voltarem todas juntas
+    return random.uniform(0, min(maximo, base * (2 ** falhas)))
+
+
+class PonteISCCP:
+    """Ponte MQTT -> gRPC: acumula as telemetrias dos carros e envia em lote."""
+
+    def __init__(self, broker=BROKER, grpc_host=GRPC_HOST, grupo=GRUPO_COMPARTILHADO, porta_broker=1883,
+                 lote_max=LOTE_MAX, lote_idade_max=LOTE_IDADE_MAX, envios_em_voo=ENVIOS_EM_VOO,
+                 buffer_max=BUFFER_MAX, politica_excesso=POLITICA_EXCESSO, dir_disco=DIR_DISCO,
+                 modo_envio=MODO_ENVIO, validar_binario=VALIDAR_BINARIO, banda_morta=BANDA_MORTA,
+                 balanceamento=BALANCEAMENTO, health_check=HEALTH_CHECK, compressao=COMPRESSAO_GRPC,
+                 fluxo_idade_max=FLUXO_IDADE_MAX_S, timeout_rpc=TIMEOUT_RPC, disco_max_mb=DISCO_MAX_MB):
+        self.broker = broker
+        self.porta_broker = porta_broker
+        self.topico = topico_assinatura(grupo)
+
+        # Buffer de Lote (o lote é retirado sob o lock e enviado fora dele).
+        # Os itens são DadosCarro já serializados (ver isccp/codificacao.py).
+        self.fila = FilaLimitada(buffer_max, politica_excesso, dir_disco, int(disco_max_mb * 1024 * 1024))
+        self.inicio_buffer = 0.0  # instante da mensagem mais antiga no buffer
+        self.falhas_consecutivas = 0
+        self.proxima_tentativa = 0.0
+        self.lock = threading.Lock()
+        self.sinal_envio = threading.Event()
+        self.recebidas = 0
+        self.lote_max = lote_max
+        self.lote_idade_max = lote_idade_max
+        self.em_voo = threading.BoundedSemaphore(envios_em_voo)
+        self.rpcs_pendentes = 0
+        self.validar_binario = validar_binario
+        # Estado por carro, usado só pela thread do MQTT (on_message)
+        self.compressor = (CompressorBandaMorta(BANDA_TEMP, BANDA_DESGASTE, BANDA_PRESSAO, JANELA_MAX_S)
+                           if banda_morta else None)
+
+        self.registro = Registro()
+        self.hist_latencia_envio = self.registro.histograma(
+            "isccp_latencia_envio_s", LIMITES_LATENCIA, "Do envio do lote à confirmação do SSACP (s)")
+        self.hist_tamanho_lote = self.registro.histograma("isccp_tamanho_lote", LIMITES_LOTE, "Leituras por lote")
+        # Do timestamp do carro até a confirmação de gravação
+        self.hist_latencia_ponta = self.registro.histograma(
+            "isccp_latencia_ponta_a_ponta_s", LIMITES_LATENCIA, "Da publicação no carro à confirmação (s)")
+        self.confirmadas = self.registro.contador("isccp_leituras_confirmadas_total", "Leituras gravadas pelo SSACP")
+        self.falhas_envio = self.registro.contador("isccp_falhas_envio_total", "Lotes devolvidos à fila")
+        self.invalidas = self.registro.contador("isccp_mensagens_invalidas_total", "Mensagens MQTT descartadas")
+        self.registro.medidor("isccp_mensagens_recebidas_total", lambda: self.recebidas, "Leituras enfileiradas",
+                              tipo="counter")
+        self.registro.medidor("isccp_fila_mensagens", self._sob_lock(lambda: len(self.fila)),
+                              "Leituras na fila (memória + disco)")
+        self.registro.medidor("isccp_fila_disco", self._sob_lock(lambda: self.fila.em_disco()),
+                              "Leituras na fila em disco")
+        self.registro.medidor("isccp_descartadas_total", self._sob_lock(lambda: self.fila.descartadas),
+                              "Leituras descartadas com a fila cheia", tipo="counter")
+        self.registro.medidor("isccp_envios_em_voo", lambda: self.rpcs_pendentes, "Lotes sem confirmação")
+        if self.compressor:
+            self.registro.medidor("isccp_banda_morta_taxa", self.compressor.taxa_compressao,
+                                  "Leituras recebidas por leitura enviada")
+
+        # Config gRPC: rodízio entre as réplicas do SSACP com health checking e keepalive
+        self.channel = criar_canal(grpc_host, compressao, balanceamento=balanceamento, health_check=health_check,
+                                   keepalive_s=KEEPALIVE_S, keepalive_timeout_s=KEEPALIVE_TIMEOUT_S)
+        # Requisições montadas direto dos bytes dos carros (sem reserializar)
+        self.stub = StubBytes(self.channel)
+        self.modo_envio = modo_envio
+        self.fluxo = None
+        self.fluxo_idade_max = fluxo_idade_max
+        self.timeout_rpc = timeout_rpc
+
+        self.client = mqtt.Client(client_id=f"ISCCP_Listener_{random.randint(1000, 99999)}")
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+
+    def _sob_lock(self, funcao):
+        def ler():
+            with self.lock:
+                return funcao()
+        return ler
+
+    def on_connect(self, client, userdata, flags, rc):
+        print(f"[ISCCP] Conectado ao Broker. Aguardando carros em '{self.topico}'...")
+        client.subscribe(self.topico)
+
+    def on_message(self, client, userdata, msg):
+        try:
+            recebido = time.time()
+            if self.compressor is None:
+                # JSON é convertido para DadosCarro; binário entra na fila como chegou
+                # (só com o carimbo de recebimento acrescentado no fim)
+                self.enfileirar(carimbar_recebido(mensagem_para_fila(msg.payload, self.validar_binario), recebido))
+                return
+            item = self.compressor.processar(dados_carro_da_mensagem(msg.payload))
+            if item is not None:
+                item.recebido_isccp = recebido
+                self.enfileirar(item.SerializeToString())
+        except Exception as e:
+            self.invalidas.incrementar()
+            # Se der erro de chave, mostra no log para sabermos
+            print(f"[ISCCP] Erro ao ler mensagem do carro: {e}")
+
+    def enfileirar(self, dados_carro):
+        """Enfileira um DadosCarro serializado (bytes)."""
+        with self.lock:
+            if not self.fila:
+                self.inicio_buffer = time.monotonic()
+            self.fila.adicionar(dados_carro)
+            self.recebidas += 1
+            cheio = len(self.fila) >= self.lote_max
+        if cheio:
+            self.sinal_envio.set()
+
+    def enviar_buffer(self):
+        """Retira até lote_max mensagens da fila e dispara o RPC sem bloquear o MQTT."""
+        with self.lock:
+            lote = self.fila.retirar(self.lote_max)
+            if not lote:
+                return
+            if self.fila:
+                self.inicio_buffer = time.monotonic()
+
+        for itens in dividir_lote(lote):
+            # Limita os lotes sem confirmação; só a thread de envio espera aqui, nunca o on_message.
+            # A espera acorda periodicamente para vencer o prazo de um fluxo que parou de confirmar
+            # (o FluxoLotes também vigia o prazo sozinho)
+            while not self.em_voo.acquire(timeout=self._espera_em_voo()):
+                fluxo = self.fluxo
+                if fluxo is not None:
+                    fluxo.verificar_prazo(self.timeout_rpc)
+            print(f"[ISCCP] Enviando lote de {len(itens)} telemetrias...")
+            self.hist_tamanho_lote.observar(len(itens))
+            with self.lock:
+                self.rpcs_pendentes += 1
+            if self.modo_envio == MODO_FLUXO:
+                self._enviar_pelo_fluxo(itens)
+            else:
+                self._enviar_unario(itens)
+
+    def _espera_em_voo(self):
+        return max(0.05, self.timeout_rpc / 4) if self.timeout_rpc else 1.0
+
+    def _enviar_unario(self, itens):
+        inicio = time.monotonic()
+        try:
+            futuro = self.stub.EnviarLotePneus.future(montar_lista(itens, time.time()), timeout=self.timeout_rpc)
+        except Exception as e:
+            self._liberar_envio()
+            self._devolver_ao_buffer(itens, e)
+            return
+        futuro.add_done_callback(lambda f: self._ao_concluir_envio(f, itens, inicio))
+
+    def _enviar_pelo_fluxo(self, itens):
+        with self.lock:
+            if self.fluxo is not None and self.fluxo.aberto and self.fluxo_idade_max \
+                    and self.fluxo.idade() >= self.fluxo_idade_max:
+                # O servidor confirma o que já recebeu e encerra; o novo fluxo vai para a próxima réplica
+                self.fluxo.fechar()
+                self.fluxo = None
+            if self.fluxo is None or not self.fluxo.aberto:
+                self.fluxo = FluxoLotes(self.stub, self._ao_confirmar, self._ao_falhar_fluxo, self.timeout_rpc)
+            fluxo = self.fluxo
+        if not fluxo.enviar(itens):
+            # O fluxo caiu entre a criação e o envio; volta para a fila
+            self._liberar_envio()
+            self._devolver_ao_buffer(itens, "fluxo encerrado")
+
+    def _liberar_envio(self):
+        with self.lock:
+            self.rpcs_pendentes -= 1
+        self.em_voo.release()
+
+    def ocioso(self):
+        """True quando não há nada na fila (memória ou disco) nem RPC pendente."""
+        with self.lock:
+            return not self.fila and self.rpcs_pendentes == 0
+
+    def _ao_concluir_envio(self, futuro, itens, inicio):
+        try:
+            futuro.result()
+        except Exception as e:
+            self._liberar_envio()
+            self._devolver_ao_buffer(itens, e)
+            return
+        self._ao_confirmar(itens, inicio)
+
+    def _ao_confirmar(self, itens, inicio):
+        self._liberar_envio()
+        agora = time.monotonic()
+        self.hist_latencia_envio.observar(agora - inicio)
+        self.confirmadas.incrementar(len(itens))
+        # Ponta a ponta pela leitura mais antiga do lote: decodificar todas as
+        # mensagens aqui desfaria a economia de não reserializar
+        try:
+            self.hist_latencia_ponta.observar(time.time() - float(f1_pb2.DadosCarro.FromString(itens[0]).timestamp))
+        except ValueError:
+            pass
+        with self.lock:
+            self.fila.confirmar(itens)
+            self.falhas_consecutivas = 0
+        print(f"[ISCCP] Lote enviado com sucesso.")
+
+    def _ao_falhar_fluxo(self, restantes, erro):
+        for _ in restantes:
+            self._liberar_envio()
+        if isinstance(erro, grpc.RpcError) and erro.code() == grpc.StatusCode.UNIMPLEMENTED:
+            # SSACP antigo, sem FluxoPneus: segue com o RPC unário
+            print("[ISCCP] SSACP não suporta FluxoPneus; usando EnviarLotePneus.")
+            self.modo_envio = MODO_UNARIO
+        if restantes:
+            self._devolver_ao_buffer([item for itens in restantes for item in itens],
+                                     erro or "fluxo encerrado pelo servidor")
+
+    def _devolver_ao_buffer(self, itens, erro):
+        print(f"[ISCCP] ERRO gRPC: {erro}")
+        self.falhas_envio.incrementar()
+        # Volta para o início da fila e adia o próximo envio (backoff exponencial)
+        with self.lock:
+            self.fila.devolver(list(itens))
+            self.inicio_buffer = time.monotonic()
+            espera = tempo_backoff(self.falhas_consecutivas)
+            self.falhas_consecutivas += 1
+            self.proxima_tentativa = max(self.proxima_tentativa, time.monotonic() + espera)
+
+    def relatorio_metricas(self):
+        with self.lock:
+            fila, disco = len(self.fila), self.fila.em_disco()
+            descartadas = self.fila.descartadas
+        compressao = f" compressao={self.compressor.taxa_compressao():.1f}x" if self.compressor else ""
+        print(f"[ISCCP] {self.hist_tamanho_lote.resumo()} | {self.hist_latencia_envio.resumo()} | "
+              f"{self.hist_latencia_ponta.resumo()} | fila={fila} disco={disco} descartadas={descartadas}{compressao}")
+
+    def rotina_envio_periodico(self, parar=None):
+        parar = parar or threading.Event()
+        proximo_relatorio = time.monotonic() + INTERVALO_RELATORIO
+        while not parar.is_set():
+            with self.lock:
+                pendentes = len(self.fila)
+                ha_dados = bool(self.fila)  # inclui o que está no disco
+                idade = time.monotonic() - self.inicio_buffer if pendentes else 0.0
+                espera_backoff = self.proxima_tentativa - time.monotonic()
+
+            fluxo = self.fluxo
+            if fluxo is not None:
+                fluxo.verificar_prazo(self.timeout_rpc)
+
+            if espera_backoff > 0:
+                parar.wait(espera_backoff)
+                continue
+
+            if pendentes >= self.lote_max or (ha_dados and (pendentes == 0 or idade >= self.lote_idade_max)):
+                self.enviar_buffer()
+                continue
+
+            if time.monotonic() >= proximo_relatorio:
+                self.relatorio_metricas()
+                proximo_relatorio = time.monotonic() + INTERVALO_RELATORIO
+
+            # Acorda quando o lote mais antigo atingir a idade máxima ou o buffer encher
+            self.sinal_envio.wait(self.lote_idade_max - idade)
+            self.sinal_envio.clear()
+
+        # Envia o que sobrou antes de encerrar
+        self.enviar_buffer()
+
+    def conectar(self):
+        while True:
+            try:
+                self.client.connect(self.broker, self.porta_broker, 60)
+                break
+            except:
+                time.sleep(2)
+        self.client.loop_start()
+
+    def parar(self, espera_confirmacoes=5.0):
+        self.client.loop_stop()
+        self.client.disconnect()
+        if self.fluxo is not None:
+            self.fluxo.fechar()
+            limite = time.monotonic() + espera_confirmacoes
+            while self.rpcs_pendentes and time.monotonic() < limite:
+                time.sleep(0.05)
+        self.channel.close()
+        with self.lock:
+            self.fila.fechar()
+
+
+if __name__ == '__main__':
+    ponte = PonteISCCP()
+    if METRICAS_PORTA:
+        servir_metricas(ponte.registro, METRICAS_PORTA)
+    ponte.conectar()
+
+    print("ISCCP Rodando: Coletando dados da pista...")
     try:
-        client.connect(BROKER, 1883, 60)
-        break
-    except:
-        time.sleep(2)
-
-client.loop_start()
-
-print("ISCCP Rodando: Coletando dados da pista...")
-try:
-    rotina_envio_periodico()
-except KeyboardInterrupt:
-    client.loop_stop()
\ No newline at end of file
+        ponte.rotina_envio_periodico()
+    except KeyboardInterrupt:
+        ponte.parar()
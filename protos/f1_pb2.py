@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fprotos/f1.proto\x12\x02\x66\x31\"0\n\x0fListaDadosCarro\x12\x1d\n\x05\x64\x61\x64os\x18\x01 \x03(\x0b\x32\x0e.f1.DadosCarro\">\n\x04Pneu\x12\x13\n\x0btemperatura\x18\x01 \x01(\x02\x12\x10\n\x08\x64\x65sgaste\x18\x02 \x01(\x02\x12\x0f\n\x07pressao\x18\x03 \x01(\x02\"\xd3\x01\n\nDadosCarro\x12\x10\n\x08\x63\x61rro_id\x18\x01 \x01(\t\x12\x11\n\tsensor_id\x18\x02 \x01(\t\x12\x12\n\nvelocidade\x18\x03 \x01(\x02\x12\r\n\x05volta\x18\x04 \x01(\x05\x12\x11\n\ttimestamp\x18\x05 \x01(\t\x12\x19\n\x07pneu_fl\x18\x06 \x01(\x0b\x32\x08.f1.Pneu\x12\x19\n\x07pneu_fr\x18\x07 \x01(\x0b\x32\x08.f1.Pneu\x12\x19\n\x07pneu_rl\x18\x08 \x01(\x0b\x32\x08.f1.Pneu\x12\x19\n\x07pneu_rr\x18\t \x01(\x0b\x32\x08.f1.Pneu\"-\n\x08Resposta\x12\x10\n\x08mensagem\x18\x01 \x01(\t\x12\x0f\n\x07sucesso\x18\x02 \x01(\x08\x32G\n\rMonitoramento\x12\x36\n\x0f\x45nviarLotePneus\x12\x13.f1.ListaDadosCarro\x1a\x0c.f1.Resposta\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fprotos/f1.proto\x12\x02\x66\x31\"G\n\x0fListaDadosCarro\x12\x1d\n\x05\x64\x61\x64os\x18\x01 \x03(\x0b\x32\x0e.f1.DadosCarro\x12\x15\n\renviado_isccp\x18\x02 \x01(\x01\">\n\x04Pneu\x12\x13\n\x0btemperatura\x18\x01 \x01(\x02\x12\x10\n\x08\x64\x65sgaste\x18\x02 \x01(\x02\x12\x0f\n\x07pressao\x18\x03 \x01(\x02\"\x94\x02\n\nDadosCarro\x12\x10\n\x08\x63\x61rro_id\x18\x01 \x01(\t\x12\x11\n\tsensor_id\x18\x02 \x01(\t\x12\x12\n\nvelocidade\x18\x03 \x01(\x02\x12\r\n\x05volta\x18\x04 \x01(\x05\x12\x11\n\ttimestamp\x18\x05 \x01(\t\x12\x19\n\x07pneu_fl\x18\x06 \x01(\x0b\x32\x08.f1.Pneu\x12\x19\n\x07pneu_fr\x18\x07 \x01(\x0b\x32\x08.f1.Pneu\x12\x19\n\x07pneu_rl\x18\x08 \x01(\x0b\x32\x08.f1.Pneu\x12\x19\n\x07pneu_rr\x18\t \x01(\x0b\x32\x08.f1.Pneu\x12\x1a\n\x06janela\x18\n \x01(\x0b\x32\n.f1.Janela\x12\x0b\n\x03seq\x18\x0b \x01(\x04\x12\x16\n\x0erecebido_isccp\x18\x0c \x01(\x01\"^\n\x0c\x41gregadoPneu\x12\x10\n\x08temp_min\x18\x01 \x01(\x02\x12\x10\n\x08temp_max\x18\x02 \x01(\x02\x12\x12\n\ntemp_media\x18\x03 \x01(\x02\x12\x16\n\x0e\x64\x65sgaste_delta\x18\x04 \x01(\x02\"\xa2\x01\n\x06Janela\x12\x10\n\x08\x61mostras\x18\x01 \x01(\r\x12\x0e\n\x06inicio\x18\x02 \x01(\t\x12\x1c\n\x02\x66l\x18\x03 \x01(\x0b\x32\x10.f1.AgregadoPneu\x12\x1c\n\x02\x66r\x18\x04 \x01(\x0b\x32\x10.f1.AgregadoPneu\x12\x1c\n\x02rl\x18\x05 \x01(\x0b\x32\x10.f1.AgregadoPneu\x12\x1c\n\x02rr\x18\x06 \x01(\x0b\x32\x10.f1.AgregadoPneu\"Z\n\x0fLoteSequenciado\x12\x11\n\tsequencia\x18\x01 \x01(\x04\x12\x1d\n\x05\x64\x61\x64os\x18\x02 \x03(\x0b\x32\x0e.f1.DadosCarro\x12\x15\n\renviado_isccp\x18\x03 \x01(\x01\"/\n\x0b\x43onfirmacao\x12 \n\x18ultima_sequencia_gravada\x18\x01 \x01(\x04\"-\n\x08Resposta\x12\x10\n\x08mensagem\x18\x01 \x01(\t\x12\x0f\n\x07sucesso\x18\x02 \x01(\x08\x32\x81\x01\n\rMonitoramento\x12\x36\n\x0f\x45nviarLotePneus\x12\x13.f1.ListaDadosCarro\x1a\x0c.f1.Resposta\"\x00\x12\x38\n\nFluxoPneus\x12\x13.f1.LoteSequenciado\x1a\x0f.f1.Confirmacao\"\x00(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,13 +32,21 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'protos.f1_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_LISTADADOSCARRO']._serialized_start=23
-  _globals['_LISTADADOSCARRO']._serialized_end=71
-  _globals['_PNEU']._serialized_start=73
-  _globals['_PNEU']._serialized_end=135
-  _globals['_DADOSCARRO']._serialized_start=138
-  _globals['_DADOSCARRO']._serialized_end=349
-  _globals['_RESPOSTA']._serialized_start=351
-  _globals['_RESPOSTA']._serialized_end=396
-  _globals['_MONITORAMENTO']._serialized_start=398
-  _globals['_MONITORAMENTO']._serialized_end=469
+  _globals['_LISTADADOSCARRO']._serialized_end=94
+  _globals['_PNEU']._serialized_start=96
+  _globals['_PNEU']._serialized_end=158
+  _globals['_DADOSCARRO']._serialized_start=161
+  _globals['_DADOSCARRO']._serialized_end=437
+  _globals['_AGREGADOPNEU']._serialized_start=439
+  _globals['_AGREGADOPNEU']._serialized_end=533
+  _globals['_JANELA']._serialized_start=536
+  _globals['_JANELA']._serialized_end=698
+  _globals['_LOTESEQUENCIADO']._serialized_start=700
+  _globals['_LOTESEQUENCIADO']._serialized_end=790
+  _globals['_CONFIRMACAO']._serialized_start=792
+  _globals['_CONFIRMACAO']._serialized_end=839
+  _globals['_RESPOSTA']._serialized_start=841
+  _globals['_RESPOSTA']._serialized_end=886
+  _globals['_MONITORAMENTO']._serialized_start=889
+  _globals['_MONITORAMENTO']._serialized_end=1018
 # @@protoc_insertion_point(module_scope)
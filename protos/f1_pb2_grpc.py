@@ -39,6 +39,11 @@ class MonitoramentoStub(object):
                 request_serializer=protos_dot_f1__pb2.ListaDadosCarro.SerializeToString,
                 response_deserializer=protos_dot_f1__pb2.Resposta.FromString,
                 _registered_method=True)
+        self.FluxoPneus = channel.stream_stream(
+                '/f1.Monitoramento/FluxoPneus',
+                request_serializer=protos_dot_f1__pb2.LoteSequenciado.SerializeToString,
+                response_deserializer=protos_dot_f1__pb2.Confirmacao.FromString,
+                _registered_method=True)
 
 
 class MonitoramentoServicer(object):
@@ -51,6 +56,14 @@ class MonitoramentoServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def FluxoPneus(self, request_iterator, context):
+        """Fluxo de longa duração: a ponte envia lotes numerados e o servidor
+        confirma periodicamente o último número de sequência já gravado no banco
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_MonitoramentoServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -59,6 +72,11 @@ def add_MonitoramentoServicer_to_server(servicer, server):
                     request_deserializer=protos_dot_f1__pb2.ListaDadosCarro.FromString,
                     response_serializer=protos_dot_f1__pb2.Resposta.SerializeToString,
             ),
+            'FluxoPneus': grpc.stream_stream_rpc_method_handler(
+                    servicer.FluxoPneus,
+                    request_deserializer=protos_dot_f1__pb2.LoteSequenciado.FromString,
+                    response_serializer=protos_dot_f1__pb2.Confirmacao.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'f1.Monitoramento', rpc_method_handlers)
@@ -96,3 +114,30 @@ class Monitoramento(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def FluxoPneus(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/f1.Monitoramento/FluxoPneus',
+            protos_dot_f1__pb2.LoteSequenciado.SerializeToString,
+            protos_dot_f1__pb2.Confirmacao.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
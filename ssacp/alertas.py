@@ -0,0 +1,283 @@
+"""Motor de alertas dos pneus, avaliado na ingestão do SSACP.
+
+Cada regra olha um valor das leituras novas (já deduplicadas): um campo de um
+pneu ("fl.temp") ou a assimetria entre os lados ("assimetria.desgaste" =
+média dos pneus direitos - média dos esquerdos; em Interlagos, anti-horário,
+os direitos trabalham mais). Tipos de regra:
+
+- limiar: o próprio valor;
+- taxa: variação por segundo desde a leitura anterior do carro;
+- janela: média, máximo ou mínimo dos últimos `janela_s` segundos, mantidos
+  de forma incremental (soma corrente e deques monotônicas).
+
+Cada leitura custa O(1) amortizado por regra. O valor é comparado com `acima`
+e/ou `abaixo`: o alerta dispara na transição para fora do limite e só se
+encerra depois de voltar `histerese` para dentro, então um valor oscilando no
+limite não gera rajadas. Há no máximo um alerta por carro, regra e volta, e o
+_id (carro|regra|volta) deduplica também entre réplicas do SSACP.
+
+O estado fica em memória, por processo. Com várias réplicas, as regras de taxa
+e de janela de um carro valem para as leituras que chegam a cada uma (como a
+banda morta do ISCCP). Leituras mais antigas que a última vista do carro são
+ignoradas.
+"""
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+import paho.mqtt.client as mqtt
+
+from ssacp.persistencia import CAMPOS_PNEU, POSICOES_PNEU
+
+TIPOS = ("limiar", "taxa", "janela")
+AGREGADOS = ("media", "max", "min")
+
+# Regras usadas quando SSACP_ALERTAS_REGRAS não aponta para um arquivo JSON
+REGRAS_PADRAO = (
+    [{"id": f"superaquecimento_{p}", "fonte": f"{p}.temp", "acima": 128.0, "histerese": 3.0,
+      "severidade": "critico", "descricao": f"Temperatura do pneu {p.upper()} acima de 128°C"} for p in POSICOES_PNEU]
+    + [{"id": f"pressao_{p}", "fonte": f"{p}.press", "abaixo": 21.5, "acima": 24.5, "histerese": 0.1,
+        "severidade": "critico", "descricao": f"Pressão do pneu {p.upper()} fora de 21,5-24,5 psi"}
+       for p in POSICOES_PNEU]
+    + [{"id": f"penhasco_desgaste_{p}", "fonte": f"{p}.desgaste", "acima": 75.0,
+        "severidade": "aviso", "descricao": f"Desgaste do pneu {p.upper()} passou de 75% (queda de rendimento)"}
+       for p in POSICOES_PNEU]
+    + [{"id": f"aquecimento_rapido_{p}", "tipo": "taxa", "fonte": f"{p}.temp", "acima": 1.5, "histerese": 0.5,
+        "severidade": "aviso", "descricao": f"Pneu {p.upper()} esquentando mais de 1,5°C/s"} for p in POSICOES_PNEU]
+    + [{"id": f"temperatura_media_{p}", "tipo": "janela", "fonte": f"{p}.temp", "janela_s": 30.0,
+        "agregado": "media", "acima": 124.0, "histerese": 2.0, "severidade": "aviso",
+        "descricao": f"Média de 30s do pneu {p.upper()} acima de 124°C"} for p in POSICOES_PNEU]
+    + [{"id": "assimetria_desgaste", "tipo": "janela", "fonte": "assimetria.desgaste", "janela_s": 60.0,
+        "agregado": "media", "acima": 8.0, "histerese": 1.0, "severidade": "aviso",
+        "descricao": "Pneus direitos gastando 8 pontos a mais que os esquerdos (média de 60s)"}]
+)
+
+
+def _extrator(fonte):
+    """Função pneus -> valor (ou KeyError/TypeError se faltar algum campo)."""
+    alvo, _, campo = fonte.partition(".")
+    if campo not in CAMPOS_PNEU:
+        raise ValueError(f"fonte {fonte!r}: campo deve ser um de {', '.join(CAMPOS_PNEU)}")
+    if alvo in POSICOES_PNEU:
+        return lambda pneus: pneus[alvo][campo]
+    if alvo == "assimetria":
+        return lambda pneus: (pneus["fr"][campo] + pneus["rr"][campo] - pneus["fl"][campo] - pneus["rl"][campo]) / 2
+    raise ValueError(f"fonte {fonte!r}: use <pneu>.<campo> ou assimetria.<campo>")
+
+
+class _Janela:
+    """Agregado incremental dos valores dos últimos `duracao` segundos."""
+
+    __slots__ = ("duracao", "agregado", "itens", "soma")
+
+    def __init__(self, duracao, agregado):
+        self.duracao = duracao
+        self.agregado = agregado
+        self.itens = deque()  # média: todos os (t, x); máx/mín: só os candidatos (deque monotônica)
+        self.soma = 0.0
+
+    def adicionar(self, t, x):
+        itens = self.itens
+        if self.agregado == "media":
+            itens.append((t, x))
+            self.soma += x
+            while itens[0][0] <= t - self.duracao:
+                self.soma -= itens.popleft()[1]
+            return self.soma / len(itens)
+        if self.agregado == "max":
+            while itens and itens[-1][1] <= x:
+                itens.pop()
+        else:
+            while itens and itens[-1][1] >= x:
+                itens.pop()
+        itens.append((t, x))
+        while itens[0][0] <= t - self.duracao:
+            itens.popleft()
+        return itens[0][1]
+
+
+class _EstadoRegra:
+    __slots__ = ("ativo", "lado", "pico", "id_alerta", "volta_alertada", "t_anterior", "x_anterior", "janela")
+
+    def __init__(self, regra):
+        self.ativo = False
+        self.lado = None
+        self.pico = None
+        self.id_alerta = None
+        self.volta_alertada = None
+        self.t_anterior = None
+        self.x_anterior = None
+        self.janela = _Janela(regra.janela_s, regra.agregado) if regra.tipo == "janela" else None
+
+
+class Regra:
+
+    def __init__(self, id, fonte, tipo="limiar", acima=None, abaixo=None, histerese=0.0, janela_s=30.0,
+                 agregado="media", severidade="aviso", descricao=""):
+        if tipo not in TIPOS:
+            raise ValueError(f"regra {id}: tipo deve ser um de {', '.join(TIPOS)}")
+        if agregado not in AGREGADOS:
+            raise ValueError(f"regra {id}: agregado deve ser um de {', '.join(AGREGADOS)}")
+        if acima is None and abaixo is None:
+            raise ValueError(f"regra {id}: informe 'acima' e/ou 'abaixo'")
+        if tipo == "janela" and not (isinstance(janela_s, (int, float)) and janela_s > 0):
+            # Com janela vazia o valor recém-chegado sairia dela e não haveria agregado
+            raise ValueError(f"regra {id}: janela_s deve ser maior que zero")
+        self.id = id
+        self.fonte = fonte
+        self.extrair = _extrator(fonte)
+        self.tipo = tipo
+        self.acima = acima
+        self.abaixo = abaixo
+        self.histerese = histerese
+        self.janela_s = janela_s
+        self.agregado = agregado
+        self.severidade = severidade
+        self.descricao = descricao
+
+    @classmethod
+    def de_dict(cls, d):
+        return cls(**d)
+
+    def valor(self, estado, t, x):
+        """Valor comparado com os limites (None enquanto não há leituras suficientes)."""
+        if self.tipo == "limiar":
+            return x
+        if self.tipo == "janela":
+            return estado.janela.adicionar(t, x)
+        t_anterior, x_anterior = estado.t_anterior, estado.x_anterior
+        estado.t_anterior, estado.x_anterior = t, x
+        if t_anterior is None or t <= t_anterior:
+            return None
+        return (x - x_anterior) / (t - t_anterior)
+
+    def voltou(self, lado, v):
+        if lado == "acima":
+            return v <= self.acima - self.histerese
+        return v >= self.abaixo + self.histerese
+
+
+class MotorAlertas:
+    """Avalia as regras sobre as leituras novas e devolve os eventos de alerta."""
+
+    def __init__(self, regras):
+        self.regras = [r if isinstance(r, Regra) else Regra.de_dict(r) for r in regras]
+        ids = [r.id for r in self.regras]
+        if len(ids) != len(set(ids)):
+            raise ValueError("ids de regra repetidos")
+        # Regras agrupadas por fonte: cada valor é extraído uma vez por leitura
+        self._por_fonte = {}
+        for i, regra in enumerate(self.regras):
+            self._por_fonte.setdefault(regra.fonte, (regra.extrair, []))[1].append((regra, i))
+        self._carros = {}  # carro_id -> [t da última leitura, [_EstadoRegra por regra]]
+        self._lock = threading.Lock()
+        self.avaliadas = 0
+        self.fora_de_ordem = 0
+        self.disparados = 0
+        self.encerrados = 0
+
+    def processar(self, documentos):
+        """Documentos no formato gravado em `pneus` -> eventos (disparo/encerramento), em ordem."""
+        eventos = []
+        with self._lock:
+            for doc in documentos:
+                self._avaliar(doc, eventos)
+        return eventos
+
+    def _avaliar(self, doc, eventos):
+        carro_id = doc["carro_id"]
+        instante = doc["timestamp"]
+        t = instante.timestamp()
+        carro = self._carros.get(carro_id)
+        if carro is None:
+            carro = self._carros[carro_id] = [t, [_EstadoRegra(r) for r in self.regras]]
+        elif t < carro[0]:
+            self.fora_de_ordem += 1
+            return
+        carro[0] = t
+        estados = carro[1]
+        self.avaliadas += 1
+        pneus = doc.get("pneus") or {}
+        volta = doc.get("volta")
+
+        for extrair, indices in self._por_fonte.values():
+            try:
+                x = extrair(pneus)
+            except (KeyError, TypeError):
+                continue
+            for regra, i in indices:
+                estado = estados[i]
+                if regra.tipo == "limiar":
+                    v = x
+                else:
+                    v = regra.valor(estado, t, x)
+                    if v is None:
+                        continue
+                if estado.ativo:
+                    if regra.voltou(estado.lado, v):
+                        estado.ativo = False
+                        self.encerrados += 1
+                        eventos.append({"_id": estado.id_alerta, "carro_id": carro_id, "regra": regra.id,
+                                        "estado": "encerrado", "fim": instante, "pico": estado.pico})
+                    elif (v > estado.pico) == (estado.lado == "acima"):
+                        estado.pico = v
+                    continue
+                # Comparação em linha: é o caminho comum (valor dentro dos limites)
+                if regra.acima is not None and v > regra.acima:
+                    lado = "acima"
+                elif regra.abaixo is not None and v < regra.abaixo:
+                    lado = "abaixo"
+                else:
+                    continue
+                if estado.volta_alertada == volta:
+                    continue
+                estado.ativo, estado.lado, estado.pico = True, lado, v
+                estado.volta_alertada = volta
+                estado.id_alerta = f"{carro_id}|{regra.id}|{volta}"
+                self.disparados += 1
+                eventos.append({"_id": estado.id_alerta, "carro_id": carro_id, "regra": regra.id,
+                                "tipo": regra.tipo, "fonte": regra.fonte, "severidade": regra.severidade,
+                                "descricao": regra.descricao, "volta": volta, "valor": v,
+                                "limite": regra.acima if lado == "acima" else regra.abaixo,
+                                "estado": "ativo", "inicio": instante, "fim": None})
+
+
+def carregar_regras(caminho=""):
+    """Regras do arquivo JSON (lista de objetos com os campos de Regra) ou as padrão."""
+    if not caminho:
+        return [Regra.de_dict(d) for d in REGRAS_PADRAO]
+    with open(caminho, encoding="utf-8") as arquivo:
+        return [Regra.de_dict(d) for d in json.load(arquivo)]
+
+
+def registrar_metricas(registro, motor):
+    registro.medidor("ssacp_alertas_leituras_avaliadas_total", lambda: motor.avaliadas,
+                     "Leituras avaliadas pelo motor de alertas", tipo="counter")
+    registro.medidor("ssacp_alertas_disparados_total", lambda: motor.disparados, "Alertas disparados",
+                     tipo="counter")
+    registro.medidor("ssacp_alertas_encerrados_total", lambda: motor.encerrados, "Alertas encerrados",
+                     tipo="counter")
+    registro.medidor("ssacp_alertas_fora_de_ordem_total", lambda: motor.fora_de_ordem,
+                     "Leituras ignoradas por chegarem depois de uma mais nova do mesmo carro", tipo="counter")
+
+
+class PublicadorAlertas:
+    """Publica os eventos de alerta no broker, em <topico>/<carro_id> (QoS 1)."""
+
+    def __init__(self, broker, porta=1883, topico="f1/alertas"):
+        self.topico = topico
+        self.client = mqtt.Client(client_id=f"SSACP_Alertas_{os.getpid()}_{id(self) % 100000}")
+        # Conecta em segundo plano; o paho guarda as publicações QoS 1 até conectar
+        self.client.connect_async(broker, porta, 60)
+        self.client.loop_start()
+
+    def publicar(self, eventos):
+        for evento in eventos:
+            payload = json.dumps(evento, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+            self.client.publish(f"{self.topico}/{evento['carro_id']}", payload, qos=1)
+
+    def parar(self):
+        self.client.loop_stop()
+        self.client.disconnect()
@@ -0,0 +1,95 @@
+"""Conexões e health checking do servidor gRPC do SSACP.
+
+As pontes balanceiam as chamadas entre as réplicas (isccp/canal_grpc.py) e
+consultam o serviço padrão grpc.health.v1 de cada uma. A réplica se declara
+NOT_SERVING enquanto o MongoDB não responde (as gravações falhariam de
+qualquer jeito) e no desligamento, para as pontes pararem de mandar lotes
+antes de o servidor fechar.
+"""
+import asyncio
+import os
+import threading
+
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
+
+# Fecha conexões mais velhas que isso (0 = nunca): as pontes resolvem o nome de
+# novo ao reconectar e passam a enxergar réplicas novas. RPCs em curso não são
+# interrompidos; os fluxos longos são renovados pela própria ponte.
+IDADE_MAX_CONEXAO_S = float(os.getenv("SSACP_IDADE_MAX_CONEXAO_S", "300"))
+# Menor intervalo aceito entre PINGs de keepalive das pontes (precisa ser <= ISCCP_KEEPALIVE_S)
+PING_MIN_S = float(os.getenv("SSACP_PING_MIN_S", "10"))
+# Intervalo (s) entre as verificações do banco que definem o estado de saúde; 0 desliga
+INTERVALO_SAUDE_S = float(os.getenv("SSACP_INTERVALO_SAUDE_S", "5"))
+
+SERVINDO = health_pb2.HealthCheckResponse.SERVING
+FORA = health_pb2.HealthCheckResponse.NOT_SERVING
+
+
+def opcoes_servidor(idade_max_conexao_s=IDADE_MAX_CONEXAO_S, ping_min_s=PING_MIN_S):
+    opcoes = [
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.min_ping_interval_without_data_ms", int(ping_min_s * 1000)),
+        ("grpc.http2.max_pings_without_data", 0),
+    ]
+    if idade_max_conexao_s > 0:
+        opcoes.append(("grpc.max_connection_age_ms", int(idade_max_conexao_s * 1000)))
+    return opcoes
+
+
+def _anunciar(estado):
+    print(f"[SSACP] Banco {'respondendo' if estado == SERVINDO else 'fora'}; "
+          f"health: {health_pb2.HealthCheckResponse.ServingStatus.Name(estado)}")
+
+
+def registrar_saude(server, saude=None):
+    """Adiciona o grpc.health.v1 ao servidor (síncrono), já como SERVING."""
+    saude = saude or health.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(saude, server)
+    saude.set(health.OVERALL_HEALTH, SERVINDO)
+    return saude
+
+
+def monitorar_banco(saude, banco, intervalo=INTERVALO_SAUDE_S):
+    """Thread que publica SERVING/NOT_SERVING conforme o banco responde ao ping."""
+    if intervalo <= 0:
+        return None
+    parar = threading.Event()
+
+    def rotina():
+        atual = SERVINDO
+        while not parar.wait(intervalo):
+            try:
+                banco.command("ping")
+                estado = SERVINDO
+            except Exception:
+                estado = FORA
+            if estado != atual:
+                _anunciar(estado)
+                saude.set(health.OVERALL_HEALTH, estado)
+                atual = estado
+
+    threading.Thread(target=rotina, daemon=True).start()
+    return parar
+
+
+async def registrar_saude_aio(server):
+    saude = health.aio.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(saude, server)
+    await saude.set(health.OVERALL_HEALTH, SERVINDO)
+    return saude
+
+
+async def monitorar_banco_aio(saude, banco, intervalo=INTERVALO_SAUDE_S):
+    """Versão asyncio de monitorar_banco (rodar como task)."""
+    atual = SERVINDO
+    while intervalo > 0:
+        await asyncio.sleep(intervalo)
+        try:
+            await banco.command("ping")
+            estado = SERVINDO
+        except Exception:
+            estado = FORA
+        if estado != atual:
+            _anunciar(estado)
+            await saude.set(health.OVERALL_HEALTH, estado)
+            atual = estado
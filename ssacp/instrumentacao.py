@@ -0,0 +1,39 @@
+"""Métricas do SSACP: lotes, leituras e latência por salto (ver comum/metricas.py)."""
+from comum.metricas import LIMITES_LOTE, histogramas_saltos
+
+
+class MetricasSSACP:
+
+    def __init__(self, registro):
+        self.registro = registro
+        self.saltos = histogramas_saltos(registro, ("carro_isccp", "fila_isccp", "grpc", "banco", "ponta_a_ponta"))
+        self.lotes = registro.contador("ssacp_lotes_total", "Lotes recebidos das pontes")
+        self.leituras = registro.contador("ssacp_leituras_total", "Leituras recebidas")
+        self.duplicadas = registro.contador("ssacp_leituras_duplicadas_total",
+                                            "Leituras já gravadas antes (reentregas)")
+        self.invalidas = registro.contador("ssacp_leituras_invalidas_total",
+                                           "Leituras descartadas por não converterem (timestamp inválido)")
+        self.tamanho_lote = registro.histograma("ssacp_tamanho_lote", LIMITES_LOTE, "Leituras por lote")
+
+    def observar_lote(self, itens, enviado_isccp, recebido, gravado, novos=None, invalidas=0):
+        """Registra um lote gravado. `itens` são os DadosCarro; instantes em epoch (s)."""
+        self.lotes.incrementar()
+        self.leituras.incrementar(len(itens))
+        self.tamanho_lote.observar(len(itens))
+        if invalidas:
+            self.invalidas.incrementar(invalidas)
+        if novos is not None:
+            self.duplicadas.incrementar(len(itens) - invalidas - novos)
+        if enviado_isccp:
+            self.saltos["grpc"].observar(recebido - enviado_isccp)
+        self.saltos["banco"].observar(gravado - recebido)
+        for item in itens:
+            try:
+                publicado = float(item.timestamp)
+            except ValueError:
+                continue
+            self.saltos["ponta_a_ponta"].observar(gravado - publicado)
+            if item.recebido_isccp:
+                self.saltos["carro_isccp"].observar(item.recebido_isccp - publicado)
+                if enviado_isccp:
+                    self.saltos["fila_isccp"].observar(enviado_isccp - item.recebido_isccp)
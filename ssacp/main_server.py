@@ -1,61 +1,211 @@
 import sys
 import os
+import time
+import queue
+import signal
+import threading
 from concurrent import futures
 import grpc
 import pymongo
+from grpc_health.v1 import health
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from protos import f1_pb2, f1_pb2_grpc
+from comum.metricas import Registro, servir_metricas
+from ssacp.alertas import MotorAlertas, PublicadorAlertas, carregar_regras, registrar_metricas
+from ssacp.conexao import INTERVALO_SAUDE_S, monitorar_banco, opcoes_servidor, registrar_saude
+from ssacp.instrumentacao import MetricasSSACP
+from ssacp.persistencia import (colecoes, colecoes_rollup, colecao_alertas, colecao_modelos, preparar_colecoes,
+                                converter_lote, inserir_historico, montar_operacoes_snapshot,
+                                aplicar_operacoes_snapshot, aplicar_rollups, aplicar_modelos_desgaste, gravar_alertas)
 
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BANCO = os.getenv("SSACP_BANCO", "f1_telemetria")
 client = pymongo.MongoClient(MONGO_URI)
-db = client["f1_telemetria"]
-collection = db["pneus"]
+db = client[BANCO]
+
+PORTA = int(os.getenv("SSACP_PORTA", "50051"))
+# "threads": grpc.server + ThreadPoolExecutor (gravação bloqueante por handler)
+# "aio": grpc.aio + pipeline assíncrono que junta lotes concorrentes (ssacp/servidor_aio.py)
+MODO_SERVIDOR = os.getenv("SSACP_MODO_SERVIDOR", "threads")
+
+# Cada fluxo aberto (FluxoPneus) ocupa uma thread do pool enquanto a ponte estiver
+# conectada, assim como o Watch do health checking de cada ponte (ssacp/conexao.py)
+MAX_WORKERS = int(os.getenv("SSACP_MAX_WORKERS", "64"))
+# Fluxo: grava no banco em sub-lotes deste tamanho e confirma a cada intervalo
+# (ou antes, assim que não houver mais lotes esperando)
+SUBLOTE_FLUXO = int(os.getenv("SSACP_SUBLOTE_FLUXO", "200"))
+INTERVALO_CONFIRMACAO = float(os.getenv("SSACP_INTERVALO_CONFIRMACAO", "0.5"))
+# GET /metrics (formato Prometheus) nesta porta; 0 desliga
+METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "9103"))
+# Motor de alertas (ssacp/alertas.py) sobre as leituras novas: regras padrão ou
+# as do arquivo JSON em SSACP_ALERTAS_REGRAS. Os alertas vão para a coleção
+# `alertas` e, com SSACP_ALERTAS_BROKER, para o tópico SSACP_ALERTAS_TOPICO/<carro>.
+ALERTAS = os.getenv("SSACP_ALERTAS", "1") == "1"
+ALERTAS_REGRAS = os.getenv("SSACP_ALERTAS_REGRAS", "")
+ALERTAS_BROKER = os.getenv("SSACP_ALERTAS_BROKER", "")
+ALERTAS_TOPICO = os.getenv("SSACP_ALERTAS_TOPICO", "f1/alertas")
+# Somas da regressão de desgaste por carro (ssacp/previsao.py), lidas pelo /api/previsao do SSVCP
+PREVISAO = os.getenv("SSACP_PREVISAO", "1") == "1"
+# No SIGTERM: NOT_SERVING e até este prazo (s) para os RPCs em curso terminarem
+PRAZO_DESLIGAMENTO_S = float(os.getenv("SSACP_PRAZO_DESLIGAMENTO_S", "5"))
 
 
 class MonitoramentoService(f1_pb2_grpc.MonitoramentoServicer):
 
+    def __init__(self, banco=None, registro=None, alertas=None, publicador=None):
+        banco = banco if banco is not None else db
+        # Snapshot materializado (latest_by_car): 1 documento por carro com o estado
+        # mais recente. Evita que o dashboard precise agregar todo o histórico.
+        self.collection, self.snapshot, self.chaves = colecoes(banco)
+        # Agregados por setor e por volta consultados pelo histórico do SSVCP
+        self.rollups = colecoes_rollup(banco)
+        self.metricas = MetricasSSACP(registro or Registro())
+        self.fluxos_abertos = 0
+        self._lock_fluxos = threading.Lock()
+        self.metricas.registro.medidor("ssacp_fluxos_abertos", lambda: self.fluxos_abertos,
+                                       "RPCs FluxoPneus abertos")
+        self.modelos = colecao_modelos(banco) if PREVISAO else None
+        # Motor de alertas (opcional) e para onde vão os alertas novos
+        self.alertas = alertas
+        self.colecao_alertas = colecao_alertas(banco)
+        self.publicador = publicador
+        if alertas is not None:
+            registrar_metricas(self.metricas.registro, alertas)
+
+    def gravar(self, documentos):
+        """Grava no histórico e atualiza snapshot e rollups. Retorna quantos eram novos."""
+        novos = inserir_historico(self.collection, self.chaves, documentos)
+        aplicar_operacoes_snapshot(self.snapshot, montar_operacoes_snapshot(documentos))
+        aplicar_rollups(self.rollups, novos)
+        if self.modelos is not None:
+            aplicar_modelos_desgaste(self.modelos, novos)
+        if self.alertas is not None and novos:
+            eventos = gravar_alertas(self.colecao_alertas, self.alertas.processar(novos))
+            if eventos and self.publicador is not None:
+                self.publicador.publicar(eventos)
+        return len(novos)
+
     # Agora implementamos o EnviarLotePneus
     def EnviarLotePneus(self, request, context):
-        lista_para_salvar = []
-
+        recebido = time.time()
         # Itera sobre a lista recebida no gRPC (request.dados)
-        for item in request.dados:
-            dados_mongo = {
-                "carro_id": item.carro_id,
-                "sensor_responsavel": item.sensor_id,
-                "velocidade": item.velocidade,
-                "volta": item.volta,
-                "timestamp": item.timestamp,
-                "pneus": {
-                    "fl": {"temp": item.pneu_fl.temperatura, "desgaste": item.pneu_fl.desgaste,
-                           "press": item.pneu_fl.pressao},
-                    "fr": {"temp": item.pneu_fr.temperatura, "desgaste": item.pneu_fr.desgaste,
-                           "press": item.pneu_fr.pressao},
-                    "rl": {"temp": item.pneu_rl.temperatura, "desgaste": item.pneu_rl.desgaste,
-                           "press": item.pneu_rl.pressao},
-                    "rr": {"temp": item.pneu_rr.temperatura, "desgaste": item.pneu_rr.desgaste,
-                           "press": item.pneu_rr.pressao},
-                }
-            }
-            lista_para_salvar.append(dados_mongo)
-
-        if lista_para_salvar:
-            collection.insert_many(lista_para_salvar)
-            print(f"[SACP] Lote recebido com {len(lista_para_salvar)} registros. Salvo no DB.")
+        lista_para_salvar, invalidas = converter_lote(request.dados)
+
+        if lista_para_salvar or invalidas:
+            novos = self.gravar(lista_para_salvar) if lista_para_salvar else 0
+            self.metricas.observar_lote(request.dados, request.enviado_isccp, recebido, time.time(), novos,
+                                        invalidas)
+            duplicados = len(lista_para_salvar) - novos
+            print(f"[SACP] Lote recebido com {len(lista_para_salvar)} registros. "
+                  f"Salvo no DB ({duplicados} duplicados ignorados).")
 
         return f1_pb2.Resposta(mensagem="Lote Processado", sucesso=True)
 
+    def FluxoPneus(self, request_iterator, context):
+        # Uma thread lê o fluxo de entrada; esta grava e confirma. Assim a
+        # confirmação sai por tempo mesmo se a ponte parar de mandar lotes.
+        # A fila não precisa de limite: a ponte só mantém ISCCP_ENVIOS_EM_VOO
+        # lotes sem confirmação.
+        entrada = queue.Queue()
+
+        def ler_entrada():
+            try:
+                for lote in request_iterator:
+                    entrada.put((lote, time.time()))
+            except Exception:
+                pass  # fluxo cancelado pelo cliente
+            finally:
+                entrada.put(None)
+
+        threading.Thread(target=ler_entrada, daemon=True).start()
+        with self._lock_fluxos:
+            self.fluxos_abertos += 1
+        try:
+            yield from self._gravar_fluxo(entrada, context.is_active)
+        finally:
+            with self._lock_fluxos:
+                self.fluxos_abertos -= 1
+
+    def _gravar_fluxo(self, entrada, ativo):
+        ultima_gravada = 0
+        ultima_confirmada = 0
+        proxima_confirmacao = time.monotonic() + INTERVALO_CONFIRMACAO
+        while True:
+            try:
+                lote = entrada.get(timeout=INTERVALO_CONFIRMACAO)
+            except queue.Empty:
+                lote = False
+            if lote is None:
+                break
+            if not ativo():
+                # Fluxo cancelado (ponte caiu ou réplica parando): a ponte devolve à fila
+                # tudo que não foi confirmado, então gravar o resto só geraria duplicadas
+                return
+
+            if lote:
+                lote, recebido = lote
+                documentos, invalidas = converter_lote(lote.dados)
+                novos = 0
+                # Grava em sub-lotes: não espera a lista inteira para começar
+                for i in range(0, len(documentos), SUBLOTE_FLUXO):
+                    novos += self.gravar(documentos[i:i + SUBLOTE_FLUXO])
+                self.metricas.observar_lote(lote.dados, lote.enviado_isccp, recebido, time.time(), novos,
+                                            invalidas)
+                ultima_gravada = lote.sequencia
+
+            agora = time.monotonic()
+            if ultima_gravada != ultima_confirmada and (entrada.empty() or agora >= proxima_confirmacao):
+                yield f1_pb2.Confirmacao(ultima_sequencia_gravada=ultima_gravada)
+                ultima_confirmada = ultima_gravada
+                proxima_confirmacao = agora + INTERVALO_CONFIRMACAO
+
+        if ultima_gravada != ultima_confirmada:
+            yield f1_pb2.Confirmacao(ultima_sequencia_gravada=ultima_gravada)
+
+
+def criar_servidor(porta=PORTA, banco=None, registro=None, saude=None, intervalo_saude=INTERVALO_SAUDE_S,
+                   alertas=None, publicador=None):
+    """Servidor gRPC com o Monitoramento e o grpc.health.v1 (`saude`, criado se não vier)."""
+    banco = banco if banco is not None else db
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=MAX_WORKERS), options=opcoes_servidor())
+    f1_pb2_grpc.add_MonitoramentoServicer_to_server(MonitoramentoService(banco, registro, alertas, publicador), server)
+    saude = registrar_saude(server, saude)
+    monitorar_banco(saude, banco, intervalo_saude)
+    server.add_insecure_port(f'[::]:{porta}')
+    return server
+
 
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    f1_pb2_grpc.add_MonitoramentoServicer_to_server(MonitoramentoService(), server)
-    server.add_insecure_port('[::]:50051')
-    print("Servidor SACP (Modo Lote) rodando na porta 50051...")
+    preparar_colecoes(db)
+    registro = Registro()
+    if METRICAS_PORTA:
+        servir_metricas(registro, METRICAS_PORTA)
+    alertas = MotorAlertas(carregar_regras(ALERTAS_REGRAS)) if ALERTAS else None
+    publicador = PublicadorAlertas(ALERTAS_BROKER, topico=ALERTAS_TOPICO) if alertas and ALERTAS_BROKER else None
+
+    if MODO_SERVIDOR == "aio":
+        import asyncio
+        from ssacp.servidor_aio import servir_aio
+        client.close()
+        asyncio.run(servir_aio(MONGO_URI, BANCO, PORTA, INTERVALO_CONFIRMACAO, registro, PRAZO_DESLIGAMENTO_S,
+                               alertas, publicador, PREVISAO))
+        return
+
+    saude = health.HealthServicer()
+    server = criar_servidor(registro=registro, saude=saude, alertas=alertas, publicador=publicador)
+
+    def desligar(*_):
+        # NOT_SERVING primeiro: as pontes tiram a réplica do rodízio antes de ela fechar
+        saude.enter_graceful_shutdown()
+        server.stop(PRAZO_DESLIGAMENTO_S)
+
+    signal.signal(signal.SIGTERM, desligar)
+    print(f"Servidor SACP (Modo Lote + Fluxo) rodando na porta {PORTA}...")
     server.start()
     server.wait_for_termination()
 
 
 if __name__ == '__main__':
-    serve()
\ No newline at end of file
+    serve()
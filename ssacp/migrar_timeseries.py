@@ -0,0 +1,86 @@
+"""Migra a coleção `pneus` do formato antigo para a coleção time-series.
+
+Formato antigo: coleção comum, timestamp como string e _id gerado pelo
+Mongo (ou a chave idempotente). O script renomeia a coleção para
+`pneus_legado`, cria a time-series via preparar_colecoes e copia os
+documentos em lotes convertendo o timestamp para datetime. Também converte
+o timestamp dos documentos do snapshot `latest_by_car`.
+
+Rode com o SSACP parado:
+    MONGO_URI=mongodb://localhost:27017/ python ssacp/migrar_timeseries.py [--apagar-legado]
+"""
+import argparse
+import os
+import sys
+
+import pymongo
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ssacp.persistencia import preparar_colecoes, para_datetime
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BANCO = os.getenv("SSACP_BANCO", "f1_telemetria")
+
+
+def chave_legada(doc):
+    # Mesma regra de persistencia.chave_idempotente, a partir do documento antigo
+    return f"{doc['carro_id']}|{doc['volta']}|{doc['sensor_responsavel']}|{doc['timestamp']}"
+
+
+def converter_documento(doc):
+    novo = dict(doc)
+    if isinstance(doc.get("timestamp"), str):
+        novo["_id"] = chave_legada(doc)
+        novo["timestamp"] = para_datetime(doc["timestamp"])
+    return novo
+
+
+def migrar(banco, tamanho_lote=5000, apagar_legado=False):
+    info = next(iter(banco.list_collections(filter={"name": "pneus"})), None)
+    if info is None or info.get("type") == "timeseries":
+        print("[MIGRAÇÃO] 'pneus' já é time-series (ou não existe). Nada a fazer.")
+    else:
+        banco["pneus"].rename("pneus_legado")
+        preparar_colecoes(banco)
+        destino = banco["pneus"]
+
+        total = banco["pneus_legado"].estimated_document_count()
+        copiados = 0
+        lote = []
+        for doc in banco["pneus_legado"].find({}, batch_size=tamanho_lote):
+            lote.append(converter_documento(doc))
+            if len(lote) >= tamanho_lote:
+                destino.insert_many(lote, ordered=False)
+                copiados += len(lote)
+                lote = []
+                print(f"[MIGRAÇÃO] {copiados}/{total} documentos copiados...")
+        if lote:
+            destino.insert_many(lote, ordered=False)
+            copiados += len(lote)
+        print(f"[MIGRAÇÃO] {copiados} documentos copiados para a time-series 'pneus'.")
+
+        if apagar_legado:
+            banco.drop_collection("pneus_legado")
+            print("[MIGRAÇÃO] 'pneus_legado' apagada.")
+
+    convertidos = 0
+    for doc in banco["latest_by_car"].find({"timestamp": {"$type": "string"}}):
+        banco["latest_by_car"].update_one({"_id": doc["_id"]},
+                                          {"$set": {"timestamp": para_datetime(doc["timestamp"])}})
+        convertidos += 1
+    print(f"[MIGRAÇÃO] {convertidos} documentos de 'latest_by_car' convertidos.")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lote", type=int, default=5000)
+    parser.add_argument("--apagar-legado", action="store_true")
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(MONGO_URI)
+    migrar(client[BANCO], args.lote, args.apagar_legado)
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,482 @@
+import os
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure, PyMongoError
+from pymongo.write_concern import WriteConcern
+
+# Código de erro do Mongo para chave duplicada
+DUPLICATE_KEY = 11000
+
+# Write concern das gravações: "1" (só o primário) ou "majority" (maioria do replica set).
+# Vazio = padrão do servidor (majority em replica sets no MongoDB 5.0+).
+WRITE_CONCERN = os.getenv("SSACP_WRITE_CONCERN", "")
+
+# `pneus` é uma coleção time-series: timestamp (datetime) como campo de tempo e
+# carro_id como metaField. Retenção opcional (0 = guarda para sempre).
+RETENCAO_S = int(os.getenv("SSACP_RETENCAO_S", "0"))
+# Coleções time-series não garantem _id único, então a deduplicação usa uma
+# coleção de chaves com TTL. Basta cobrir a janela em que pode haver reentrega.
+RETENCAO_CHAVES_S = int(os.getenv("SSACP_RETENCAO_CHAVES_S", str(24 * 3600)))
+
+# Agregados por (carro, volta, setor) e por (carro, volta) mantidos na ingestão
+POSICOES_PNEU = ("fl", "fr", "rl", "rr")
+CAMPOS_PNEU = ("temp", "desgaste", "press")
+
+
+def write_concern_configurado(valor=WRITE_CONCERN):
+    if not valor:
+        return None
+    return WriteConcern(w=int(valor) if valor.isdigit() else valor)
+
+
+def colecoes(banco, valor_write_concern=WRITE_CONCERN):
+    """Coleções de histórico, snapshot e chaves de ingestão com o write concern configurado."""
+    wc = write_concern_configurado(valor_write_concern)
+    return (banco.get_collection("pneus", write_concern=wc),
+            banco.get_collection("latest_by_car", write_concern=wc),
+            banco.get_collection("chaves_ingestao", write_concern=wc))
+
+
+def colecoes_rollup(banco, valor_write_concern=WRITE_CONCERN):
+    """Coleções de agregados por setor e por volta."""
+    wc = write_concern_configurado(valor_write_concern)
+    return (banco.get_collection("rollups_setor", write_concern=wc),
+            banco.get_collection("rollups_volta", write_concern=wc))
+
+
+def colecao_modelos(banco, valor_write_concern=WRITE_CONCERN):
+    """Somas da regressão de desgaste por carro (ssacp/previsao.py)."""
+    return banco.get_collection("modelos_desgaste", write_concern=write_concern_configurado(valor_write_concern))
+
+
+def colecao_alertas(banco, valor_write_concern=WRITE_CONCERN):
+    """Alertas de pneu (ssacp/alertas.py), um documento por carro, regra e volta."""
+    return banco.get_collection("alertas", write_concern=write_concern_configurado(valor_write_concern))
+
+
+def preparar_colecoes(banco, retencao_s=RETENCAO_S, retencao_chaves_s=RETENCAO_CHAVES_S):
+    """Cria a coleção time-series e os índices. Seguro rodar em todas as réplicas."""
+    info = next(iter(banco.list_collections(filter={"name": "pneus"})), None)
+    if info is None:
+        opcoes = {"timeseries": {"timeField": "timestamp", "metaField": "carro_id", "granularity": "seconds"}}
+        if retencao_s:
+            opcoes["expireAfterSeconds"] = retencao_s
+        try:
+            banco.create_collection("pneus", **opcoes)
+        except CollectionInvalid:
+            pass  # outra réplica criou ao mesmo tempo
+    elif info.get("type") != "timeseries":
+        print("[SACP] AVISO: 'pneus' não é time-series. Rode ssacp/migrar_timeseries.py para converter.")
+    elif retencao_s and info.get("options", {}).get("expireAfterSeconds") != retencao_s:
+        banco.command("collMod", "pneus", expireAfterSeconds=retencao_s)
+
+    # Consultas por carro em intervalo de tempo e por volta
+    banco["pneus"].create_index([("carro_id", 1), ("timestamp", 1)])
+    try:
+        banco["pneus"].create_index([("carro_id", 1), ("volta", 1)])
+    except OperationFailure as e:
+        print(f"[SACP] AVISO: índice por volta não criado ({e})")
+    banco["chaves_ingestao"].create_index("criado_em", expireAfterSeconds=retencao_chaves_s)
+    banco["latest_by_car"].create_index("atualizado_em")
+    banco["rollups_setor"].create_index([("carro_id", 1), ("volta", 1), ("setor", 1)])
+    banco["rollups_volta"].create_index([("carro_id", 1), ("volta", 1)])
+    banco["modelos_desgaste"].create_index("atualizado_em")
+    banco["alertas"].create_index([("inicio", -1)])
+    banco["alertas"].create_index([("carro_id", 1), ("inicio", -1)])
+
+
+def chave_idempotente(item):
+    """_id determinístico de uma leitura: a mesma mensagem reentregue pelo
+    broker (ou reenviada por outra ponte) gera a mesma chave e é descartada.
+    Todos os campos vêm do carro (leitura sem setor entra com o setor vazio)."""
+    return f"{item.carro_id}|{item.volta}|{item.sensor_id}|{item.timestamp}"
+
+
+def para_datetime(timestamp):
+    """Timestamp epoch (string ou número) -> datetime UTC usado como campo de tempo."""
+    return datetime.fromtimestamp(float(timestamp), tz=timezone.utc)
+
+
+def erros_nao_duplicados(erro):
+    return [err for err in erro.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+
+
+def montar_operacoes_snapshot(documentos):
+    """Gera um upsert por carro com a leitura mais recente do lote.
+
+    O filtro só casa se o snapshot guardado for mais antigo; se já houver um
+    documento mais novo, o upsert tenta inserir o mesmo _id e falha com
+    DuplicateKeyError, que é ignorado (lotes atrasados não regridem o estado).
+    """
+    mais_recentes = {}
+    for doc in documentos:
+        atual = mais_recentes.get(doc["carro_id"])
+        if atual is None or doc["timestamp"] > atual["timestamp"]:
+            mais_recentes[doc["carro_id"]] = doc
+
+    operacoes = []
+    for carro_id, doc in mais_recentes.items():
+        estado = {k: v for k, v in doc.items() if k != "_id"}
+        operacoes.append(UpdateOne(
+            # Snapshots antigos guardavam o timestamp como string: também são substituídos
+            {"_id": carro_id, "$or": [{"timestamp": {"$lt": doc["timestamp"]}},
+                                      {"timestamp": {"$not": {"$type": "date"}}}]},
+            # atualizado_em (hora do servidor) é o que o SSVCP acompanha para enviar os deltas
+            {"$set": estado, "$currentDate": {"atualizado_em": True}},
+            upsert=True,
+        ))
+    return operacoes
+
+
+def aplicar_operacoes_snapshot(snapshot, operacoes):
+    if not operacoes:
+        return
+    try:
+        snapshot.bulk_write(operacoes, ordered=False)
+    except BulkWriteError as e:
+        # Duplicada = snapshot já tem leitura mais nova (guarda de timestamp)
+        if erros_nao_duplicados(e):
+            raise
+
+
+def _documentos_chave(documentos):
+    agora = datetime.now(timezone.utc)
+    return [{"_id": doc["_id"], "criado_em": agora, "confirmada": False} for doc in documentos]
+
+
+def _indices_erro(erro):
+    return {err["index"] for err in erro.details.get("writeErrors", [])}
+
+
+def _repetidos(documentos, erro):
+    """Depois de um insert_many de chaves, devolve os _id cuja chave já existia."""
+    if erros_nao_duplicados(erro):
+        raise erro
+    return [documentos[i]["_id"] for i in sorted(_indices_erro(erro))]
+
+
+def _filtro_pendentes(ids):
+    # Chaves gravadas antes do campo `confirmada` existir contam como confirmadas
+    return {"_id": {"$in": ids}, "confirmada": False}
+
+
+def _separar_novos(documentos, repetidos, pendentes):
+    """Leituras a gravar: as de chave inédita e as de chave ainda pendente (uma por chave).
+
+    Uma leitura repetida dentro do próprio lote também cai em `repetidos` e
+    acha pendente a chave que o lote acabou de registrar: só a primeira vai.
+    """
+    vistos = set(repetidos) - set(pendentes)
+    novos = []
+    for doc in documentos:
+        if doc["_id"] not in vistos:
+            vistos.add(doc["_id"])
+            novos.append(doc)
+    return novos
+
+
+def _gravadas(novos, erro):
+    """Depois de um insert_many de leituras: (gravadas, _id das que falharam)."""
+    falhas = _indices_erro(erro)
+    return ([doc for i, doc in enumerate(novos) if i not in falhas],
+            [novos[i]["_id"] for i in sorted(falhas)])
+
+
+def _ids(documentos):
+    return [doc["_id"] for doc in documentos]
+
+
+def inserir_historico(collection, chaves, documentos):
+    """Insere o lote ignorando leituras já gravadas. Retorna as leituras novas.
+
+    A chave de cada leitura é registrada como pendente, a leitura vai para a
+    coleção time-series e só então a chave é confirmada. Uma chave repetida
+    e confirmada descarta a leitura; uma ainda pendente (tentativa anterior que
+    caiu no meio) deixa a leitura ser gravada de novo. Se o insert das
+    leituras falhar em parte, só as chaves das que falharam são apagadas e as
+    demais são confirmadas, e o reenvio do lote grava só o que faltou.
+
+    A garantia é de pelo menos uma vez: se o SSACP cair (ou o banco não
+    responder) entre gravar as leituras e confirmar as chaves, ou se duas
+    réplicas receberem o mesmo lote ao mesmo tempo, a leitura pode ficar
+    duplicada no histórico (e somada duas vezes nos rollups; ver
+    recalcular_rollups.py).
+    """
+    try:
+        chaves.insert_many(_documentos_chave(documentos), ordered=False)
+        novos = documentos
+    except BulkWriteError as e:
+        repetidos = _repetidos(documentos, e)
+        pendentes = [k["_id"] for k in chaves.find(_filtro_pendentes(repetidos), {"_id": 1})]
+        novos = _separar_novos(documentos, repetidos, pendentes)
+    if not novos:
+        return []
+    try:
+        collection.insert_many(novos, ordered=False)
+    except BulkWriteError as e:
+        gravadas, falhas = _gravadas(novos, e)
+        chaves.delete_many({"_id": {"$in": falhas}})
+        _confirmar_chaves(chaves, gravadas)
+        raise
+    # Outros erros (timeout, rede): não se sabe o que foi gravado; as chaves
+    # ficam pendentes e o reenvio grava as leituras de novo
+    _confirmar_chaves(chaves, novos)
+    return novos
+
+
+def _confirmar_chaves(chaves, gravadas):
+    if not gravadas:
+        return
+    try:
+        chaves.update_many({"_id": {"$in": _ids(gravadas)}}, {"$set": {"confirmada": True}})
+    except PyMongoError as e:
+        # As leituras já estão gravadas: o lote segue confirmado para a ponte
+        print(f"[SACP] Erro ao confirmar chaves ({len(gravadas)} leituras): {e}")
+
+
+def valores_rollup(doc):
+    """Valores agregados de uma leitura, indexados pelo caminho do campo no rollup."""
+    valores = {"velocidade": doc["velocidade"]}
+    for posicao in POSICOES_PNEU:
+        for campo in CAMPOS_PNEU:
+            valores[f"pneus.{posicao}.{campo}"] = doc["pneus"][posicao][campo]
+    return valores
+
+
+def _acumular(agregados, chave, fixos, doc):
+    agregado = agregados.get(chave)
+    if agregado is None:
+        agregado = agregados[chave] = {"fixos": fixos, "n": 0, "soma": {}, "min": {}, "max": {},
+                                       "inicio": doc["timestamp"], "fim": doc["timestamp"]}
+    agregado["n"] += 1
+    agregado["inicio"] = min(agregado["inicio"], doc["timestamp"])
+    agregado["fim"] = max(agregado["fim"], doc["timestamp"])
+    for caminho, valor in valores_rollup(doc).items():
+        agregado["soma"][caminho] = agregado["soma"].get(caminho, 0) + valor
+        agregado["min"][caminho] = min(agregado["min"].get(caminho, valor), valor)
+        agregado["max"][caminho] = max(agregado["max"].get(caminho, valor), valor)
+    # Leitura com janela (banda morta no ISCCP): os picos das leituras absorvidas
+    for posicao, resumo in (doc.get("janela") or {}).items():
+        if posicao in POSICOES_PNEU:
+            caminho = f"pneus.{posicao}.temp"
+            agregado["min"][caminho] = min(agregado["min"][caminho], resumo["temp_min"])
+            agregado["max"][caminho] = max(agregado["max"][caminho], resumo["temp_max"])
+
+
+def _operacao_rollup(chave, agregado):
+    incrementos = {"n": agregado["n"]}
+    minimos = {"inicio": agregado["inicio"]}
+    maximos = {"fim": agregado["fim"]}
+    for caminho, soma in agregado["soma"].items():
+        incrementos[f"{caminho}.soma"] = soma
+        minimos[f"{caminho}.min"] = agregado["min"][caminho]
+        maximos[f"{caminho}.max"] = agregado["max"][caminho]
+    return UpdateOne({"_id": chave},
+                     {"$inc": incrementos, "$min": minimos, "$max": maximos, "$setOnInsert": agregado["fixos"]},
+                     upsert=True)
+
+
+def montar_operacoes_rollup(documentos):
+    """Agrega o lote por (carro, volta, setor) e por (carro, volta) antes de ir ao banco.
+
+    Cada rollup guarda n, soma/mín/máx de velocidade e de temp/desgaste/press
+    de cada pneu, e o intervalo de tempo coberto; a média é soma/n. Só deve
+    receber leituras novas (depois da deduplicação), pois $inc não é idempotente.
+    Retorna (operações de rollups_setor, operações de rollups_volta).
+    """
+    por_setor, por_volta = {}, {}
+    for doc in documentos:
+        carro, volta, setor = doc["carro_id"], doc["volta"], doc["sensor_responsavel"]
+        _acumular(por_setor, f"{carro}|{volta}|{setor}", {"carro_id": carro, "volta": volta, "setor": setor}, doc)
+        _acumular(por_volta, f"{carro}|{volta}", {"carro_id": carro, "volta": volta}, doc)
+    return ([_operacao_rollup(chave, agregado) for chave, agregado in por_setor.items()],
+            [_operacao_rollup(chave, agregado) for chave, agregado in por_volta.items()])
+
+
+def aplicar_rollups(rollups, novos):
+    """Atualiza os rollups com as leituras novas.
+
+    O histórico já foi gravado e as chaves registradas, então um erro aqui não
+    volta para a ponte (o reenvio seria descartado como duplicado): apenas é
+    registrado, e `python ssacp/recalcular_rollups.py` reconstrói os agregados.
+    """
+    if not novos:
+        return
+    try:
+        for colecao, operacoes in zip(rollups, montar_operacoes_rollup(novos)):
+            colecao.bulk_write(operacoes, ordered=False)
+    except PyMongoError as e:
+        print(f"[SACP] Erro ao atualizar rollups ({len(novos)} leituras): {e}")
+
+
+def aplicar_modelos_desgaste(modelos, novos):
+    """Soma as leituras novas nos modelos de desgaste; erros são só registrados, como nos rollups."""
+    # Import local: ssacp/previsao.py usa as constantes de pneu deste módulo
+    from ssacp.previsao import montar_operacoes_modelo
+    if not novos:
+        return
+    try:
+        operacoes = montar_operacoes_modelo(novos)
+        if operacoes:
+            modelos.bulk_write(operacoes, ordered=False)
+    except PyMongoError as e:
+        print(f"[SACP] Erro ao atualizar modelos de desgaste ({len(novos)} leituras): {e}")
+
+
+def _operacao_alerta(evento):
+    if evento["estado"] == "ativo":
+        # Outra réplica pode já ter aberto o mesmo alerta (mesmo carro, regra e volta)
+        return {"_id": evento["_id"]}, {"$setOnInsert": {k: v for k, v in evento.items() if k != "_id"}}, True
+    return ({"_id": evento["_id"], "estado": "ativo"},
+            {"$set": {"estado": "encerrado", "fim": evento["fim"], "pico": evento["pico"]}}, False)
+
+
+def _efetivo(resultado, upsert):
+    return resultado.upserted_id is not None if upsert else resultado.modified_count == 1
+
+
+def gravar_alertas(colecao, eventos):
+    """Grava os eventos do motor de alertas; devolve só os que mudaram o banco.
+
+    Alertas são raros, então vai um update por evento: assim se sabe quais
+    eram inéditos (e devem ser publicados) sem ler de volta. Como nos rollups,
+    um erro aqui é só registrado.
+    """
+    efetivos = []
+    try:
+        for evento in eventos:
+            filtro, atualizacao, upsert = _operacao_alerta(evento)
+            if _efetivo(colecao.update_one(filtro, atualizacao, upsert=upsert), upsert):
+                efetivos.append(evento)
+    except PyMongoError as e:
+        print(f"[SACP] Erro ao gravar alertas ({len(eventos)} eventos): {e}")
+    return efetivos
+
+
+def janela_para_documento(janela):
+    """DadosCarro.janela (banda morta no ISCCP) -> subdocumento da leitura."""
+    documento = {"amostras": janela.amostras, "inicio": janela.inicio}
+    for posicao in POSICOES_PNEU:
+        agregado = getattr(janela, posicao)
+        documento[posicao] = {"temp_min": agregado.temp_min, "temp_max": agregado.temp_max,
+                              "temp_media": agregado.temp_media, "desgaste_delta": agregado.desgaste_delta}
+    return documento
+
+
+def converter_item(item):
+    """DadosCarro (gRPC) -> documento do histórico no Mongo."""
+    documento = {
+        "_id": chave_idempotente(item),
+        "carro_id": item.carro_id,
+        "sensor_responsavel": item.sensor_id,
+        "velocidade": item.velocidade,
+        "volta": item.volta,
+        "timestamp": para_datetime(item.timestamp),
+        "pneus": {
+            "fl": {"temp": item.pneu_fl.temperatura, "desgaste": item.pneu_fl.desgaste,
+                   "press": item.pneu_fl.pressao},
+            "fr": {"temp": item.pneu_fr.temperatura, "desgaste": item.pneu_fr.desgaste,
+                   "press": item.pneu_fr.pressao},
+            "rl": {"temp": item.pneu_rl.temperatura, "desgaste": item.pneu_rl.desgaste,
+                   "press": item.pneu_rl.pressao},
+            "rr": {"temp": item.pneu_rr.temperatura, "desgaste": item.pneu_rr.desgaste,
+                   "press": item.pneu_rr.pressao},
+        }
+    }
+    if item.HasField("janela"):
+        documento["janela"] = janela_para_documento(item.janela)
+    return documento
+
+
+def converter_lote(itens):
+    """DadosCarro de um lote -> (documentos, quantas leituras eram inválidas).
+
+    Uma leitura que não converte (timestamp vazio ou não numérico, de uma ponte
+    sem validação) é descartada sozinha: se o lote inteiro falhasse, a ponte o
+    reenviaria para sempre e travaria a fila atrás dele.
+    """
+    documentos = []
+    invalidas = 0
+    for item in itens:
+        try:
+            documentos.append(converter_item(item))
+        except (ValueError, OverflowError, OSError) as e:
+            invalidas += 1
+            print(f"[SACP] Leitura inválida descartada ({item.carro_id!r}, timestamp {item.timestamp!r}): {e}")
+    return documentos, invalidas
+
+
+async def aplicar_operacoes_snapshot_async(snapshot, operacoes):
+    if not operacoes:
+        return
+    try:
+        await snapshot.bulk_write(operacoes, ordered=False)
+    except BulkWriteError as e:
+        if erros_nao_duplicados(e):
+            raise
+
+
+async def inserir_historico_async(collection, chaves, documentos):
+    try:
+        await chaves.insert_many(_documentos_chave(documentos), ordered=False)
+        novos = documentos
+    except BulkWriteError as e:
+        repetidos = _repetidos(documentos, e)
+        cursor = chaves.find(_filtro_pendentes(repetidos), {"_id": 1})
+        pendentes = [k["_id"] for k in await cursor.to_list(None)]
+        novos = _separar_novos(documentos, repetidos, pendentes)
+    if not novos:
+        return []
+    try:
+        await collection.insert_many(novos, ordered=False)
+    except BulkWriteError as e:
+        gravadas, falhas = _gravadas(novos, e)
+        await chaves.delete_many({"_id": {"$in": falhas}})
+        await _confirmar_chaves_async(chaves, gravadas)
+        raise
+    await _confirmar_chaves_async(chaves, novos)
+    return novos
+
+
+async def _confirmar_chaves_async(chaves, gravadas):
+    if not gravadas:
+        return
+    try:
+        await chaves.update_many({"_id": {"$in": _ids(gravadas)}}, {"$set": {"confirmada": True}})
+    except PyMongoError as e:
+        print(f"[SACP] Erro ao confirmar chaves ({len(gravadas)} leituras): {e}")
+
+
+async def aplicar_rollups_async(rollups, novos):
+    if not novos:
+        return
+    try:
+        for colecao, operacoes in zip(rollups, montar_operacoes_rollup(novos)):
+            await colecao.bulk_write(operacoes, ordered=False)
+    except PyMongoError as e:
+        print(f"[SACP] Erro ao atualizar rollups ({len(novos)} leituras): {e}")
+
+
+async def aplicar_modelos_desgaste_async(modelos, novos):
+    from ssacp.previsao import montar_operacoes_modelo
+    if not novos:
+        return
+    try:
+        operacoes = montar_operacoes_modelo(novos)
+        if operacoes:
+            await modelos.bulk_write(operacoes, ordered=False)
+    except PyMongoError as e:
+        print(f"[SACP] Erro ao atualizar modelos de desgaste ({len(novos)} leituras): {e}")
+
+
+async def gravar_alertas_async(colecao, eventos):
+    efetivos = []
+    try:
+        for evento in eventos:
+            filtro, atualizacao, upsert = _operacao_alerta(evento)
+            if _efetivo(await colecao.update_one(filtro, atualizacao, upsert=upsert), upsert):
+                efetivos.append(evento)
+    except PyMongoError as e:
+        print(f"[SACP] Erro ao gravar alertas ({len(eventos)} eventos): {e}")
+    return efetivos
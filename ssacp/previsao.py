@@ -0,0 +1,172 @@
+"""Previsão online do desgaste dos pneus e da janela de parada.
+
+Para cada carro e pneu, o desgaste é ajustado por mínimos quadrados como
+
+    desgaste = a * exposicao + c * setores + b
+
+onde `setores` é quantos setores o carro já percorreu ((volta - 1) * 15 +
+posição do setor) e `exposicao` é o estresse acumulado desses setores segundo
+o TRACK_MAP de comum/pista.py (o `stress` de cada setor, 1,8x no pneu do lado de apoio, como em
+car/main_car.py). O termo em `setores` absorve o desgaste que não depende da
+curva (retas em alta velocidade, por exemplo).
+
+O ajuste só precisa das somas (n, Σx, Σxx, Σxy, ...), então o SSACP as
+acumula com $inc na coleção `modelos_desgaste` (um documento por carro) a cada
+lote de leituras novas, como os rollups: nada é reajustado sobre o histórico
+e réplicas diferentes somam no mesmo documento. A previsão (`prever`) resolve
+o sistema 3x3 das equações normais e projeta o desgaste de uma volta inteira
+para estimar em quantas voltas cada pneu chega ao limite.
+
+Troca de pneus não é modelada: as somas valem para o stint inteiro do carro.
+"""
+import math
+
+from pymongo import UpdateOne
+
+from comum.pista import NUM_SETORES, TRACK_MAP, PNEUS_DIREITA, PNEUS_ESQUERDA
+from ssacp.persistencia import POSICOES_PNEU
+
+
+def _exposicao(setor, pneu):
+    apoio = ((setor["lado_apoio"] == "direita" and pneu in PNEUS_DIREITA) or
+             (setor["lado_apoio"] == "esquerda" and pneu in PNEUS_ESQUERDA))
+    return setor["stress"] * (1.8 if apoio else 1.0)
+
+
+def _tabela_setores():
+    setores = {}
+    acumulada = dict.fromkeys(POSICOES_PNEU, 0.0)
+    for posicao, setor in enumerate(TRACK_MAP, start=1):
+        for pneu in POSICOES_PNEU:
+            acumulada[pneu] += _exposicao(setor, pneu)
+        setores[setor["nome"]] = (posicao, dict(acumulada))
+    return setores, acumulada
+
+
+# Nome do setor -> (posição 1..15, exposição acumulada na volta até ele, por pneu)
+# e exposição de uma volta completa, por pneu
+SETORES, EXPOSICAO_VOLTA = _tabela_setores()
+
+
+def setores_percorridos(volta, setor):
+    """Setores completados no fim de `setor` (nome no TRACK_MAP) da `volta`, ou None se o setor é desconhecido."""
+    conhecido = SETORES.get(setor)
+    return None if conhecido is None else (volta - 1) * NUM_SETORES + conhecido[0]
+
+
+def variaveis(volta, setor):
+    """(setores percorridos, {pneu: exposição acumulada}) no fim do setor, ou None se o setor é desconhecido."""
+    s = setores_percorridos(volta, setor)
+    if s is None:
+        return None
+    acumulada = SETORES[setor][1]
+    return s, {p: (volta - 1) * EXPOSICAO_VOLTA[p] + acumulada[p] for p in POSICOES_PNEU}
+
+
+def _somar(somas, caminho, valor):
+    somas[caminho] = somas.get(caminho, 0.0) + valor
+
+
+def montar_operacoes_modelo(documentos):
+    """Soma as leituras do lote por carro e devolve um upsert por carro em `modelos_desgaste`.
+
+    Só deve receber leituras novas (depois da deduplicação), pois $inc não é
+    idempotente. Leituras de setores fora do TRACK_MAP são ignoradas.
+    """
+    por_carro = {}
+    for doc in documentos:
+        pos = variaveis(doc["volta"], doc["sensor_responsavel"])
+        if pos is None:
+            continue
+        s, exposicao = pos
+        carro = por_carro.get(doc["carro_id"])
+        if carro is None:
+            carro = por_carro[doc["carro_id"]] = {"somas": {}, "max": {}}
+        somas, maximos = carro["somas"], carro["max"]
+        _somar(somas, "n", 1)
+        _somar(somas, "s", s)
+        _somar(somas, "ss", s * s)
+        maximos["setores"] = max(maximos.get("setores", 0), s)
+        maximos["volta"] = max(maximos.get("volta", 0), doc["volta"])
+        for p in POSICOES_PNEU:
+            x, y = exposicao[p], doc["pneus"][p]["desgaste"]
+            for nome, valor in (("x", x), ("y", y), ("xx", x * x), ("xs", x * s), ("xy", x * y),
+                                ("sy", s * y), ("yy", y * y)):
+                _somar(somas, f"pneus.{p}.{nome}", valor)
+            caminho = f"pneus.{p}.desgaste"
+            maximos[caminho] = max(maximos.get(caminho, y), y)
+    return [UpdateOne({"_id": carro_id},
+                      {"$inc": carro["somas"], "$max": carro["max"], "$setOnInsert": {"carro_id": carro_id},
+                       # atualizado_em (hora do servidor) é o que o SSVCP acompanha para recalcular só estes carros
+                       "$currentDate": {"atualizado_em": True}},
+                      upsert=True)
+            for carro_id, carro in por_carro.items()]
+
+
+def _resolver3(m, v):
+    """Regra de Cramer para m (3x3) . β = v; None se o sistema é (quase) singular."""
+    def det(a):
+        return (a[0][0] * (a[1][1] * a[2][2] - a[1][2] * a[2][1])
+                - a[0][1] * (a[1][0] * a[2][2] - a[1][2] * a[2][0])
+                + a[0][2] * (a[1][0] * a[2][1] - a[1][1] * a[2][0]))
+
+    d = det(m)
+    escala = max(abs(m[0][0] * m[1][1] * m[2][2]), 1e-300)
+    if abs(d) < 1e-12 * escala:
+        return None
+    solucao = []
+    for coluna in range(3):
+        trocada = [[v[i] if j == coluna else m[i][j] for j in range(3)] for i in range(3)]
+        solucao.append(det(trocada) / d)
+    return solucao
+
+
+def ajustar(modelo, pneu):
+    """Coeficientes (a, c, b) e desvio padrão dos resíduos do pneu, ou None sem dados suficientes."""
+    n = modelo.get("n", 0)
+    if n < NUM_SETORES:  # menos de uma volta: exposição e setores ainda não se separam
+        return None
+    somas = modelo["pneus"][pneu]
+    s, ss = modelo["s"], modelo["ss"]
+    m = [[somas["xx"], somas["xs"], somas["x"]],
+         [somas["xs"], ss, s],
+         [somas["x"], s, n]]
+    v = [somas["xy"], somas["sy"], somas["y"]]
+    coef = _resolver3(m, v)
+    if coef is None:
+        return None
+    sse = somas["yy"] - sum(c * vi for c, vi in zip(coef, v))
+    residuo = math.sqrt(max(sse, 0.0) / (n - 3)) if n > 3 else 0.0
+    return coef, residuo
+
+
+def prever(modelo, limite):
+    """Previsão de um documento de `modelos_desgaste`: voltas até cada pneu chegar a `limite` (%)."""
+    setores = modelo.get("setores", 0)
+    voltas_percorridas = setores / NUM_SETORES
+    pneus = {}
+    for p in POSICOES_PNEU:
+        desgaste = modelo.get("pneus", {}).get(p, {}).get("desgaste")
+        previsao = {"desgaste": desgaste, "taxa_por_volta": None, "voltas_ate_limite": None,
+                    "volta_limite": None, "residuo": None}
+        ajuste = ajustar(modelo, p) if desgaste is not None else None
+        if ajuste is not None:
+            (a, c, _), residuo = ajuste
+            taxa = a * EXPOSICAO_VOLTA[p] + c * NUM_SETORES
+            previsao.update(taxa_por_volta=round(taxa, 4), residuo=round(residuo, 4))
+            if desgaste >= limite:
+                previsao.update(voltas_ate_limite=0.0, volta_limite=modelo.get("volta"))
+            elif taxa > 0:
+                restantes = (limite - desgaste) / taxa
+                # Volta em que o limite é cruzado (a volta N cobre N-1 .. N voltas percorridas)
+                previsao.update(voltas_ate_limite=round(restantes, 2),
+                                volta_limite=math.ceil(voltas_percorridas + restantes))
+        pneus[p] = previsao
+
+    com_limite = [p for p in POSICOES_PNEU if pneus[p]["volta_limite"] is not None]
+    parada = None
+    if com_limite:
+        pneu = min(com_limite, key=lambda p: (pneus[p]["volta_limite"], pneus[p]["voltas_ate_limite"]))
+        parada = {"volta": pneus[pneu]["volta_limite"], "pneu": pneu}
+    return {"carro_id": modelo.get("carro_id", modelo.get("_id")), "volta": modelo.get("volta"),
+            "amostras": modelo.get("n", 0), "limite": limite, "pneus": pneus, "parada": parada}
@@ -0,0 +1,68 @@
+"""Reconstrói os rollups por setor e por volta a partir do histórico `pneus`.
+
+O SSACP mantém `rollups_setor`, `rollups_volta` e os modelos de desgaste
+(`modelos_desgaste`, ssacp/previsao.py) a cada lote gravado. Use este
+script para preenchê-los em bases antigas (gravadas antes dos rollups) ou
+depois de um erro de gravação registrado no log do SSACP.
+
+    MONGO_URI=mongodb://localhost:27017/ python ssacp/recalcular_rollups.py [--carro "Ferrari - Leclerc"]
+"""
+import argparse
+import os
+import sys
+
+import pymongo
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ssacp.persistencia import colecao_modelos, colecoes_rollup, preparar_colecoes, montar_operacoes_rollup
+from ssacp.previsao import montar_operacoes_modelo
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BANCO = os.getenv("SSACP_BANCO", "f1_telemetria")
+
+
+def _agregar(rollups, modelos, lote):
+    for colecao, operacoes in zip(rollups, montar_operacoes_rollup(lote)):
+        colecao.bulk_write(operacoes, ordered=False)
+    operacoes = montar_operacoes_modelo(lote)
+    if operacoes:
+        modelos.bulk_write(operacoes, ordered=False)
+
+
+def recalcular(banco, carro_id=None, tamanho_lote=5000):
+    preparar_colecoes(banco)
+    rollups = colecoes_rollup(banco)
+    modelos = colecao_modelos(banco)
+    filtro = {"carro_id": carro_id} if carro_id else {}
+    for colecao in rollups:
+        colecao.delete_many(filtro)
+    modelos.delete_many(filtro)
+
+    processados = 0
+    lote = []
+    for doc in banco["pneus"].find(filtro, batch_size=tamanho_lote):
+        lote.append(doc)
+        if len(lote) >= tamanho_lote:
+            _agregar(rollups, modelos, lote)
+            processados += len(lote)
+            lote = []
+            print(f"[ROLLUPS] {processados} leituras processadas...")
+    if lote:
+        _agregar(rollups, modelos, lote)
+        processados += len(lote)
+    print(f"[ROLLUPS] {processados} leituras agregadas em rollups_setor/rollups_volta/modelos_desgaste.")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carro", default=None, help="recalcula só este carro")
+    parser.add_argument("--lote", type=int, default=5000)
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(MONGO_URI)
+    recalcular(client[BANCO], args.carro, args.lote)
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import signal
+import time
+
+import grpc
+from pymongo import AsyncMongoClient
+
+from protos import f1_pb2, f1_pb2_grpc
+from comum.metricas import Registro
+from ssacp.conexao import monitorar_banco_aio, opcoes_servidor, registrar_saude_aio
+from ssacp.instrumentacao import MetricasSSACP
+from ssacp.alertas import registrar_metricas
+from ssacp.persistencia import (colecoes, colecoes_rollup, colecao_alertas, converter_lote, inserir_historico_async,
+                                montar_operacoes_snapshot, aplicar_operacoes_snapshot_async, aplicar_rollups_async,
+                                colecao_modelos, aplicar_modelos_desgaste_async, gravar_alertas_async)
+
+# Quantos insert_many podem estar em andamento ao mesmo tempo
+CONCORRENCIA_ESCRITA = int(os.getenv("SSACP_CONCORRENCIA_ESCRITA", "4"))
+# Lotes que chegam juntos são unidos até este número de documentos por insert_many
+DOCUMENTOS_POR_ESCRITA = int(os.getenv("SSACP_DOCUMENTOS_POR_ESCRITA", "2000"))
+# Espera (s) por mais lotes antes de gravar, para juntar escritas concorrentes
+ESPERA_COALESCER = float(os.getenv("SSACP_ESPERA_COALESCER", "0.002"))
+
+
+class PipelineEscrita:
+    """Fila assíncrona de gravação no Mongo.
+
+    Os handlers apenas enfileiram documentos e aguardam. Cada trabalhador pega
+    o que estiver na fila (até DOCUMENTOS_POR_ESCRITA), grava com um único
+    insert_many(ordered=False) e libera todos os handlers daquele grupo,
+    cada um com quantas das suas leituras eram novas (não duplicadas).
+    """
+
+    def __init__(self, collection, snapshot, chaves, rollups=(), concorrencia=CONCORRENCIA_ESCRITA,
+                 documentos_por_escrita=DOCUMENTOS_POR_ESCRITA, espera_coalescer=ESPERA_COALESCER,
+                 alertas=None, colecao_alertas=None, publicador=None, modelos=None):
+        self.collection = collection
+        self.snapshot = snapshot
+        self.chaves = chaves
+        self.rollups = rollups
+        # Modelos de desgaste (ssacp/previsao.py); None desliga
+        self.modelos = modelos
+        # Motor de alertas (opcional) sobre as leituras novas, como no servidor com threads
+        self.alertas = alertas
+        self.colecao_alertas = colecao_alertas
+        self.publicador = publicador
+        self.concorrencia = concorrencia
+        self.documentos_por_escrita = documentos_por_escrita
+        self.espera_coalescer = espera_coalescer
+        self._fila = asyncio.Queue()
+        self._trabalhadores = []
+        self.escritas = 0
+        self.documentos_gravados = 0
+
+    def pendentes(self):
+        return self._fila.qsize()
+
+    def iniciar(self):
+        self._trabalhadores = [asyncio.ensure_future(self._trabalhador()) for _ in range(self.concorrencia)]
+
+    async def parar(self):
+        for trabalhador in self._trabalhadores:
+            trabalhador.cancel()
+        await asyncio.gather(*self._trabalhadores, return_exceptions=True)
+
+    async def gravar(self, documentos):
+        """Grava as leituras junto com as de outros pedidos. Retorna quantas eram novas."""
+        if not documentos:
+            return 0
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((documentos, futuro))
+        return await futuro
+
+    async def _juntar_pedidos(self):
+        pedidos = [await self._fila.get()]
+        total = len(pedidos[0][0])
+        if self.espera_coalescer > 0 and self._fila.empty():
+            await asyncio.sleep(self.espera_coalescer)
+        while total < self.documentos_por_escrita and not self._fila.empty():
+            pedido = self._fila.get_nowait()
+            pedidos.append(pedido)
+            total += len(pedido[0])
+        return pedidos
+
+    async def _trabalhador(self):
+        while True:
+            pedidos = await self._juntar_pedidos()
+            documentos = [doc for docs, _ in pedidos for doc in docs]
+            try:
+                novos = await inserir_historico_async(self.collection, self.chaves, documentos)
+                await aplicar_operacoes_snapshot_async(self.snapshot, montar_operacoes_snapshot(documentos))
+                await aplicar_rollups_async(self.rollups, novos)
+                if self.modelos is not None:
+                    await aplicar_modelos_desgaste_async(self.modelos, novos)
+                if self.alertas is not None and novos:
+                    eventos = await gravar_alertas_async(self.colecao_alertas, self.alertas.processar(novos))
+                    if eventos and self.publicador is not None:
+                        self.publicador.publicar(eventos)
+                self.escritas += 1
+                self.documentos_gravados += len(documentos)
+                # `novos` traz os próprios documentos do grupo: a identidade diz de qual pedido é cada um
+                ids_novos = {id(doc) for doc in novos}
+                for docs, futuro in pedidos:
+                    if not futuro.done():
+                        futuro.set_result(sum(1 for doc in docs if id(doc) in ids_novos))
+            except Exception as e:
+                for _, futuro in pedidos:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+
+
+class MonitoramentoServiceAio(f1_pb2_grpc.MonitoramentoServicer):
+
+    def __init__(self, pipeline, intervalo_confirmacao, registro=None):
+        self.pipeline = pipeline
+        self.intervalo_confirmacao = intervalo_confirmacao
+        self.metricas = MetricasSSACP(registro or Registro())
+        registro = self.metricas.registro
+        registro.medidor("ssacp_fila_escrita", self.pipeline.pendentes,
+                         "Pedidos de gravação esperando no pipeline")
+        registro.medidor("ssacp_escritas_total", lambda: self.pipeline.escritas, "insert_many feitos pelo pipeline",
+                         tipo="counter")
+        if pipeline.alertas is not None:
+            registrar_metricas(registro, pipeline.alertas)
+
+    async def EnviarLotePneus(self, request, context):
+        recebido = time.time()
+        lista_para_salvar, invalidas = converter_lote(request.dados)
+        novos = await self.pipeline.gravar(lista_para_salvar)
+        if lista_para_salvar or invalidas:
+            self.metricas.observar_lote(request.dados, request.enviado_isccp, recebido, time.time(), novos,
+                                        invalidas)
+        return f1_pb2.Resposta(mensagem="Lote Processado", sucesso=True)
+
+    async def FluxoPneus(self, request_iterator, context):
+        # Cada lote vira uma gravação no pipeline assim que chega; as
+        # confirmações seguem a ordem das sequências.
+        gravacoes = asyncio.Queue()
+
+        async def ler_entrada():
+            try:
+                async for lote in request_iterator:
+                    recebido = time.time()
+                    documentos, invalidas = converter_lote(lote.dados)
+                    gravacao = asyncio.ensure_future(self.pipeline.gravar(documentos))
+                    await gravacoes.put((lote, recebido, invalidas, gravacao))
+            finally:
+                await gravacoes.put(None)
+
+        leitor = asyncio.ensure_future(ler_entrada())
+        ultima_gravada = 0
+        ultima_confirmada = 0
+        proxima_confirmacao = time.monotonic() + self.intervalo_confirmacao
+        try:
+            while True:
+                item = await gravacoes.get()
+                if item is None:
+                    break
+                lote, recebido, invalidas, gravacao = item
+                novos = await gravacao
+                self.metricas.observar_lote(lote.dados, lote.enviado_isccp, recebido, time.time(), novos, invalidas)
+                ultima_gravada = lote.sequencia
+
+                agora = time.monotonic()
+                if gravacoes.empty() or agora >= proxima_confirmacao:
+                    yield f1_pb2.Confirmacao(ultima_sequencia_gravada=ultima_gravada)
+                    ultima_confirmada = ultima_gravada
+                    proxima_confirmacao = agora + self.intervalo_confirmacao
+
+            if ultima_gravada != ultima_confirmada:
+                yield f1_pb2.Confirmacao(ultima_sequencia_gravada=ultima_gravada)
+        finally:
+            leitor.cancel()
+
+
+async def servir_aio(mongo_uri, banco, porta, intervalo_confirmacao, registro=None, prazo_desligamento=5.0,
+                     alertas=None, publicador=None, previsao=True):
+    client = AsyncMongoClient(mongo_uri)
+    pipeline = PipelineEscrita(*colecoes(client[banco]), rollups=colecoes_rollup(client[banco]), alertas=alertas,
+                               colecao_alertas=colecao_alertas(client[banco]), publicador=publicador,
+                               modelos=colecao_modelos(client[banco]) if previsao else None)
+    pipeline.iniciar()
+
+    server = grpc.aio.server(options=opcoes_servidor())
+    f1_pb2_grpc.add_MonitoramentoServicer_to_server(MonitoramentoServiceAio(pipeline, intervalo_confirmacao, registro), server)
+    saude = await registrar_saude_aio(server)
+    monitor = asyncio.create_task(monitorar_banco_aio(saude, client[banco]))
+    server.add_insecure_port(f'[::]:{porta}')
+    await server.start()
+    print(f"Servidor SACP (grpc.aio, {pipeline.concorrencia} escritas concorrentes) rodando na porta {porta}...")
+
+    async def desligar():
+        # NOT_SERVING primeiro: as pontes tiram a réplica do rodízio antes de ela fechar
+        await saude.enter_graceful_shutdown()
+        await server.stop(prazo_desligamento)
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(desligar()))
+    try:
+        await server.wait_for_termination()
+    finally:
+        monitor.cancel()
+        await pipeline.parar()
+        await client.close()
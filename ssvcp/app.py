@@ -1,25 +1,201 @@
 import os
 import sys
+import queue
 import logging
-from flask import Flask, jsonify, render_template
+import threading
+import time
+from datetime import datetime, timezone
+from flask import Flask, Response, g, jsonify, render_template, request
 import pymongo
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ssvcp.transmissao import Transmissor, RESSINCRONIZAR, para_json
+from ssvcp import historico
+from ssvcp.cache_previsao import CachePrevisoes
+from ssvcp.classificacao import Classificacao
+from ssvcp import resposta
+from ssvcp import exportacao
+from comum.metricas import LIMITES_LATENCIA, TIPO_CONTEUDO, Registro, histogramas_saltos
+from comum import perfil
+
 # Configuração de Logs
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(levelname)s: %(message)s', stream=sys.stdout)
+logging.basicConfig(level=os.getenv("SSVCP_LOG_LEVEL", "INFO"), format='%(asctime)s %(levelname)s: %(message)s', stream=sys.stdout)
 logger = logging.getLogger("F1_Dashboard")
 
 app = Flask(__name__)
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BANCO = os.getenv("SSVCP_BANCO", "f1_telemetria")
+PORTA = int(os.getenv("SSVCP_PORTA", "5000"))
+# Pool do cliente compartilhado (por processo/worker)
+POOL_MAX = int(os.getenv("SSVCP_POOL_MAX", "50"))
+POOL_MIN = int(os.getenv("SSVCP_POOL_MIN", "0"))
+# secondaryPreferred tira as leituras do dashboard do primário (que recebe as escritas do SSACP)
+READ_PREFERENCE = os.getenv("SSVCP_READ_PREFERENCE", "secondaryPreferred")
+# Intervalo (s) de keep-alive do SSE quando não há mudanças
+INTERVALO_PING_SSE = float(os.getenv("SSVCP_INTERVALO_PING_SSE", "15"))
+# Conexões SSE abertas ao mesmo tempo por processo; além disso /api/stream responde 503.
+# Com gunicorn gthread cada conexão prende uma thread (ver ssvcp/gunicorn.conf.py)
+SSE_MAX = int(os.getenv("SSVCP_SSE_MAX", "128"))
+# /api/telemetria: respostas menores que isso (bytes) vão sem compressão
+COMPRESSAO_MIN_BYTES = int(os.getenv("SSVCP_COMPRESSAO_MIN_BYTES", "1024"))
+# /api/previsao: no máximo uma consulta aos modelos de desgaste por este intervalo (s)
+INTERVALO_PREVISAO = float(os.getenv("SSVCP_INTERVALO_PREVISAO", "1"))
+# Desgaste (%) usado como limite quando a requisição não informa ?limite
+LIMITE_DESGASTE = float(os.getenv("SSVCP_LIMITE_DESGASTE", "75"))
 
+_client = None
+_client_pid = None
+_lock_client = threading.Lock()
+_transmissor = None
+_lock_transmissor = threading.Lock()
+_cache_previsoes = None
+# Corpos do /api/telemetria já codificados para a versão atual do snapshot
+_corpos_telemetria = resposta.CacheCorpos()
+_lock_previsoes = threading.Lock()
+_vagas_sse = threading.BoundedSemaphore(SSE_MAX)
+# Posições e tempos ao vivo, alimentados pelo transmissor a cada atualização do snapshot
+_classificacao = Classificacao()
+
+# Métricas do processo (com gunicorn, cada worker tem as suas)
+registro = Registro()
+_saltos = histogramas_saltos(registro, ("ssvcp",))
+_erros = registro.contador("ssvcp_erros_total", "Respostas 5xx")
+_latencia_rotas = {}
+_lock_metricas = threading.Lock()
+registro.medidor("ssvcp_clientes_sse", lambda: _transmissor.assinantes() if _transmissor else 0,
+                 "Dashboards conectados em /api/stream")
+_sse_recusadas = registro.contador("ssvcp_sse_recusadas_total", "Conexões em /api/stream recusadas (limite SSE)")
+registro.medidor("ssvcp_leituras_banco_total", lambda: _transmissor.eventos_db if _transmissor else 0,
+                 "Leituras do latest_by_car feitas pelo transmissor", tipo="counter")
+registro.medidor("ssvcp_previsoes_recalculadas_total", lambda: _cache_previsoes.recalculadas if _cache_previsoes else 0,
+                 "Previsões de desgaste recalculadas (carros com leituras novas)", tipo="counter")
+registro.medidor("ssvcp_classificacao_eventos_total", lambda: _classificacao.eventos,
+                 "Leituras processadas pela classificação ao vivo", tipo="counter")
+
+
+def obter_cliente():
+    """MongoClient único por processo: pool de conexões e descoberta do replica set reaproveitados.
+
+    O MongoClient não sobrevive a fork; cada worker do gunicorn cria o seu no primeiro uso.
+    """
+    global _client, _client_pid
+    with _lock_client:
+        if _client is None or _client_pid != os.getpid():
+            try:
+                _client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000, directConnection=False,
+                                              maxPoolSize=POOL_MAX, minPoolSize=POOL_MIN,
+                                              readPreference=READ_PREFERENCE)
+                _client_pid = os.getpid()
+            except Exception as e:
+                logger.error(f"Erro ao criar cliente Mongo: {e}")
+                raise e
+        return _client
+
+
+def get_db_collection(nome="pneus"):
+    return obter_cliente()[BANCO][nome]
+
+
+# Caminho antigo: agrega todo o histórico (custo cresce com a corrida).
+# Mantido para comparação e para bases sem o snapshot materializado.
+PIPELINE_ULTIMO_ESTADO = [
+    {"$sort": {"timestamp": -1}},
+    {"$group": {
+        "_id": "$carro_id",
+        "doc": {"$first": "$$ROOT"}
+    }},
+    {"$replaceRoot": {"newRoot": "$doc"}},
+    # Remove o campo _id que causa o erro de JSON
+    {"$project": {"_id": 0}},
+    {"$sort": {"carro_id": 1}}
+]
+
+
+def ler_ultimo_estado_historico(collection):
+    return list(collection.aggregate(PIPELINE_ULTIMO_ESTADO))
+
+
+def ler_ultimo_estado_snapshot(snapshot):
+    # latest_by_car é mantido pelo SSACP: 1 documento por carro
+    return list(snapshot.find({}, {"_id": 0}).sort("carro_id", 1))
+
+
+def ler_versao_snapshot(snapshot):
+    """Versão do snapshot: o maior `atualizado_em` (hora do servidor Mongo) em epoch ms, pelo índice.
+
+    Vem do banco, então é a mesma em todos os workers.
+    """
+    doc = snapshot.find_one({}, {"_id": 0, "atualizado_em": 1}, sort=[("atualizado_em", -1)])
+    atualizado = (doc or {}).get("atualizado_em")
+    return resposta.epoch_ms(atualizado) if atualizado else 0
+
+
+def ler_alterados_snapshot(snapshot, desde_ms):
+    # >= para não perder atualizações no mesmo milissegundo da versão anterior (podem vir repetidas)
+    desde = datetime.fromtimestamp(desde_ms / 1000, tz=timezone.utc)
+    return list(snapshot.find({"atualizado_em": {"$gte": desde}}, {"_id": 0}).sort("carro_id", 1))
+
+
+def obter_transmissor():
+    """Um único observador do banco por processo, compartilhado por todos os clientes SSE."""
+    global _transmissor
+    with _lock_transmissor:
+        if _transmissor is None:
+            _transmissor = Transmissor(get_db_collection("latest_by_car"), hist_atraso=_saltos["ssvcp"],
+                                       ao_receber=_classificacao.processar)
+            _transmissor.iniciar()
+        return _transmissor
 
-def get_db_collection():
-    try:
-        client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000, directConnection=False)
-        return client["f1_telemetria"]["pneus"]
-    except Exception as e:
-        logger.error(f"Erro ao criar cliente Mongo: {e}")
-        raise e
+
+def obter_cache_previsoes():
+    global _cache_previsoes
+    with _lock_previsoes:
+        if _cache_previsoes is None:
+            _cache_previsoes = CachePrevisoes(get_db_collection("modelos_desgaste"), INTERVALO_PREVISAO)
+        return _cache_previsoes
+
+
+def evento_sse(tipo, dados, versao):
+    return f"id: {versao}\nevent: {tipo}\ndata: {para_json(dados)}\n\n"
+
+
+def histograma_rota(rota):
+    with _lock_metricas:
+        hist = _latencia_rotas.get(rota)
+        if hist is None:
+            hist = _latencia_rotas[rota] = registro.histograma(
+                "ssvcp_latencia_requisicao_s", LIMITES_LATENCIA, "Tempo até a resposta por rota (s)", {"rota": rota})
+        return hist
+
+
+@app.before_request
+def iniciar_cronometro():
+    g.inicio = time.perf_counter()
+
+
+@app.after_request
+def registrar_requisicao(resposta):
+    # Rotas desconhecidas ficam de fora para não criar uma série por URL; no SSE mede só a abertura
+    if request.url_rule is not None and "inicio" in g:
+        histograma_rota(request.url_rule.rule).observar(time.perf_counter() - g.inicio)
+    if resposta.status_code >= 500:
+        _erros.incrementar()
+    return resposta
+
+
+@app.route('/metrics', methods=['GET'])
+def metricas():
+    return Response(registro.texto(), content_type=TIPO_CONTEUDO)
+
+
+@app.route('/debug/perfil', methods=['GET'])
+def debug_perfil():
+    """Perfil por amostragem (ver comum/perfil.py). Só com PERFIL_HABILITADO=1."""
+    if not perfil.HABILITADO:
+        return jsonify({"erro": "perfil desabilitado (PERFIL_HABILITADO=1)"}), 404
+    status, tipo, corpo = perfil.responder_perfil(request.args.to_dict(flat=False))
+    return Response(corpo, status=status, content_type=tipo)
 
 
 @app.route('/')
@@ -27,36 +203,258 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: o processo está respondendo (não consulta o banco)."""
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: só aceita tráfego se o Mongo responder."""
+    try:
+        obter_cliente().admin.command("ping")
+    except Exception as e:
+        logger.warning(f"Readiness falhou: {e}")
+        return jsonify({"status": "indisponivel", "erro": str(e)}), 503
+    return jsonify({"status": "pronto", "pid": os.getpid()})
+
+
 @app.route('/api/telemetria', methods=['GET'])
 def get_telemetria():
-    try:
-        collection = get_db_collection()
+    """Estado atual de todos os carros.
 
-        # Pipeline corrigido
-        pipeline = [
-            {"$sort": {"timestamp": -1}},
-            {"$group": {
-                "_id": "$carro_id",
-                "doc": {"$first": "$$ROOT"}
-            }},
-            {"$replaceRoot": {"newRoot": "$doc"}},
+    A resposta leva a versão do snapshot (ETag fraca e X-Versao): com
+    If-None-Match igual, volta 304 sem ler os carros. ?since=<versao> devolve
+    só os carros alterados desde aquela versão (pode repetir algum do limite).
+    ?formato=json|colunas|msgpack (ver ssvcp/resposta.py); comprimida com
+    brotli/gzip conforme o Accept-Encoding.
+    """
+    formato = request.args.get("formato", "json")
+    if formato not in resposta.FORMATOS:
+        raise ParametroInvalido(f"'formato' deve ser um de {', '.join(resposta.FORMATOS)}")
+    desde = parametro_int("since", minimo=0)
+    try:
+        snapshot = get_db_collection("latest_by_car")
+        versao = ler_versao_snapshot(snapshot)
+        if request.if_none_match.contains_weak(str(versao)):
+            return preparar_resposta_telemetria(Response(status=304), versao)
 
-            # --- A CORREÇÃO ESTÁ AQUI EMBAIXO ---
-            # Remove o campo _id que causa o erro de JSON
-            {"$project": {"_id": 0}},
-            # ------------------------------------
+        codificacao = resposta.escolher_codificacao(request.accept_encodings)
 
-            {"$sort": {"carro_id": 1}}
-        ]
+        def gerar(carros):
+            corpo, mimetype = resposta.serializar(carros, formato, lambda d: app.json.dumps(d, separators=(",", ":")))
+            return resposta.comprimir(corpo, codificacao, COMPRESSAO_MIN_BYTES) + (mimetype,)
 
-        dados = list(collection.aggregate(pipeline))
-        logger.debug(f"Sucesso! Retornando {len(dados)} carros.")
-        return jsonify(dados)
+        if desde is None:
+            corpo, aplicada, mimetype = _corpos_telemetria.obter(
+                versao, (formato, codificacao), lambda: gerar(ler_ultimo_estado_snapshot(snapshot)))
+        else:
+            corpo, aplicada, mimetype = gerar(ler_alterados_snapshot(snapshot, desde))
+        saida = preparar_resposta_telemetria(Response(corpo, mimetype=mimetype), versao)
+        if aplicada:
+            saida.headers["Content-Encoding"] = aplicada
+        return saida
 
     except Exception as e:
         logger.error(f"ERRO FATAL NA API: {str(e)}", exc_info=True)
         return jsonify({"erro": str(e)}), 500
 
 
+def preparar_resposta_telemetria(saida, versao):
+    saida.set_etag(str(versao), weak=True)
+    saida.headers["X-Versao"] = str(versao)
+    # no-cache: o navegador guarda, mas revalida (If-None-Match) a cada consulta
+    saida.headers["Cache-Control"] = "no-cache"
+    saida.headers["Vary"] = "Accept-Encoding"
+    return saida
+
+
+@app.route('/api/stream', methods=['GET'])
+def stream_telemetria():
+    """Server-Sent Events: estado completo na conexão e depois só os carros que mudaram."""
+    if not _vagas_sse.acquire(blocking=False):
+        # Recusa antes de esgotar as threads do worker; o dashboard passa a consultar /api/telemetria
+        _sse_recusadas.incrementar()
+        return jsonify({"erro": "limite de conexões SSE atingido"}), 503, {"Retry-After": "30"}
+    try:
+        transmissor = obter_transmissor()
+        fila, estado_inicial, versao_inicial = transmissor.assinar()
+    except Exception:
+        _vagas_sse.release()
+        raise
+
+    def gerar():
+        try:
+            yield evento_sse("snapshot", estado_inicial, versao_inicial)
+            while True:
+                try:
+                    item = fila.get(timeout=INTERVALO_PING_SSE)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if item is RESSINCRONIZAR:
+                    estado, versao = transmissor.estado_atual()
+                    yield evento_sse("snapshot", estado, versao)
+                else:
+                    versao, carros = item
+                    yield evento_sse("delta", carros, versao)
+        finally:
+            transmissor.cancelar(fila)
+
+    saida = Response(gerar(), mimetype="text/event-stream",
+                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Chamado ao fim da resposta mesmo se o cliente sair antes do primeiro evento
+    saida.call_on_close(_vagas_sse.release)
+    return saida
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+def parametro_int(nome, padrao=None, minimo=None, maximo=None):
+    valor = request.args.get(nome)
+    if valor is None or valor == "":
+        return padrao
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"'{nome}' deve ser inteiro")
+    if minimo is not None and numero < minimo:
+        raise ParametroInvalido(f"'{nome}' deve ser >= {minimo}")
+    if maximo is not None:
+        numero = min(numero, maximo)
+    return numero
+
+
+def parametro_float(nome, padrao=None):
+    valor = request.args.get(nome)
+    if valor is None or valor == "":
+        return padrao
+    try:
+        return float(valor)
+    except ValueError:
+        raise ParametroInvalido(f"'{nome}' deve ser numérico")
+
+
+def intervalo_voltas():
+    """?volta=N ou ?volta_ini=A&volta_fim=B."""
+    volta = parametro_int("volta", minimo=0)
+    if volta is not None:
+        return volta, volta
+    return parametro_int("volta_ini", minimo=0), parametro_int("volta_fim", minimo=0)
+
+
+@app.errorhandler(ParametroInvalido)
+def parametro_invalido(e):
+    return jsonify({"erro": str(e)}), 400
+
+
+@app.errorhandler(pymongo.errors.PyMongoError)
+def erro_banco(e):
+    logger.error(f"Erro no banco: {e}")
+    return jsonify({"erro": str(e)}), 503
+
+
+@app.route('/api/historico/<carro_id>/pneus', methods=['GET'])
+def historico_pneus(carro_id):
+    """Série de um campo dos pneus, reduzida no servidor.
+
+    ?campo=temp|desgaste|press  ?pneus=fr,rr  ?volta_ini=10&volta_fim=30
+    ?pontos=500  ?metodo=lttb|minmax
+    """
+    campo = request.args.get("campo", "temp")
+    if campo not in historico.CAMPOS_PNEU:
+        raise ParametroInvalido(f"'campo' deve ser um de {', '.join(historico.CAMPOS_PNEU)}")
+    pneus = [p for p in request.args.get("pneus", ",".join(historico.POSICOES_PNEU)).split(",") if p]
+    if not pneus or any(p not in historico.POSICOES_PNEU for p in pneus):
+        raise ParametroInvalido(f"'pneus' deve conter {', '.join(historico.POSICOES_PNEU)}")
+    metodo = request.args.get("metodo", "lttb")
+    if metodo not in historico.METODOS:
+        raise ParametroInvalido(f"'metodo' deve ser um de {', '.join(historico.METODOS)}")
+    pontos = parametro_int("pontos", historico.PONTOS_PADRAO, minimo=3, maximo=historico.PONTOS_MAX)
+    volta_ini, volta_fim = intervalo_voltas()
+
+    return jsonify(historico.serie_pneus(get_db_collection("pneus"), carro_id, pneus, campo,
+                                         volta_ini, volta_fim, pontos, metodo))
+
+
+@app.route('/api/historico/<carro_id>/setores', methods=['GET'])
+def historico_setores(carro_id):
+    """Médias/mín/máx por setor (rollups do SSACP). ?volta=N ou ?volta_ini&volta_fim."""
+    volta_ini, volta_fim = intervalo_voltas()
+    return jsonify(historico.rollups_por_setor(get_db_collection("rollups_setor"), carro_id, volta_ini, volta_fim))
+
+
+@app.route('/api/historico/<carro_id>/voltas', methods=['GET'])
+def historico_voltas(carro_id):
+    """Médias/mín/máx por volta (rollups do SSACP). ?volta_ini&volta_fim."""
+    volta_ini, volta_fim = intervalo_voltas()
+    return jsonify(historico.rollups_por_volta(get_db_collection("rollups_volta"), carro_id, volta_ini, volta_fim))
+
+
+@app.route('/api/historico/<carro_id>/degradacao', methods=['GET'])
+def historico_degradacao(carro_id):
+    """Taxa de desgaste por volta de cada pneu, por stint."""
+    voltas = historico.rollups_por_volta(get_db_collection("rollups_volta"), carro_id)
+    return jsonify({"carro_id": carro_id, "stints": historico.degradacao_por_stint(voltas)})
+
+
+@app.route('/api/alertas', methods=['GET'])
+def listar_alertas():
+    """Alertas de pneu do motor do SSACP, mais recentes primeiro.
+
+    ?carro_id=Hamilton  ?ativos=1  ?desde=<epoch s>  ?limite=100
+    """
+    limite = parametro_int("limite", 100, minimo=1, maximo=1000)
+    return jsonify(historico.listar_alertas(get_db_collection("alertas"), request.args.get("carro_id"),
+                                            request.args.get("ativos") == "1", parametro_float("desde"), limite))
+
+
+@app.route('/api/previsao', methods=['GET'])
+def previsao_desgaste():
+    """Previsão de desgaste por pneu e volta de parada (regressão online do SSACP).
+
+    ?carro_id=Hamilton  ?limite=75 (% de desgaste)
+    """
+    limite = parametro_float("limite", LIMITE_DESGASTE)
+    if not 0 < limite <= 100:
+        raise ParametroInvalido("'limite' deve estar entre 0 e 100")
+    previsoes = obter_cache_previsoes().previsoes(limite, request.args.get("carro_id"))
+    return jsonify({"limite": limite, "carros": previsoes})
+
+
+@app.route('/api/exportacao', methods=['GET'])
+def exportar_corrida():
+    """Histórico bruto da corrida em formato colunar, lido e enviado em lotes (ver ssvcp/exportacao.py).
+
+    ?formato=npz|parquet  ?carro_id=Hamilton  ?volta=N ou ?volta_ini=A&volta_fim=B
+    """
+    formato = request.args.get("formato", "npz")
+    if formato not in exportacao.FORMATOS_FLUXO:
+        raise ParametroInvalido(f"'formato' deve ser um de {sorted(exportacao.FORMATOS_FLUXO)}")
+    carro_id = request.args.get("carro_id")
+    volta_ini, volta_fim = intervalo_voltas()
+    try:
+        corpo = exportacao.gerar_arquivo(formato, exportacao.particoes(exportacao.ler_historico(
+            get_db_collection("pneus"), carro_id, volta_ini, volta_fim)))
+    except RuntimeError as e:
+        raise ParametroInvalido(str(e))
+    nome = f"{exportacao.pasta_carro(carro_id) if carro_id else 'corrida'}.{formato}"
+    # Erros do banco no meio do envio só aparecem como arquivo truncado (os cabeçalhos já saíram)
+    return Response(corpo, mimetype=exportacao.FORMATOS_FLUXO[formato],
+                    headers={"Content-Disposition": f'attachment; filename="{nome}"', "X-Accel-Buffering": "no"})
+
+
+@app.route('/api/classificacao', methods=['GET'])
+def classificacao_corrida():
+    """Classificação ao vivo: posição, intervalo para o carro da frente e para o líder, tempos de volta e setor."""
+    obter_transmissor()  # a classificação segue o mesmo observador do snapshot que o SSE
+    return jsonify(_classificacao.tabela())
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
+    # Servidor de desenvolvimento. Em produção: gunicorn -c ssvcp/gunicorn.conf.py ssvcp.app:app
+    app.run(host='0.0.0.0', port=PORTA, debug=os.getenv("SSVCP_DEBUG", "0") == "1",
+            use_reloader=False, threaded=True)
\ No newline at end of file
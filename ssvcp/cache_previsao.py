@@ -0,0 +1,60 @@
+"""Cache das previsões de desgaste servidas em /api/previsao.
+
+O SSACP atualiza um documento por carro em `modelos_desgaste` (somas da
+regressão, ver ssacp/previsao.py) e marca `atualizado_em` com a hora do
+servidor. O cache busca só os documentos alterados desde a última consulta
+(no máximo uma consulta por `intervalo_consulta`) e recalcula só a previsão
+desses carros; os demais saem da memória.
+"""
+import threading
+import time
+
+from ssacp.previsao import prever
+
+
+class CachePrevisoes:
+
+    def __init__(self, modelos, intervalo_consulta=1.0):
+        self.modelos = modelos
+        self.intervalo_consulta = intervalo_consulta
+        self._carros = {}  # carro_id -> [documento do modelo, {limite: previsão}]
+        self._ultima_atualizacao = None
+        self._proxima_consulta = 0.0
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.recalculadas = 0
+
+    def _atualizar(self):
+        agora = time.monotonic()
+        if agora < self._proxima_consulta:
+            return
+        self._proxima_consulta = agora + self.intervalo_consulta
+        # $gte (e não $gt): documentos gravados no mesmo milissegundo da última consulta não se perdem
+        filtro = {"atualizado_em": {"$gte": self._ultima_atualizacao}} if self._ultima_atualizacao else {}
+        self.consultas += 1
+        for doc in self.modelos.find(filtro):
+            atualizado = doc.get("atualizado_em")
+            if atualizado is not None and (self._ultima_atualizacao is None or atualizado > self._ultima_atualizacao):
+                self._ultima_atualizacao = atualizado
+            atual = self._carros.get(doc["_id"])
+            if atual is not None and atual[0].get("n") == doc.get("n"):
+                continue  # relido pelo $gte, sem leituras novas
+            self._carros[doc["_id"]] = [doc, {}]
+
+    def previsoes(self, limite, carro_id=None):
+        """Previsões (ssacp.previsao.prever) de todos os carros ou de um, em ordem de carro."""
+        with self._lock:
+            self._atualizar()
+            carros = [carro_id] if carro_id else sorted(self._carros)
+            resultado = []
+            for carro in carros:
+                item = self._carros.get(carro)
+                if item is None:
+                    continue
+                doc, por_limite = item
+                previsao = por_limite.get(limite)
+                if previsao is None:
+                    previsao = por_limite[limite] = prever(doc, limite)
+                    self.recalculadas += 1
+                resultado.append(previsao)
+            return resultado
@@ -0,0 +1,196 @@
+"""Classificação ao vivo da corrida: posições, intervalos e tempos de setor e de volta.
+
+Alimentada pelo Transmissor com cada atualização do `latest_by_car` (a
+leitura mais recente de um carro: volta, setor percorrido e timestamp). O
+progresso de um carro é o número de setores completados; à frente está quem
+completou mais setores e, no empate, quem passou antes pelo mesmo ponto.
+
+A ordem fica numa lista ordenada por (-setores completados, instante,
+carro): cada leitura remove a chave antiga do carro e insere a nova por busca
+binária, sem reordenar a frota. Cada carro guarda os instantes em que passou
+pelo fim dos setores das últimas `voltas_guardadas` voltas; daí saem o tempo
+de cada setor e de cada volta e o intervalo para o carro da frente (quanto
+tempo depois dele o carro passou pelo mesmo ponto).
+
+Leituras que não chegam (duas num mesmo lote do SSACP, por exemplo) deixam
+sem tempo o setor seguinte, mas não afetam as posições. Ao iniciar, o estado
+vem só do snapshot atual: intervalos e tempos aparecem conforme os carros
+avançam.
+"""
+import bisect
+import threading
+from collections import deque
+from datetime import timezone
+
+from comum.pista import NUM_SETORES
+from ssacp.previsao import setores_percorridos
+
+
+class _ListaOrdenada:
+    """Chaves em ordem numa lista: busca binária para inserir, remover e achar a posição.
+
+    A busca é O(log n); o deslocamento da lista no insert/remove é um memmove
+    em C e, até dezenas de milhares de carros, custa menos que percorrer os
+    nós de uma árvore ou skip list em Python (~4 µs contra ~20 µs com 2000).
+    """
+
+    def __init__(self):
+        self._chaves = []
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def inserir(self, chave):
+        bisect.insort(self._chaves, chave)
+
+    def remover(self, chave):
+        indice = bisect.bisect_left(self._chaves, chave)
+        if indice == len(self._chaves) or self._chaves[indice] != chave:
+            raise KeyError(chave)
+        del self._chaves[indice]
+
+    def posicao(self, chave):
+        """Posição (1 = primeiro) de uma chave presente."""
+        return bisect.bisect_left(self._chaves, chave) + 1
+
+    def __iter__(self):
+        return iter(self._chaves)
+
+
+class _Carro:
+    __slots__ = ("carro_id", "chave", "progresso", "volta", "setor", "passagens", "ordem_passagens",
+                 "tempos_setor", "melhores_setor", "ultima_volta", "melhor_volta")
+
+    def __init__(self, carro_id):
+        self.carro_id = carro_id
+        self.chave = None
+        self.progresso = 0
+        self.volta = None
+        self.setor = None
+        self.passagens = {}  # progresso -> instante (epoch s) em que completou aquele setor
+        self.ordem_passagens = deque()
+        self.tempos_setor = [None] * NUM_SETORES  # último tempo de cada setor
+        self.melhores_setor = [None] * NUM_SETORES
+        self.ultima_volta = None
+        self.melhor_volta = None
+
+
+def _epoch(valor):
+    # O pymongo devolve datas sem fuso (UTC)
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return valor.timestamp()
+
+
+def _menor(atual, novo):
+    return novo if atual is None or novo < atual else atual
+
+
+class Classificacao:
+
+    def __init__(self, voltas_guardadas=2):
+        self.voltas_guardadas = voltas_guardadas
+        self._ordem = _ListaOrdenada()
+        self._carros = {}
+        self._melhores_setor = [None] * NUM_SETORES  # (tempo, carro) de cada setor na corrida
+        self._melhor_volta = None  # (tempo, carro, volta)
+        self._lock = threading.Lock()
+        self._tabela = None  # última tabela montada, reaproveitada enquanto a versão não muda
+        self.versao = 0
+        self.eventos = 0
+        self.ignorados = 0
+
+    def processar(self, documentos):
+        """Leituras (documentos do snapshot) em ordem de chegada. Retorna quantas mudaram a classificação."""
+        aplicadas = 0
+        with self._lock:
+            for doc in documentos:
+                aplicadas += self._aplicar(doc)
+            if aplicadas:
+                self.versao += 1
+        return aplicadas
+
+    def _aplicar(self, doc):
+        self.eventos += 1
+        progresso = setores_percorridos(doc.get("volta", 0), doc.get("sensor_responsavel"))
+        carro = self._carros.get(doc["carro_id"])
+        if carro is None:
+            carro = self._carros[doc["carro_id"]] = _Carro(doc["carro_id"])
+        if progresso is None or progresso <= carro.progresso:
+            self.ignorados += 1  # setor desconhecido, repetida ou atrasada
+            return 0
+        t = _epoch(doc["timestamp"])
+
+        anterior = carro.passagens.get(progresso - 1)
+        if anterior is not None:
+            indice = (progresso - 1) % NUM_SETORES
+            tempo = round(t - anterior, 3)
+            carro.tempos_setor[indice] = tempo
+            carro.melhores_setor[indice] = _menor(carro.melhores_setor[indice], tempo)
+            if self._melhores_setor[indice] is None or tempo < self._melhores_setor[indice][0]:
+                self._melhores_setor[indice] = (tempo, carro.carro_id)
+        if progresso % NUM_SETORES == 0:
+            inicio_volta = carro.passagens.get(progresso - NUM_SETORES)
+            if inicio_volta is not None:
+                tempo = round(t - inicio_volta, 3)
+                carro.ultima_volta = tempo
+                carro.melhor_volta = _menor(carro.melhor_volta, tempo)
+                if self._melhor_volta is None or tempo < self._melhor_volta[0]:
+                    self._melhor_volta = (tempo, carro.carro_id, doc["volta"])
+
+        carro.passagens[progresso] = t
+        carro.ordem_passagens.append(progresso)
+        limite = progresso - self.voltas_guardadas * NUM_SETORES
+        while carro.ordem_passagens[0] < limite:
+            del carro.passagens[carro.ordem_passagens.popleft()]
+
+        if carro.chave is not None:
+            self._ordem.remover(carro.chave)
+        carro.chave = (-progresso, t, carro.carro_id)
+        self._ordem.inserir(carro.chave)
+        carro.progresso, carro.volta, carro.setor = progresso, doc["volta"], doc["sensor_responsavel"]
+        return 1
+
+    def posicao(self, carro_id):
+        with self._lock:
+            carro = self._carros.get(carro_id)
+            return None if carro is None or carro.chave is None else self._ordem.posicao(carro.chave)
+
+    @staticmethod
+    def _diferenca(carro, frente):
+        """(segundos, voltas) de `carro` para `frente`: voltas > 0 quando está uma volta ou mais atrás."""
+        voltas = (frente.progresso - carro.progresso) // NUM_SETORES
+        if voltas > 0:
+            return None, voltas
+        passagem = frente.passagens.get(carro.progresso)
+        return (None if passagem is None else round(carro.chave[1] - passagem, 3)), 0
+
+    def tabela(self):
+        """Classificação em ordem, com intervalos e tempos, e os melhores tempos da corrida (não alterar)."""
+        with self._lock:
+            if self._tabela is not None and self._tabela["versao"] == self.versao:
+                return self._tabela
+            carros = [self._carros[chave[2]] for chave in self._ordem]
+            linhas = []
+            for posicao, carro in enumerate(carros, start=1):
+                linha = {"posicao": posicao, "carro_id": carro.carro_id, "volta": carro.volta, "setor": carro.setor,
+                         "setores_completos": carro.progresso, "instante": round(carro.chave[1], 3),
+                         "intervalo_s": None, "intervalo_voltas": 0, "diferenca_lider_s": None,
+                         "diferenca_lider_voltas": 0,
+                         "ultima_volta_s": carro.ultima_volta, "melhor_volta_s": carro.melhor_volta,
+                         "tempos_setor_s": list(carro.tempos_setor),
+                         "melhores_setor_s": list(carro.melhores_setor)}
+                if posicao > 1:
+                    segundos, voltas = self._diferenca(carro, carros[posicao - 2])
+                    linha.update(intervalo_s=segundos, intervalo_voltas=voltas)
+                    segundos, voltas = self._diferenca(carro, carros[0])
+                    linha.update(diferenca_lider_s=segundos, diferenca_lider_voltas=voltas)
+                linhas.append(linha)
+            melhor_volta = None
+            if self._melhor_volta is not None:
+                tempo, carro_id, volta = self._melhor_volta
+                melhor_volta = {"tempo_s": tempo, "carro_id": carro_id, "volta": volta}
+            melhores_setor = [None if m is None else {"tempo_s": m[0], "carro_id": m[1]} for m in self._melhores_setor]
+            self._tabela = {"versao": self.versao, "carros": linhas, "melhor_volta": melhor_volta,
+                            "melhores_setor": melhores_setor}
+            return self._tabela
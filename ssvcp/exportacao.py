@@ -0,0 +1,330 @@
+"""Exportação colunar do histórico `pneus` para análise offline.
+
+Lê a corrida em lotes pelo índice (carro_id, timestamp), achata cada leitura
+em colunas numéricas (COLUNAS) e escreve uma partição por carro e volta. A
+memória não cresce com a corrida: o maior buffer é uma volta de um carro.
+
+Formatos:
+
+- `npy` (padrão da ferramenta): um diretório por carro ("carro=<nome>") com
+  um .npy sem compressão por coluna e `voltas.npy` ([volta, início, fim] de
+  cada volta nas colunas). `abrir_carro` mapeia as colunas de um carro com
+  np.load(..., mmap_mode="r"), sem ler o resto da corrida;
+- `parquet` (requer pyarrow): um arquivo por carro, um row group por volta;
+- `npz`: zip comprimido com um .npy por coluna de cada volta
+  ("carro=<nome>/volta=<n>/<coluna>.npy"), gerado em fluxo. É o padrão do
+  /api/exportacao, que também aceita `parquet` (um arquivo só, com a coluna
+  carro_id).
+
+O setor vira a posição no TRACK_MAP (0 = desconhecido); os nomes ficam em
+SETORES_EXPORTADOS (no manifesto e em `setores.npy`). A janela da banda morta
+(ISCCP) não é exportada.
+
+    MONGO_URI=mongodb://localhost:27017/ python ssvcp/exportacao.py --saida corrida/ [--formato parquet] [--carro X]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import zipfile
+from datetime import datetime, timezone
+from operator import itemgetter
+
+import numpy as np
+import pymongo
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from comum.pista import TRACK_MAP
+from ssacp.persistencia import CAMPOS_PNEU, POSICOES_PNEU
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+BANCO = os.getenv("SSVCP_BANCO", "f1_telemetria")
+# A exportação é uma leitura longa: por padrão fica fora do primário, como o dashboard
+READ_PREFERENCE = os.getenv("SSVCP_READ_PREFERENCE", "secondaryPreferred")
+# Leituras por ida ao banco
+TAMANHO_LOTE = int(os.getenv("SSVCP_EXPORTACAO_LOTE", "5000"))
+FORMATOS_FLUXO = {"npz": "application/zip", "parquet": "application/vnd.apache.parquet"}
+
+COLUNAS = (("timestamp", "<f8"), ("volta", "<i4"), ("setor", "u1"), ("velocidade", "<f4")) + tuple(
+    (f"pneus.{p}.{c}", "<f4") for p in POSICOES_PNEU for c in CAMPOS_PNEU)
+SETORES_EXPORTADOS = [setor["nome"] for setor in TRACK_MAP]
+_POSICAO_SETOR = {nome: posicao for posicao, nome in enumerate(SETORES_EXPORTADOS, start=1)}
+PROJECAO = {"_id": 0, "carro_id": 1, "timestamp": 1, "volta": 1, "sensor_responsavel": 1, "velocidade": 1,
+            "pneus": 1}
+_EPOCA = datetime(1970, 1, 1)
+_EPOCA_UTC = _EPOCA.replace(tzinfo=timezone.utc)
+
+
+def _epoch(valor):
+    # O pymongo devolve datas sem fuso (UTC); a subtração evita o replace() por leitura
+    return ((valor - _EPOCA) if valor.tzinfo is None else (valor - _EPOCA_UTC)).total_seconds()
+
+
+def pasta_carro(carro_id):
+    return "carro=" + re.sub(r'[^A-Za-z0-9_-]+', '_', carro_id)
+
+
+def ler_historico(pneus, carro_id=None, volta_ini=None, volta_fim=None, tamanho_lote=TAMANHO_LOTE):
+    """Cursor da corrida em ordem de (carro, timestamp), trazendo `tamanho_lote` leituras por vez."""
+    filtro = {}
+    if carro_id:
+        filtro["carro_id"] = carro_id
+    if volta_ini is not None or volta_fim is not None:
+        filtro["volta"] = {}
+        if volta_ini is not None:
+            filtro["volta"]["$gte"] = volta_ini
+        if volta_fim is not None:
+            filtro["volta"]["$lte"] = volta_fim
+    return pneus.find(filtro, PROJECAO, batch_size=tamanho_lote).sort([("carro_id", 1), ("timestamp", 1)])
+
+
+def _colunas(linhas):
+    matriz = np.array(linhas, dtype=np.float64)
+    return {nome: np.ascontiguousarray(matriz[:, i], dtype=tipo) for i, (nome, tipo) in enumerate(COLUNAS)}
+
+
+def particoes(documentos):
+    """Leituras em ordem de (carro, timestamp) -> (carro_id, volta, {coluna: array}), uma volta por vez."""
+    pneus_em_ordem = itemgetter(*POSICOES_PNEU)
+    campos = itemgetter(*CAMPOS_PNEU)
+    atual, linhas = None, []
+    for doc in documentos:
+        chave = (doc["carro_id"], doc["volta"])
+        if chave != atual:
+            if linhas:
+                yield atual[0], atual[1], _colunas(linhas)
+            atual, linhas = chave, []
+        setor = _POSICAO_SETOR.get(doc.get("sensor_responsavel"), 0)
+        linha = (_epoch(doc["timestamp"]), doc["volta"], setor, doc.get("velocidade", 0.0))
+        for pneu in pneus_em_ordem(doc["pneus"]):
+            linha += campos(pneu)
+        linhas.append(linha)
+    if linhas:
+        yield atual[0], atual[1], _colunas(linhas)
+
+
+def _escrever_manifesto(diretorio, formato, carros):
+    manifesto = {"formato": formato, "colunas": [list(c) for c in COLUNAS], "setores": SETORES_EXPORTADOS,
+                 "linhas": sum(c["linhas"] for c in carros.values()), "carros": carros}
+    with open(os.path.join(diretorio, "manifesto.json"), "w") as arquivo:
+        json.dump(manifesto, arquivo, indent=1)
+    return manifesto
+
+
+class EscritorNpy:
+    """Um .npy por coluna e carro. As voltas são anexadas a arquivos brutos e viram .npy quando o carro acaba."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.carros = {}
+        self._carro = None
+        self._brutos = {}
+        self._voltas = []
+        self._linhas = 0
+        os.makedirs(diretorio, exist_ok=True)
+
+    def escrever(self, carro_id, volta, colunas):
+        if carro_id != self._carro:
+            self._fechar_carro()
+            self._carro = carro_id
+            pasta = os.path.join(self.diretorio, pasta_carro(carro_id))
+            os.makedirs(pasta, exist_ok=True)
+            self._brutos = {nome: open(os.path.join(pasta, nome + ".bruto"), "wb") for nome, _ in COLUNAS}
+        n = len(colunas["timestamp"])
+        for nome, valores in colunas.items():
+            self._brutos[nome].write(valores.tobytes())
+        self._voltas.append((volta, self._linhas, self._linhas + n))
+        self._linhas += n
+
+    def _fechar_carro(self):
+        if self._carro is None:
+            return
+        pasta = os.path.join(self.diretorio, pasta_carro(self._carro))
+        for nome, tipo in COLUNAS:
+            self._brutos[nome].close()
+            bruto = os.path.join(pasta, nome + ".bruto")
+            with open(os.path.join(pasta, nome + ".npy"), "wb") as destino, open(bruto, "rb") as origem:
+                np.lib.format.write_array_header_1_0(
+                    destino, {"descr": tipo, "fortran_order": False, "shape": (self._linhas,)})
+                shutil.copyfileobj(origem, destino, 1 << 20)
+            os.remove(bruto)
+        np.save(os.path.join(pasta, "voltas.npy"), np.array(self._voltas, dtype=np.int64).reshape(-1, 3))
+        self.carros[self._carro] = {"pasta": pasta_carro(self._carro), "linhas": self._linhas,
+                                    "voltas": len(self._voltas)}
+        self._carro, self._brutos, self._voltas, self._linhas = None, {}, [], 0
+
+    def fechar(self):
+        self._fechar_carro()
+        return _escrever_manifesto(self.diretorio, "npy", self.carros)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("o formato parquet requer pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+
+def _opcoes_parquet():
+    # Dicionário só nas colunas de poucos valores; nos floats, byte_stream_split agrupa expoentes e
+    # mantissas e o zstd comprime ~10% melhor
+    floats = [nome for nome, tipo in COLUNAS if tipo[1] == "f"]
+    return {"compression": "zstd", "use_dictionary": ["carro_id", "volta", "setor"], "use_byte_stream_split": floats}
+
+
+def _esquema_arrow(pa, com_carro):
+    campos = [(nome, pa.from_numpy_dtype(np.dtype(tipo))) for nome, tipo in COLUNAS]
+    if com_carro:
+        campos.insert(0, ("carro_id", pa.dictionary(pa.int32(), pa.string())))
+    return pa.schema(campos, metadata={"setores": json.dumps(SETORES_EXPORTADOS)})
+
+
+def _tabela_arrow(pa, esquema, carro_id, colunas):
+    arrays = {nome: colunas[nome] for nome, _ in COLUNAS}
+    if "carro_id" in esquema.names:
+        n = len(colunas["timestamp"])
+        arrays["carro_id"] = pa.DictionaryArray.from_arrays(np.zeros(n, dtype=np.int32), pa.array([carro_id]))
+    return pa.table(arrays, schema=esquema)
+
+
+class EscritorParquet:
+    """Um arquivo parquet (zstd) por carro, um row group por volta."""
+
+    def __init__(self, diretorio):
+        self.pa, self.pq = _pyarrow()
+        self.diretorio = diretorio
+        self.esquema = _esquema_arrow(self.pa, com_carro=False)
+        self.carros = {}
+        self._carro = None
+        self._escritor = None
+        os.makedirs(diretorio, exist_ok=True)
+
+    def escrever(self, carro_id, volta, colunas):
+        if carro_id != self._carro:
+            self._fechar_carro()
+            self._carro = carro_id
+            pasta = os.path.join(self.diretorio, pasta_carro(carro_id))
+            os.makedirs(pasta, exist_ok=True)
+            self._escritor = self.pq.ParquetWriter(os.path.join(pasta, "dados.parquet"), self.esquema,
+                                                   **_opcoes_parquet())
+            self.carros[carro_id] = {"pasta": pasta_carro(carro_id), "linhas": 0, "voltas": 0}
+        self._escritor.write_table(_tabela_arrow(self.pa, self.esquema, carro_id, colunas))
+        self.carros[carro_id]["linhas"] += len(colunas["timestamp"])
+        self.carros[carro_id]["voltas"] += 1
+
+    def _fechar_carro(self):
+        if self._escritor is not None:
+            self._escritor.close()
+        self._carro, self._escritor = None, None
+
+    def fechar(self):
+        self._fechar_carro()
+        return _escrever_manifesto(self.diretorio, "parquet", self.carros)
+
+
+def exportar(documentos, diretorio, formato="npy"):
+    """Escreve as partições das leituras em `diretorio` e retorna o manifesto."""
+    escritor = EscritorParquet(diretorio) if formato == "parquet" else EscritorNpy(diretorio)
+    for carro_id, volta, colunas in particoes(documentos):
+        escritor.escrever(carro_id, volta, colunas)
+    return escritor.fechar()
+
+
+def abrir_carro(diretorio, carro_id, volta=None):
+    """Colunas de um carro exportado em `npy`, mapeadas em memória; com `volta`, só as linhas dela."""
+    pasta = os.path.join(diretorio, pasta_carro(carro_id))
+    colunas = {nome: np.load(os.path.join(pasta, nome + ".npy"), mmap_mode="r") for nome, _ in COLUNAS}
+    if volta is None:
+        return colunas
+    voltas = np.load(os.path.join(pasta, "voltas.npy"))
+    trechos = voltas[voltas[:, 0] == volta]
+    if len(trechos) == 0:
+        return {nome: valores[:0] for nome, valores in colunas.items()}
+    # Uma volta é contígua (leituras em ordem de timestamp)
+    return {nome: valores[trechos[0, 1]:trechos[-1, 2]] for nome, valores in colunas.items()}
+
+
+class _Saida:
+    """Destino só de escrita que acumula os bytes até o gerador entregá-los."""
+
+    def __init__(self):
+        self._partes = []
+        self.closed = False
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def esvaziar(self):
+        if self._partes:
+            dados, self._partes = b"".join(self._partes), []
+            yield dados
+
+
+def gerar_npz(particoes_corrida, nivel=6):
+    """Bytes de um .npz em fluxo: os membros de cada volta saem assim que ela é lida."""
+    saida = _Saida()
+    with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=nivel) as arquivo:
+        with arquivo.open("setores.npy", "w") as membro:
+            np.lib.format.write_array(membro, np.array(SETORES_EXPORTADOS), allow_pickle=False)
+        for carro_id, volta, colunas in particoes_corrida:
+            for nome, valores in colunas.items():
+                with arquivo.open(f"{pasta_carro(carro_id)}/volta={volta:03d}/{nome}.npy", "w",
+                                  force_zip64=True) as membro:
+                    np.lib.format.write_array(membro, valores, allow_pickle=False)
+            yield from saida.esvaziar()
+    yield from saida.esvaziar()
+
+
+def gerar_parquet(particoes_corrida):
+    """Bytes de um parquet em fluxo (coluna carro_id, um row group por volta de cada carro)."""
+    pa, pq = _pyarrow()
+    esquema = _esquema_arrow(pa, com_carro=True)
+    saida = _Saida()
+    escritor = pq.ParquetWriter(saida, esquema, **_opcoes_parquet())
+    for carro_id, _, colunas in particoes_corrida:
+        escritor.write_table(_tabela_arrow(pa, esquema, carro_id, colunas))
+        yield from saida.esvaziar()
+    escritor.close()
+    yield from saida.esvaziar()
+
+
+def gerar_arquivo(formato, particoes_corrida):
+    if formato == "parquet":
+        _pyarrow()  # falha antes de começar a resposta
+        return gerar_parquet(particoes_corrida)
+    return gerar_npz(particoes_corrida)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--saida", required=True, help="diretório da exportação")
+    parser.add_argument("--formato", choices=("npy", "parquet"), default="npy")
+    parser.add_argument("--carro", default=None, help="exporta só este carro")
+    parser.add_argument("--volta-ini", type=int, default=None)
+    parser.add_argument("--volta-fim", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(MONGO_URI, readPreference=READ_PREFERENCE)
+    inicio = time.perf_counter()
+    cursor = ler_historico(client[BANCO]["pneus"], args.carro, args.volta_ini, args.volta_fim, args.lote)
+    manifesto = exportar(cursor, args.saida, args.formato)
+    print(f"[EXPORTACAO] {manifesto['linhas']} leituras de {len(manifesto['carros'])} carros em {args.saida} "
+          f"({time.perf_counter() - inicio:.1f}s).")
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
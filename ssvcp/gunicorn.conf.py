@@ -0,0 +1,25 @@
+"""Configuração do gunicorn para o SSVCP em produção.
+
+    gunicorn -c ssvcp/gunicorn.conf.py ssvcp.app:app
+
+Workers gthread: cada conexão SSE (/api/stream) ocupa uma thread enquanto
+estiver aberta. Cada worker aceita até SSVCP_SSE_MAX conexões SSE (as demais
+recebem 503) e tem SSVCP_THREADS_RESERVADAS threads a mais para as outras
+rotas, então o total de espectadores por réplica é workers x SSVCP_SSE_MAX
+(4 x 128 = 512 com o padrão).
+"""
+import os
+import multiprocessing
+
+bind = os.getenv("SSVCP_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("SSVCP_WORKERS", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "gthread"
+sse_max = int(os.getenv("SSVCP_SSE_MAX", "128"))
+threads = int(os.getenv("SSVCP_THREADS", str(sse_max + int(os.getenv("SSVCP_THREADS_RESERVADAS", "8")))))
+if threads <= sse_max:
+    print(f"[SSVCP] AVISO: SSVCP_THREADS={threads} não passa de SSVCP_SSE_MAX={sse_max}; "
+          "clientes SSE podem ocupar todas as threads")
+# Conexões SSE ficam abertas; o ping do stream mantém o worker ativo
+timeout = int(os.getenv("SSVCP_TIMEOUT", "60"))
+keepalive = 5
+accesslog = None
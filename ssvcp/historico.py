@@ -0,0 +1,194 @@
+"""Consultas históricas do SSVCP: séries por pneu com redução de pontos e rollups.
+
+As séries vêm da coleção time-series `pneus` (índices (carro_id, timestamp) e
+(carro_id, volta)) e são reduzidas no servidor para no máximo `pontos`
+amostras. Médias por setor/volta e degradação por stint vêm dos rollups que o
+SSACP mantém na ingestão (`rollups_setor` e `rollups_volta`), sem varrer o
+histórico bruto. Os alertas vêm da coleção `alertas`, gravada pelo motor de
+alertas do SSACP (ssacp/alertas.py).
+"""
+from datetime import datetime, timezone
+
+from ssacp.persistencia import POSICOES_PNEU, CAMPOS_PNEU
+
+METODOS = ("lttb", "minmax")
+PONTOS_PADRAO = 500
+PONTOS_MAX = 5000
+
+
+def _epoch(valor):
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return round(valor.timestamp(), 3)
+
+
+def lttb(pontos, alvo):
+    """Largest-Triangle-Three-Buckets: mantém a forma da curva com `alvo` pontos.
+
+    `pontos` é uma lista de (x, y, ...) ordenada por x; o primeiro e o último
+    pontos são sempre mantidos.
+    """
+    n = len(pontos)
+    if alvo >= n or alvo < 3:
+        return list(pontos)
+
+    escolhidos = [pontos[0]]
+    tamanho_balde = (n - 2) / (alvo - 2)
+    a = 0
+    for i in range(alvo - 2):
+        inicio = int(i * tamanho_balde) + 1
+        fim = int((i + 1) * tamanho_balde) + 1
+        # Média do próximo balde (o último "balde" é só o ponto final)
+        prox_inicio, prox_fim = fim, min(int((i + 2) * tamanho_balde) + 1, n)
+        if prox_inicio >= prox_fim:
+            prox_inicio, prox_fim = n - 1, n
+        qtd = prox_fim - prox_inicio
+        media_x = sum(p[0] for p in pontos[prox_inicio:prox_fim]) / qtd
+        media_y = sum(p[1] for p in pontos[prox_inicio:prox_fim]) / qtd
+
+        ax, ay = pontos[a][0], pontos[a][1]
+        maior_area, escolhido = -1.0, inicio
+        for j in range(inicio, fim):
+            area = abs((ax - media_x) * (pontos[j][1] - ay) - (ax - pontos[j][0]) * (media_y - ay))
+            if area > maior_area:
+                maior_area, escolhido = area, j
+        escolhidos.append(pontos[escolhido])
+        a = escolhido
+    escolhidos.append(pontos[-1])
+    return escolhidos
+
+
+def baldes_minmax(pontos, alvo):
+    """Divide a série em `alvo` baldes de tempo iguais com mín/máx/média de cada um."""
+    if not pontos:
+        return []
+    x0, x1 = pontos[0][0], pontos[-1][0]
+    largura = (x1 - x0) / alvo or 1.0
+    baldes = {}
+    for p in pontos:
+        indice = min(int((p[0] - x0) / largura), alvo - 1)
+        balde = baldes.get(indice)
+        if balde is None:
+            baldes[indice] = balde = {"t": p[0], "volta": p[2], "min": p[1], "max": p[1], "soma": 0.0, "n": 0}
+        balde["min"] = min(balde["min"], p[1])
+        balde["max"] = max(balde["max"], p[1])
+        balde["soma"] += p[1]
+        balde["n"] += 1
+    return [{"t": b["t"], "volta": b["volta"], "min": b["min"], "max": b["max"],
+             "media": round(b["soma"] / b["n"], 3), "n": b["n"]}
+            for _, b in sorted(baldes.items())]
+
+
+def filtro_intervalo(carro_id, volta_ini=None, volta_fim=None):
+    filtro = {"carro_id": carro_id}
+    if volta_ini is not None or volta_fim is not None:
+        filtro["volta"] = {}
+        if volta_ini is not None:
+            filtro["volta"]["$gte"] = volta_ini
+        if volta_fim is not None:
+            filtro["volta"]["$lte"] = volta_fim
+    return filtro
+
+
+def serie_pneus(historico, carro_id, pneus=POSICOES_PNEU, campo="temp", volta_ini=None, volta_fim=None,
+                pontos=PONTOS_PADRAO, metodo="lttb"):
+    """Série de `campo` de cada pneu pedido, reduzida para no máximo `pontos` amostras."""
+    projecao = {"_id": 0, "timestamp": 1, "volta": 1}
+    projecao.update({f"pneus.{p}.{campo}": 1 for p in pneus})
+    cursor = historico.find(filtro_intervalo(carro_id, volta_ini, volta_fim), projecao).sort("timestamp", 1)
+
+    brutos = {p: [] for p in pneus}
+    total = 0
+    for doc in cursor:
+        total += 1
+        t = _epoch(doc["timestamp"])
+        for p in pneus:
+            valor = doc.get("pneus", {}).get(p, {}).get(campo)
+            if valor is not None:
+                brutos[p].append((t, valor, doc["volta"]))
+
+    series = {}
+    for p, serie in brutos.items():
+        if metodo == "minmax":
+            series[p] = baldes_minmax(serie, pontos)
+        else:
+            series[p] = [{"t": x, "valor": y, "volta": v} for x, y, v in lttb(serie, pontos)]
+    return {"carro_id": carro_id, "campo": campo, "metodo": metodo, "leituras": total, "series": series}
+
+
+def formatar_rollup(doc):
+    """Rollup do banco (n, soma/min/max) -> médias, mínimos e máximos legíveis."""
+    n = doc["n"]
+
+    def resumo(valores):
+        return {"media": round(valores["soma"] / n, 3), "min": valores["min"], "max": valores["max"]}
+
+    saida = {"carro_id": doc["carro_id"], "volta": doc["volta"], "leituras": n,
+             "inicio": _epoch(doc["inicio"]), "fim": _epoch(doc["fim"]),
+             "velocidade": resumo(doc["velocidade"]),
+             "pneus": {p: {c: resumo(doc["pneus"][p][c]) for c in CAMPOS_PNEU} for p in POSICOES_PNEU}}
+    if "setor" in doc:
+        saida["setor"] = doc["setor"]
+    return saida
+
+
+def rollups_por_setor(rollups_setor, carro_id, volta_ini=None, volta_fim=None):
+    cursor = rollups_setor.find(filtro_intervalo(carro_id, volta_ini, volta_fim)).sort([("volta", 1), ("inicio", 1)])
+    return [formatar_rollup(doc) for doc in cursor]
+
+
+def rollups_por_volta(rollups_volta, carro_id, volta_ini=None, volta_fim=None):
+    cursor = rollups_volta.find(filtro_intervalo(carro_id, volta_ini, volta_fim)).sort("volta", 1)
+    return [formatar_rollup(doc) for doc in cursor]
+
+
+def degradacao_por_stint(voltas):
+    """Taxa de desgaste (% por volta) de cada pneu em cada stint.
+
+    `voltas` são rollups por volta já formatados, em ordem. Um stint termina
+    quando o desgaste máximo de algum pneu cai em relação à volta anterior
+    (troca de pneus).
+    """
+    stints = []
+    atual = []
+    for volta in voltas:
+        if atual and any(volta["pneus"][p]["desgaste"]["max"] < atual[-1]["pneus"][p]["desgaste"]["max"]
+                         for p in POSICOES_PNEU):
+            stints.append(atual)
+            atual = []
+        atual.append(volta)
+    if atual:
+        stints.append(atual)
+
+    resultado = []
+    for numero, stint in enumerate(stints, start=1):
+        primeira, ultima = stint[0], stint[-1]
+        qtd_voltas = ultima["volta"] - primeira["volta"] + 1
+        pneus = {}
+        for p in POSICOES_PNEU:
+            inicio = primeira["pneus"][p]["desgaste"]["min"]
+            fim = ultima["pneus"][p]["desgaste"]["max"]
+            pneus[p] = {"desgaste_inicio": inicio, "desgaste_fim": fim,
+                        "taxa_por_volta": round((fim - inicio) / qtd_voltas, 3)}
+        resultado.append({"stint": numero, "volta_inicio": primeira["volta"], "volta_fim": ultima["volta"],
+                          "voltas": qtd_voltas, "pneus": pneus})
+    return resultado
+
+
+def listar_alertas(alertas, carro_id=None, ativos=False, desde=None, limite=100):
+    """Alertas mais recentes primeiro. `desde` em epoch (s), comparado com o início."""
+    filtro = {}
+    if carro_id:
+        filtro["carro_id"] = carro_id
+    if ativos:
+        filtro["estado"] = "ativo"
+    if desde is not None:
+        filtro["inicio"] = {"$gte": datetime.fromtimestamp(desde, tz=timezone.utc)}
+    resultado = []
+    for doc in alertas.find(filtro).sort("inicio", -1).limit(limite):
+        doc["id"] = doc.pop("_id")
+        doc["inicio"] = _epoch(doc["inicio"])
+        if doc.get("fim") is not None:
+            doc["fim"] = _epoch(doc["fim"])
+        resultado.append(doc)
+    return resultado
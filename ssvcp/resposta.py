@@ -0,0 +1,105 @@
+"""Representações e compressão das respostas do /api/telemetria.
+
+- `json` (padrão): a lista de carros, como sempre;
+- `colunas`: um objeto com uma lista por campo (pneus achatados em
+  "pneus.fl.temp", datas em epoch s), que repete os nomes dos campos uma vez
+  só em vez de uma vez por carro;
+- `msgpack`: o mesmo formato colunar em MessagePack.
+
+O corpo é comprimido com brotli ou gzip conforme o Accept-Encoding (acima de
+`minimo_bytes`). Como o snapshot muda no máximo algumas vezes por segundo e
+muitos clientes pedem a mesma coisa, `CacheCorpos` guarda os corpos já
+codificados da versão atual.
+"""
+import gzip
+import threading
+from datetime import datetime, timezone
+
+import brotli
+import msgpack
+
+FORMATOS = {"json": "application/json", "colunas": "application/json", "msgpack": "application/x-msgpack"}
+# Em ordem de preferência quando o cliente aceita mais de uma
+CODIFICACOES = ("br", "gzip")
+NIVEL_GZIP = 6
+# Qualidade 11 do brotli é lenta demais para respostas geradas a cada versão
+QUALIDADE_BROTLI = 5
+
+
+def _epoch(valor):
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return round(valor.timestamp(), 3)
+
+
+def epoch_ms(valor):
+    """datetime -> epoch em ms (inteiro), usado como versão do snapshot."""
+    return int(round(_epoch(valor) * 1000))
+
+
+def _achatar(doc, prefixo="", saida=None):
+    saida = {} if saida is None else saida
+    for chave, valor in doc.items():
+        if isinstance(valor, dict):
+            _achatar(valor, f"{prefixo}{chave}.", saida)
+        else:
+            saida[prefixo + chave] = _epoch(valor) if isinstance(valor, datetime) else valor
+    return saida
+
+
+def colunas(carros):
+    """Lista de documentos -> {"n": quantidade, "colunas": {campo: [valor de cada carro]}}.
+
+    Campos ausentes em algum carro viram None nessa posição.
+    """
+    linhas = [_achatar(carro) for carro in carros]
+    nomes = list(dict.fromkeys(nome for linha in linhas for nome in linha))
+    return {"n": len(linhas), "colunas": {nome: [linha.get(nome) for linha in linhas] for nome in nomes}}
+
+
+def serializar(carros, formato, dumps_json):
+    """Corpo (bytes) e mimetype. `dumps_json` é o serializador JSON do app (datas como no jsonify)."""
+    if formato == "msgpack":
+        return msgpack.packb(colunas(carros)), FORMATOS[formato]
+    dados = colunas(carros) if formato == "colunas" else carros
+    return dumps_json(dados).encode(), FORMATOS[formato]
+
+
+def escolher_codificacao(accept_encodings):
+    """Melhor Content-Encoding aceito (werkzeug `request.accept_encodings`), ou None."""
+    return accept_encodings.best_match(CODIFICACOES)
+
+
+def comprimir(corpo, codificacao, minimo_bytes=0):
+    """(corpo, codificação aplicada ou None). Corpos menores que `minimo_bytes` vão sem compressão."""
+    if codificacao is None or len(corpo) < minimo_bytes:
+        return corpo, None
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=QUALIDADE_BROTLI), codificacao
+    return gzip.compress(corpo, compresslevel=NIVEL_GZIP), codificacao
+
+
+class CacheCorpos:
+    """Corpos prontos (serializados e comprimidos) da versão mais recente do snapshot."""
+
+    def __init__(self):
+        self.versao = None
+        self._corpos = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.geracoes = 0
+
+    def obter(self, versao, chave, gerar):
+        """Corpo de `chave` na `versao`; chama gerar() só se ainda não houver. Versões antigas são descartadas."""
+        with self._lock:
+            if versao == self.versao and chave in self._corpos:
+                self.acertos += 1
+                return self._corpos[chave]
+        valor = gerar()
+        with self._lock:
+            self.geracoes += 1
+            if self.versao is None or versao >= self.versao:
+                if versao != self.versao:
+                    self.versao, self._corpos = versao, {}
+                self._corpos[chave] = valor
+        return valor
@@ -0,0 +1,157 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Marcador colocado na fila de um assinante lento: ele perdeu deltas e deve
+# receber o estado completo de novo
+RESSINCRONIZAR = object()
+
+
+def para_json(dados):
+    return json.dumps(dados, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+
+class Transmissor:
+    """Único observador do snapshot `latest_by_car` por processo.
+
+    Segue o change stream da coleção (ou, sem replica set, consulta por
+    `atualizado_em`), mantém o último estado de cada carro e distribui para
+    todos os assinantes apenas os carros que mudaram.
+    """
+
+    def __init__(self, snapshot, intervalo_envio=0.1, intervalo_consulta=0.5, tamanho_fila=256, hist_atraso=None,
+                 ao_receber=None):
+        self.snapshot = snapshot
+        # Histograma (opcional) do atraso entre a publicação no carro e o envio aos assinantes
+        self.hist_atraso = hist_atraso
+        # Chamado (opcional) com cada lote de documentos novos, em ordem de chegada, antes de juntar por carro
+        self.ao_receber = ao_receber
+        self.intervalo_envio = intervalo_envio
+        self.intervalo_consulta = intervalo_consulta
+        self.tamanho_fila = tamanho_fila
+        self.estado = {}
+        self.versao = 0
+        self.modo = None
+        self.eventos_db = 0  # leituras feitas no banco (change stream ou consultas)
+        self._assinantes = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ultima_atualizacao = None
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._seguir, daemon=True)
+                self._thread.start()
+
+    def assinar(self):
+        """Retorna (fila, estado atual, versão). A fila recebe (versão, carros alterados)."""
+        self.iniciar()
+        fila = queue.Queue(maxsize=self.tamanho_fila)
+        with self._lock:
+            self._assinantes.add(fila)
+            return fila, list(self.estado.values()), self.versao
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes.discard(fila)
+
+    def estado_atual(self):
+        with self._lock:
+            return list(self.estado.values()), self.versao
+
+    def assinantes(self):
+        with self._lock:
+            return len(self._assinantes)
+
+    def _publicar(self, documentos):
+        if not documentos:
+            return
+        alterados = {}
+        novos = []
+        for doc in documentos:
+            doc.pop("_id", None)
+            if self.estado.get(doc["carro_id"]) == doc or alterados.get(doc["carro_id"]) == doc:
+                continue  # já enviado (consulta por >= ou recarga após reconexão)
+            alterados[doc["carro_id"]] = doc
+            novos.append(doc)
+            atualizado = doc.get("atualizado_em")
+            if atualizado and (self._ultima_atualizacao is None or atualizado > self._ultima_atualizacao):
+                self._ultima_atualizacao = atualizado
+
+        if not alterados:
+            return
+        if self.ao_receber is not None:
+            self.ao_receber(novos)
+        if self.hist_atraso is not None:
+            agora = time.time()
+            for doc in alterados.values():
+                publicado = doc.get("timestamp")
+                if isinstance(publicado, datetime):
+                    if publicado.tzinfo is None:
+                        publicado = publicado.replace(tzinfo=timezone.utc)
+                    self.hist_atraso.observar(agora - publicado.timestamp())
+        with self._lock:
+            self.estado.update(alterados)
+            self.versao += 1
+            evento = (self.versao, list(alterados.values()))
+            for fila in self._assinantes:
+                try:
+                    fila.put_nowait(evento)
+                except queue.Full:
+                    # Assinante não acompanha: descarta o atrasado e pede ressincronização
+                    while not fila.empty():
+                        try:
+                            fila.get_nowait()
+                        except queue.Empty:
+                            break
+                    fila.put_nowait(RESSINCRONIZAR)
+
+    def _carregar_tudo(self):
+        self.eventos_db += 1
+        self._publicar(list(self.snapshot.find({})))
+
+    def _seguir(self):
+        while True:
+            try:
+                self._carregar_tudo()
+                try:
+                    self._seguir_change_stream()
+                except OperationFailure as e:
+                    # Change streams só existem em replica set (ex.: Mongo único do ambiente dev)
+                    print(f"[SSVCP] Change stream indisponível ({e.code}); consultando a cada "
+                          f"{self.intervalo_consulta}s.")
+                    self._seguir_consultando()
+            except PyMongoError as e:
+                print(f"[SSVCP] Erro ao acompanhar o snapshot: {e}. Reconectando...")
+                time.sleep(2)
+
+    def _seguir_change_stream(self):
+        self.modo = "change_stream"
+        max_espera_ms = max(1, int(self.intervalo_envio * 1000))
+        with self.snapshot.watch(full_document="updateLookup", max_await_time_ms=max_espera_ms) as fluxo:
+            pendentes = []
+            proximo_envio = time.monotonic() + self.intervalo_envio
+            while fluxo.alive:
+                mudanca = fluxo.try_next()
+                if mudanca is not None and mudanca.get("fullDocument"):
+                    self.eventos_db += 1
+                    pendentes.append(mudanca["fullDocument"])
+                # Junta as mudanças de um intervalo curto num único delta
+                if pendentes and (mudanca is None or time.monotonic() >= proximo_envio):
+                    self._publicar(pendentes)
+                    pendentes = []
+                    proximo_envio = time.monotonic() + self.intervalo_envio
+
+    def _seguir_consultando(self):
+        self.modo = "consulta"
+        while True:
+            # >= para não perder atualizações no mesmo milissegundo; repetidas são filtradas
+            filtro = {"atualizado_em": {"$gte": self._ultima_atualizacao}} if self._ultima_atualizacao else {}
+            self.eventos_db += 1
+            self._publicar(list(self.snapshot.find(filtro)))
+            time.sleep(self.intervalo_consulta)